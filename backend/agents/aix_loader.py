@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+AIX Loader - parse an .aix agent spec once into a typed, indexed model
+
+AIX files are YAML documents. Instead of scanning the raw text with a
+regex per capability, tool or score (which also matches unrelated keys
+anywhere in the file), ``load()`` parses the document once and builds an
+``AixSpec`` with indexed lookups:
+
+    spec = load('pattern-learning-mega-agent.aix')
+    spec.has_section('mcp_tools')
+    spec.power('topology_analysis')        # intelligence.*.power_levels
+    spec.tool('pattern_analyzer')          # mcp_tools by id
+    spec.api('pattern-analysis-api')       # apis by id
+    spec.dna_score                         # dna_scoring.current_score.total
+    spec.get('intelligence.cognition.model')
+
+Parsed specs are cached twice: in memory per path (checked against the
+file's mtime and size), and on disk as the parsed document in JSON, named
+after the SHA-256 of the file content (``$AIX_CACHE_DIR``, default
+``~/.cache/aix``), so a spec is only ever parsed again when its content
+changes. The disk cache holds plain data only, never pickles: a cache
+file is only trusted when it belongs to the current user and is not
+group- or world-writable, and documents JSON cannot round-trip exactly
+(dates, non-string keys) are simply not cached. Every ``load()`` returns
+its own ``AixSpec``.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import stat as stat_mode
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Optional, Tuple, Union
+
+import yaml
+
+# Bump when the model changes so stale cache entries are ignored
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = Path(os.environ.get('AIX_CACHE_DIR') or
+                         Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'aix')
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+_MISSING = object()
+
+
+class AixError(ValueError):
+    """The file is not a valid AIX document"""
+
+
+class AixTool:
+    """One MCP tool declared under ``mcp_tools``"""
+
+    __slots__ = ('id', 'name', 'description', 'capabilities', 'permissions')
+
+    def __init__(self, id: str, name: str = '', description: str = '',
+                 capabilities: Tuple[str, ...] = (), permissions: Tuple[str, ...] = ()):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.capabilities = capabilities
+        self.permissions = permissions
+
+    def __repr__(self):
+        return f"AixTool({self.id!r})"
+
+
+class AixEndpoint:
+    """One endpoint of an API"""
+
+    __slots__ = ('id', 'path', 'method')
+
+    def __init__(self, id: str, path: str = '', method: str = ''):
+        self.id = id
+        self.path = path
+        self.method = method
+
+    def __repr__(self):
+        return f"AixEndpoint({self.method} {self.path})"
+
+
+class AixApi:
+    """One API declared under ``apis``"""
+
+    __slots__ = ('id', 'name', 'base_url', 'protocol', 'version', 'endpoints')
+
+    def __init__(self, id: str, name: str = '', base_url: str = '', protocol: str = '',
+                 version: str = '', endpoints: Tuple[AixEndpoint, ...] = ()):
+        self.id = id
+        self.name = name
+        self.base_url = base_url
+        self.protocol = protocol
+        self.version = version
+        self.endpoints = endpoints
+
+    def __repr__(self):
+        return f"AixApi({self.id!r})"
+
+
+class AixSpec:
+    """A parsed AIX document with indexed sections"""
+
+    __slots__ = ('path', 'digest', 'size', 'lines', 'schema', 'version', 'genome', 'meta', 'sections',
+                 'power_levels', 'tools', 'apis', 'dna_score', 'dna_breakdown', 'document', 'source')
+
+    def __init__(self, path: str, digest: str, size: int, lines: int, document: Dict[str, Any]):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.lines = lines
+        self.document = document
+        self.source = 'parsed'  # or 'memory' / 'disk' when served from a cache
+        self.schema = document.get('$schema')
+        self.version = _text(document.get('version'))
+        self.genome = _text(document.get('genome'))
+        self.meta: Dict[str, Any] = _mapping(document.get('meta'))
+        self.sections: FrozenSet[str] = frozenset(document)
+        self.power_levels: Dict[str, float] = _power_levels(document.get('intelligence'))
+        self.tools: Dict[str, AixTool] = _tools(document.get('mcp_tools'))
+        self.apis: Dict[str, AixApi] = _apis(document.get('apis'))
+        score = _mapping(document.get('dna_scoring'))
+        current = _mapping(score.get('current_score')) or score
+        total = current.get('total')
+        self.dna_score: Optional[float] = float(total) if isinstance(total, (int, float)) else None
+        self.dna_breakdown: Dict[str, float] = {
+            str(k): float(v) for k, v in _mapping(current.get('breakdown')).items() if isinstance(v, (int, float))
+        }
+
+    @property
+    def id(self) -> Optional[str]:
+        return self.meta.get('id')
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.meta.get('name')
+
+    def has_section(self, name: str) -> bool:
+        return name in self.sections
+
+    def power(self, capability: str) -> Optional[float]:
+        return self.power_levels.get(capability.lower())
+
+    def tool(self, tool_id: str) -> Optional[AixTool]:
+        return self.tools.get(tool_id)
+
+    def api(self, api_id: str) -> Optional[AixApi]:
+        return self.apis.get(api_id)
+
+    def get(self, dotted: str, default: Any = None) -> Any:
+        """Value at a dotted path (``intelligence.cognition.model``); list items by index"""
+        node: Any = self.document
+        for key in dotted.split('.'):
+            if isinstance(node, dict):
+                node = node.get(key, _MISSING)
+            elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+                node = node[int(key)]
+            else:
+                return default
+            if node is _MISSING:
+                return default
+        return node
+
+    def __repr__(self):
+        return f"AixSpec({self.id or self.path!r})"
+
+
+# Model builders
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _mapping(value: Any) -> Dict[str, Any]:
+    return value if isinstance(value, dict) else {}
+
+
+def _strings(value: Any) -> Tuple[str, ...]:
+    return tuple(str(v) for v in value) if isinstance(value, list) else ()
+
+
+def _power_levels(intelligence: Any) -> Dict[str, float]:
+    """Every ``power_levels`` mapping under ``intelligence`` (mega/quantum capabilities...)"""
+    levels: Dict[str, float] = {}
+    for block in _mapping(intelligence).values():
+        for key, value in _mapping(_mapping(block).get('power_levels')).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                levels[str(key).lower()] = float(value)
+    return levels
+
+
+def _entries(section: Any, list_key: str):
+    """Items of a section written as a list, a ``{list_key: [...]}`` block, an id-keyed
+    mapping or named groups of ids (``{internal: [...], external: [...]}``)"""
+    if isinstance(section, dict):
+        if isinstance(section.get(list_key), list):
+            section = section[list_key]
+        else:
+            items = []
+            for key, value in section.items():
+                if isinstance(value, dict):
+                    items.append(dict(value, id=value.get('id', key)))
+                elif isinstance(value, list):
+                    items.extend(value)
+            section = items
+    if not isinstance(section, list):
+        return []
+    entries = []
+    for item in section:
+        if isinstance(item, str):
+            entries.append({'id': item})
+        elif isinstance(item, dict) and ('id' in item or 'name' in item):
+            entries.append(item if 'id' in item else dict(item, id=item['name']))  # some specs key by name
+    return entries
+
+
+def _tools(section: Any) -> Dict[str, AixTool]:
+    return {
+        str(item['id']): AixTool(str(item['id']), _text(item.get('name')) or '', _text(item.get('description')) or '',
+                                 _strings(item.get('capabilities')), _strings(item.get('permissions')))
+        for item in _entries(section, 'tools')
+    }
+
+
+def _apis(section: Any) -> Dict[str, AixApi]:
+    apis = {}
+    for item in _entries(section, 'apis'):
+        endpoints = tuple(
+            AixEndpoint(str(e.get('id', '')), _text(e.get('path')) or '', _text(e.get('method')) or '')
+            for e in item.get('endpoints') or () if isinstance(e, dict)
+        )
+        apis[str(item['id'])] = AixApi(str(item['id']), _text(item.get('name')) or '',
+                                       _text(item.get('base_url')) or '', _text(item.get('protocol')) or '',
+                                       _text(item.get('version')) or '', endpoints)
+    return apis
+
+
+# Loading
+
+_memory: Dict[str, Tuple[int, int, AixSpec]] = {}
+
+
+def loads(content: Union[str, bytes], path: str = '<string>') -> AixSpec:
+    """Parse AIX text (no caching)"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return _parse(content, path, hashlib.sha256(content).hexdigest())
+
+
+def load(path: Union[str, Path], cache_dir: Optional[Union[str, Path]] = DEFAULT_CACHE_DIR) -> AixSpec:
+    """Load an .aix file through the in-memory and on-disk caches (``cache_dir=None`` skips the disk)"""
+    path = str(path)
+    stat = os.stat(path)
+    cached = _memory.get(path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return _served(cached[2], path, 'memory')
+
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    spec = _read_cache(cache_dir, digest, path) if cache_dir else None
+    source = 'disk'
+    if spec is None:
+        spec = _parse(content, path, digest)
+        source = 'parsed'
+        if cache_dir:
+            _write_cache(cache_dir, digest, spec)
+    _memory[path] = (stat.st_mtime_ns, stat.st_size, spec)
+    return _served(spec, path, source)
+
+
+def clear_memory_cache():
+    _memory.clear()
+
+
+def _served(spec: AixSpec, path: str, source: str) -> AixSpec:
+    """A caller's own copy of a cached spec (the document itself is shared)"""
+    spec = copy.copy(spec)
+    spec.path = path
+    spec.source = source
+    return spec
+
+
+def _parse(content: bytes, path: str, digest: str) -> AixSpec:
+    try:
+        document = yaml.load(content, Loader=_YAML_LOADER)
+    except yaml.YAMLError as e:
+        raise AixError(f"{path}: invalid YAML: {e}") from e
+    if not isinstance(document, dict):
+        raise AixError(f"{path}: top level must be a mapping")
+    return AixSpec(path, digest, len(content), content.count(b'\n') + 1, document)
+
+
+def _cache_file(cache_dir: Union[str, Path], digest: str) -> Path:
+    return Path(cache_dir) / f"{digest}.v{CACHE_VERSION}.json"
+
+
+def _trusted(path: Union[str, Path]) -> bool:
+    """Owned by the current user and writable by nobody else (always true where there are no uids)"""
+    if not hasattr(os, 'getuid'):
+        return True
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_uid == os.getuid() and not st.st_mode & (stat_mode.S_IWGRP | stat_mode.S_IWOTH)
+
+
+def _read_cache(cache_dir: Union[str, Path], digest: str, path: str) -> Optional[AixSpec]:
+    cache_file = _cache_file(cache_dir, digest)
+    if not (_trusted(cache_dir) and _trusted(cache_file)):
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get('digest') != digest or not isinstance(entry.get('document'), dict):
+        return None
+    return AixSpec(path, digest, entry.get('size', 0), entry.get('lines', 0), entry['document'])
+
+
+def _write_cache(cache_dir: Union[str, Path], digest: str, spec: AixSpec):
+    """Atomic write; an unwritable cache only costs a re-parse next time"""
+    try:
+        data = json.dumps({'digest': digest, 'size': spec.size, 'lines': spec.lines, 'document': spec.document},
+                          ensure_ascii=False, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return  # dates, sets or binary: not plain JSON
+    if json.loads(data)['document'] != spec.document:
+        return  # non-string keys would come back as strings
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')  # created 0600
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, _cache_file(cache_dir, digest))
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Pattern Engine - batch sequence-pattern recognition (the pattern_analyzer tool)
+
+Classifies numeric sequences as constant, arithmetic, geometric, periodic,
+polynomial (degree 2 or 3), Fibonacci-like (second-order linear
+recurrence, ``x[n] = a*x[n-1] + b*x[n-2]``) or noise, with a confidence
+and a prediction of the next values:
+
+    from pattern_engine import classify
+    classify([[1, 1, 2, 3, 5, 8], [3, 9, 27, 81]])
+    # [PatternMatch('fibonacci', confidence=0.75, next=[13, 21, 34]), PatternMatch('geometric', ...)]
+
+Everything runs on whole batches. Sequences are right-aligned in a
+zero-padded 2-D array (the last value of every row is in the last column)
+with a validity mask, every model is fitted to every row with masked
+column operations, and each row takes the simplest model that fits:
+
+    constant < arithmetic < geometric < periodic < polynomial < fibonacci
+
+A model fits when the RMS of its residuals, relative to the row's own
+standard deviation, is at most ``tolerance`` and within ``slack`` times
+the best model's error (a Fibonacci tail is geometric to within 1e-4, but
+only the recurrence fits it exactly). Confidence multiplies the
+quality of the fit, ``exp(-error / tolerance)``, by the evidence,
+``1 - 0.5 ** support``, where support is the number of values beyond the
+ones needed to determine the model's parameters. Python only loops over
+models, candidate periods and prediction steps, never over sequences.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+KINDS = ('noise', 'constant', 'arithmetic', 'geometric', 'periodic', 'polynomial', 'fibonacci')
+NOISE, CONSTANT, ARITHMETIC, GEOMETRIC, PERIODIC, POLYNOMIAL, FIBONACCI = range(len(KINDS))
+
+MIN_LENGTH = 3
+
+
+class PatternMatch:
+    """Classification of one sequence"""
+
+    __slots__ = ('kind', 'confidence', 'error', 'params', 'next')
+
+    def __init__(self, kind: str, confidence: float, error: float, params: Dict[str, float], next: List[float]):
+        self.kind = kind
+        self.confidence = confidence
+        self.error = error
+        self.params = params
+        self.next = next
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"kind": self.kind, "confidence": self.confidence, "error": self.error,
+                "params": self.params, "next": self.next}
+
+    def __repr__(self):
+        return f"PatternMatch({self.kind!r}, confidence={self.confidence:.2f}, next={self.next})"
+
+
+class PatternBatch:
+    """Columnar results for a batch: one entry per row in every array"""
+
+    __slots__ = ('kind', 'confidence', 'error', 'params', 'predictions')
+
+    def __init__(self, kind: np.ndarray, confidence: np.ndarray, error: np.ndarray,
+                 params: np.ndarray, predictions: np.ndarray):
+        self.kind = kind                  # int8 index into KINDS
+        self.confidence = confidence      # 0..1
+        self.error = error                # relative RMS residual of the chosen model
+        self.params = params              # (n, 2), meaning depends on the kind (see _PARAMS)
+        self.predictions = predictions    # (n, predict)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def labels(self) -> List[str]:
+        return [KINDS[k] for k in self.kind]
+
+    def counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.kind, minlength=len(KINDS))
+        return {kind: int(n) for kind, n in zip(KINDS, counts) if n}
+
+    def match(self, i: int) -> PatternMatch:
+        kind = int(self.kind[i])
+        params = {name: _number(value) for name, value in zip(_PARAMS[kind], self.params[i])}
+        return PatternMatch(KINDS[kind], round(float(self.confidence[i]), 4), float(self.error[i]), params,
+                            [_number(v) for v in self.predictions[i]])
+
+    def matches(self) -> List[PatternMatch]:
+        return [self.match(i) for i in range(len(self))]
+
+
+# Parameter names stored in PatternBatch.params, per kind
+_PARAMS = {
+    NOISE: ('mean',),
+    CONSTANT: ('value',),
+    ARITHMETIC: ('difference',),
+    GEOMETRIC: ('ratio',),
+    PERIODIC: ('period',),
+    POLYNOMIAL: ('degree',),
+    FIBONACCI: ('a', 'b'),
+}
+
+
+def _number(value: float):
+    value = float(value)
+    return int(round(value)) if value.is_integer() or abs(value - round(value)) < 1e-9 else value
+
+
+def pad(sequences: Sequence[Sequence[float]], width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Right-align ragged sequences in a zero-padded (n, width) array; returns (values, lengths)
+
+    Longer sequences keep their last ``width`` values.
+    """
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+    width = width or int(lengths.max(initial=0))
+    lengths = np.minimum(lengths, width)
+    values = np.zeros((len(sequences), width))
+    for row, (sequence, n) in enumerate(zip(sequences, lengths)):
+        if n:
+            values[row, width - n:] = sequence[len(sequence) - n:]
+    return values, lengths
+
+
+def classify(sequences: Sequence[Sequence[float]], predict: int = 3, tolerance: float = 0.01,
+             max_period: int = 8, slack: float = 10.0) -> List[PatternMatch]:
+    """Classify ragged Python sequences (convenience wrapper around ``classify_batch``)"""
+    if not len(sequences):
+        return []
+    values, lengths = pad(sequences)
+    return classify_batch(values, lengths, predict, tolerance, max_period, slack).matches()
+
+
+def classify_batch(values: np.ndarray, lengths: Optional[np.ndarray] = None, predict: int = 3,
+                   tolerance: float = 0.01, max_period: int = 8, slack: float = 10.0) -> PatternBatch:
+    """Classify every row of a right-aligned (n, width) array (``lengths`` defaults to the full width)"""
+    x = np.asarray(values, dtype=np.float64)
+    n, width = x.shape
+    lengths = np.full(n, width) if lengths is None else np.asarray(lengths)
+    valid = np.arange(width) >= (width - lengths)[:, None]
+    count = np.maximum(lengths, 1)
+
+    mean = np.where(valid, x, 0.0).sum(axis=1) / count
+    spread = np.sqrt(np.where(valid, (x - mean[:, None]) ** 2, 0.0).sum(axis=1) / count)
+    # Relative errors are measured against the row's own spread (scale-free), never against zero
+    scale = np.maximum(spread, 1e-9 * (1.0 + np.abs(mean)))
+
+    # errors[k], support[k] and params[k] per model; rows a model cannot be fitted to get inf error
+    errors = np.full((len(KINDS), n), np.inf)
+    support = np.zeros((len(KINDS), n))
+    params = np.zeros((len(KINDS), n, 2))
+
+    # Lag-1 pairs: x[t-1] (prev) and x[t] (cur), valid where the earlier value is
+    prev, cur, pair = x[:, :-1], x[:, 1:], valid[:, :-1]
+    pairs = np.maximum(pair.sum(axis=1), 1)
+    diff = cur - prev
+
+    # constant and arithmetic: first differences around their mean
+    step = np.where(pair, diff, 0.0).sum(axis=1) / pairs
+    errors[CONSTANT] = _rms(diff, pair, pairs) / scale
+    errors[CONSTANT][spread > 1e-9 * (1.0 + np.abs(mean))] = np.inf
+    errors[ARITHMETIC] = _rms(diff - step[:, None], pair, pairs) / scale
+    support[CONSTANT] = lengths - 1
+    support[ARITHMETIC] = lengths - 2
+    params[CONSTANT, :, 0] = mean
+    params[ARITHMETIC, :, 0] = step
+
+    # geometric: least-squares ratio of consecutive values
+    energy = np.where(pair, prev * prev, 0.0).sum(axis=1)
+    ratio = np.where(pair, prev * cur, 0.0).sum(axis=1) / np.where(energy > 0, energy, 1.0)
+    errors[GEOMETRIC] = np.where(energy > 0, _rms(cur - ratio[:, None] * prev, pair, pairs) / scale, np.inf)
+    support[GEOMETRIC] = lengths - 2
+    params[GEOMETRIC, :, 0] = ratio
+
+    # periodic: smallest period p whose lag-p differences vanish, with at least one full repeat
+    best = np.full(n, np.inf)
+    period = np.zeros(n)
+    for p in range(2, min(max_period, width // 2) + 1):
+        lagged = valid[:, :-p]
+        m = np.maximum(lagged.sum(axis=1), 1)
+        err = np.where(lengths >= 2 * p, _rms(x[:, p:] - x[:, :-p], lagged, m) / scale, np.inf)
+        better = (best > tolerance) & (err < best)  # once a period fits, longer ones are its multiples
+        best = np.where(better, err, best)
+        period = np.where(better, p, period)
+    errors[PERIODIC] = best
+    support[PERIODIC] = lengths - period
+    params[PERIODIC, :, 0] = period
+
+    # polynomial: the (d+1)-th differences of a degree-d polynomial vanish
+    best = np.full(n, np.inf)
+    degree = np.zeros(n)
+    higher = diff
+    for d in (2, 3):
+        higher = higher[:, 1:] - higher[:, :-1]
+        lagged = valid[:, :-d]
+        m = np.maximum(lagged.sum(axis=1), 1)
+        level = np.where(lagged, higher, 0.0).sum(axis=1) / m
+        err = np.where(lengths >= d + 2, _rms(higher - level[:, None], lagged, m) / scale, np.inf)
+        better = (err < best) & (best > tolerance)
+        best = np.where(better, err, best)
+        degree = np.where(better, d, degree)
+    errors[POLYNOMIAL] = best
+    support[POLYNOMIAL] = lengths - degree - 1
+    params[POLYNOMIAL, :, 0] = degree
+
+    # Fibonacci-like: least-squares (a, b) of x[t] = a*x[t-1] + b*x[t-2], per row by a 2-column
+    # Gram-Schmidt QR (the normal equations lose the fit on growing tails, where x[t-1] ≈ r·x[t-2])
+    if width >= 3:
+        y, x1, x2, triple = x[:, 2:], x[:, 1:-1], x[:, :-2], valid[:, :-2]
+
+        def dot(u, v):
+            return np.where(triple, u * v, 0.0).sum(axis=1)
+
+        norm1 = np.sqrt(dot(x1, x1))
+        q1 = x1 / np.where(norm1 > 0, norm1, 1.0)[:, None]
+        r12 = dot(q1, x2)
+        w = x2 - r12[:, None] * q1
+        again = dot(q1, w)  # second orthogonalization pass (CGS2): w is tiny next to x2 on such tails
+        w -= again[:, None] * q1
+        r12 += again
+        norm2 = np.sqrt(dot(w, w))
+        solvable = (norm1 > 0) & (norm2 > 1e-12 * np.maximum(norm1, np.sqrt(dot(x2, x2))))
+        q2 = w / np.where(solvable, norm2, 1.0)[:, None]
+        b = np.where(solvable, dot(q2, y) / np.where(solvable, norm2, 1.0), 0.0)
+        a = (dot(q1, y) - r12 * b) / np.where(norm1 > 0, norm1, 1.0)
+        triples = np.maximum(triple.sum(axis=1), 1)
+
+        def error(a, b):
+            return _rms(y - a[:, None] * x1 - b[:, None] * x2, triple, triples) / scale
+
+        # Integer coefficients (the common case) when they fit at least as well
+        err, rounded_a, rounded_b = error(a, b), np.round(a), np.round(b)
+        rounded_err = error(rounded_a, rounded_b)
+        snap = rounded_err <= np.maximum(err, 1e-12)
+        a, b, err = np.where(snap, rounded_a, a), np.where(snap, rounded_b, b), np.where(snap, rounded_err, err)
+        errors[FIBONACCI] = np.where(solvable & (lengths >= 5), err, np.inf)
+        support[FIBONACCI] = lengths - 4
+        params[FIBONACCI, :, 0], params[FIBONACCI, :, 1] = a, b
+
+    # Pick the simplest model that fits and is not clearly beaten (KINDS order); noise otherwise
+    errors[:, lengths < MIN_LENGTH] = np.inf
+    eligible = support[1:] >= 1
+    best_error = np.where(eligible, errors[1:], np.inf).min(axis=0)
+    fits = eligible & (errors[1:] <= tolerance) & (errors[1:] <= best_error * slack + 1e-12)
+    kind = np.where(fits.any(axis=0), fits.argmax(axis=0) + 1, NOISE).astype(np.int8)
+    rows = np.arange(n)
+    quality = np.exp(-np.minimum(errors, 1e6) / tolerance)
+    evidence = 1.0 - 0.5 ** np.maximum(support, 0)
+    confidence = (quality * evidence)[kind, rows]
+    error = errors[kind, rows]
+    chosen = params[kind, rows]
+
+    # Noise: confident when nothing came close and there was enough data to tell
+    noise = kind == NOISE
+    closest = quality[1:].max(axis=0)
+    confidence = np.where(noise, (1.0 - closest) * (1.0 - 0.5 ** np.maximum(lengths - 2, 0)), confidence)
+    error = np.where(noise, np.minimum(errors[1:].min(axis=0), 1e6), error)
+    chosen[noise, 0], chosen[noise, 1] = mean[noise], 0.0
+
+    return PatternBatch(kind, confidence, error, chosen, _extrapolate(x, kind, chosen, predict))
+
+
+def _rms(residual: np.ndarray, mask: np.ndarray, count: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.where(mask, residual * residual, 0.0).sum(axis=1) / count)
+
+
+def _extrapolate(x: np.ndarray, kind: np.ndarray, params: np.ndarray, steps: int) -> np.ndarray:
+    """Next ``steps`` values of every row under its model (rows grouped by kind, not looped)"""
+    n, width = x.shape
+    out = np.zeros((n, steps))
+    if not steps or not n:
+        return out
+    horizon = np.arange(1, steps + 1)
+    last = x[:, -1]
+
+    rows = (kind == NOISE) | (kind == CONSTANT)
+    out[rows] = params[rows, :1]
+    rows = kind == ARITHMETIC
+    out[rows] = last[rows, None] + params[rows, :1] * horizon
+    rows = kind == GEOMETRIC
+    out[rows] = last[rows, None] * params[rows, :1] ** horizon
+
+    # periodic: the value one period back, read from the (right-aligned) last period
+    rows = np.flatnonzero(kind == PERIODIC)
+    if len(rows):
+        p = params[rows, 0].astype(np.int64)[:, None]
+        out[rows] = x[rows[:, None], width - p + (horizon - 1) % p]
+
+    # Recurrences run step by step over all their rows at once
+    rows = np.flatnonzero(kind == FIBONACCI)
+    if len(rows):
+        a, b = params[rows, 0], params[rows, 1]
+        p2, p1 = x[rows, -2], x[rows, -1]
+        for step in range(steps):
+            p2, p1 = p1, a * p1 + b * p2
+            out[rows, step] = p1
+    for degree, coefficients in ((2, (3.0, -3.0, 1.0)), (3, (4.0, -6.0, 4.0, -1.0))):
+        rows = np.flatnonzero((kind == POLYNOMIAL) & (params[:, 0] == degree))
+        if not len(rows):
+            continue
+        window = [x[rows, -1 - j] for j in range(degree + 1)]  # newest first
+        for step in range(steps):
+            value = sum(c * w for c, w in zip(coefficients, window))
+            window = [value] + window[:-1]
+            out[rows, step] = value
+    return out
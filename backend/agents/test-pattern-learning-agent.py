@@ -4,10 +4,12 @@ Pattern Learning Agent - Test Script (Python Version)
 Tests the Pattern Learning Mega Agent capabilities
 """
 
-import os
-import re
+import time
 from pathlib import Path
 
+from aix_loader import AixError, load
+from validate_aix import REQUIRED_SECTIONS
+
 # ANSI color codes
 class Colors:
     RESET = '\033[0m'
@@ -50,46 +52,34 @@ def test_load_aix_file():
             error('AIX file not found!')
             return False
         
-        with open(aix_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        lines = len(content.split('\n'))
+        start = time.perf_counter()
+        spec = load(aix_path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
         
         success('AIX file loaded successfully')
-        info(f'File size: {len(content)} bytes')
-        info(f'Lines: {lines}')
+        info(f'File size: {spec.size} bytes')
+        info(f'Lines: {spec.lines}')
+        info(f'Load time: {elapsed_ms:.2f}ms ({spec.source})')
         
-        return {'content': content, 'lines': lines}
+        return {'spec': spec, 'lines': spec.lines}
+    except AixError as e:
+        error(f'Invalid AIX file: {str(e)}')
+        return False
     except Exception as e:
         error(f'Failed to load AIX file: {str(e)}')
         return False
 
 # Test 2: Validate AIX Structure
-def test_validate_structure(content):
+def test_validate_structure(spec):
     header('TEST 2: Validate AIX Structure')
     
-    required_sections = [
-        '$schema',
-        'version',
-        'genome',
-        'meta:',
-        'identity:',
-        'intelligence:',
-        'interaction:',
-        'workflow:',
-        'apis:',
-        'mcp_tools:',
-        'security:',
-        'monitoring:',
-        'dna_scoring:',
-        'deployment:'
-    ]
+    required_sections = REQUIRED_SECTIONS
     
     passed = 0
     failed = 0
     
     for section in required_sections:
-        if section in content:
+        if spec.has_section(section):
             success(f'Section found: {section}')
             passed += 1
         else:
@@ -101,7 +91,7 @@ def test_validate_structure(content):
     return failed == 0
 
 # Test 3: Extract Agent Capabilities
-def test_extract_capabilities(content):
+def test_extract_capabilities(spec):
     header('TEST 3: Extract Agent Capabilities')
     
     capabilities = {
@@ -115,12 +105,11 @@ def test_extract_capabilities(content):
         'mega_intelligence': None
     }
     
-    # Extract power levels
+    # Power levels declared under intelligence.*.power_levels
     for cap in capabilities.keys():
-        pattern = rf'{cap}:\s*(\d+)'
-        match = re.search(pattern, content, re.IGNORECASE)
-        if match:
-            capabilities[cap] = int(match.group(1))
+        level = spec.power(cap)
+        if level is not None:
+            capabilities[cap] = int(level)
             success(f'{cap}: {capabilities[cap]}/100')
     
     # Calculate average
@@ -132,7 +121,7 @@ def test_extract_capabilities(content):
     return capabilities
 
 # Test 4: Extract MCP Tools
-def test_extract_mcp_tools(content):
+def test_extract_mcp_tools(spec):
     header('TEST 4: Extract MCP Tools')
     
     tools = [
@@ -145,7 +134,7 @@ def test_extract_mcp_tools(content):
     
     found = 0
     for tool in tools:
-        if tool in content:
+        if spec.tool(tool):
             success(f'Tool found: {tool}')
             found += 1
         else:
@@ -156,7 +145,7 @@ def test_extract_mcp_tools(content):
     return found == len(tools)
 
 # Test 5: Extract API Endpoints
-def test_extract_apis(content):
+def test_extract_apis(spec):
     header('TEST 5: Extract API Endpoints')
     
     apis = [
@@ -167,7 +156,7 @@ def test_extract_apis(content):
     
     found = 0
     for api in apis:
-        if api in content:
+        if spec.api(api):
             success(f'API found: {api}')
             found += 1
         else:
@@ -178,13 +167,12 @@ def test_extract_apis(content):
     return found == len(apis)
 
 # Test 6: Extract DNA Score
-def test_extract_dna_score(content):
+def test_extract_dna_score(spec):
     header('TEST 6: Extract DNA Score')
     
-    match = re.search(r'total:\s*(\d+\.?\d*)', content, re.IGNORECASE)
+    score = spec.dna_score
     
-    if match:
-        score = float(match.group(1))
+    if score is not None:
         success(f'DNA Score: {score}/100')
         
         if score >= 95:
@@ -203,24 +191,39 @@ def test_extract_dna_score(content):
 
 # Test 7: Pattern Recognition Simulation
 def test_pattern_recognition():
-    header('TEST 7: Pattern Recognition Simulation')
+    header('TEST 7: Pattern Recognition')
     
-    info('Simulating pattern recognition...')
+    try:
+        from pattern_engine import classify
+    except ImportError as e:
+        error(f'Pattern engine unavailable: {e} (pip install numpy)')
+        return False
     
     patterns = [
-        ([1, 2, 3, 4, 5], 'Linear'),
-        ([2, 4, 6, 8, 10], 'Even Numbers'),
-        ([1, 1, 2, 3, 5, 8], 'Fibonacci'),
-        ([10, 20, 30, 40, 50], 'Multiples of 10')
+        ([1, 2, 3, 4, 5], 'Linear', 'arithmetic'),
+        ([2, 4, 6, 8, 10], 'Even Numbers', 'arithmetic'),
+        ([1, 1, 2, 3, 5, 8], 'Fibonacci', 'fibonacci'),
+        ([10, 20, 30, 40, 50], 'Multiples of 10', 'arithmetic'),
+        ([3, 9, 27, 81, 243], 'Powers of 3', 'geometric'),
+        ([1, 4, 9, 16, 25], 'Squares', 'polynomial'),
+        ([1, 2, 3, 1, 2, 3, 1, 2], 'Repeating', 'periodic'),
+        ([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5], 'Digits of pi', 'noise'),
     ]
     
-    for idx, (pattern, ptype) in enumerate(patterns, 1):
+    matches = classify([pattern for pattern, _, _ in patterns])
+    passed = 0
+    for idx, ((pattern, ptype, expected), match) in enumerate(zip(patterns, matches), 1):
         pattern_str = ', '.join(map(str, pattern))
-        success(f'Pattern {idx}: {ptype} - {pattern_str}')
+        detail = f'{match.kind} ({match.confidence:.0%}), next: {match.next}'
+        if match.kind == expected:
+            success(f'Pattern {idx}: {ptype} - {pattern_str} → {detail}')
+            passed += 1
+        else:
+            error(f'Pattern {idx}: {ptype} - {pattern_str} → {detail}, expected {expected}')
     
-    info('\n✨ Pattern recognition simulation complete!')
+    info(f'\nRecognized {passed}/{len(patterns)} patterns')
     
-    return True
+    return passed == len(patterns)
 
 # Main Test Runner
 def run_tests():
@@ -241,28 +244,28 @@ def run_tests():
         results['failed'] += 1
     
     if aix_data:
-        if test_validate_structure(aix_data['content']):
+        if test_validate_structure(aix_data['spec']):
             results['passed'] += 1
         else:
             results['failed'] += 1
         
-        capabilities = test_extract_capabilities(aix_data['content'])
+        capabilities = test_extract_capabilities(aix_data['spec'])
         if capabilities:
             results['passed'] += 1
         else:
             results['failed'] += 1
         
-        if test_extract_mcp_tools(aix_data['content']):
+        if test_extract_mcp_tools(aix_data['spec']):
             results['passed'] += 1
         else:
             results['failed'] += 1
         
-        if test_extract_apis(aix_data['content']):
+        if test_extract_apis(aix_data['spec']):
             results['passed'] += 1
         else:
             results['failed'] += 1
         
-        dna_score = test_extract_dna_score(aix_data['content'])
+        dna_score = test_extract_dna_score(aix_data['spec'])
         if dna_score:
             results['passed'] += 1
         else:
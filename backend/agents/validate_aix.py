@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+AIX Validator - check every agent spec in the catalog
+
+Validates all ``.aix`` files under one or more directories (default: all
+of ``backend/`` plus the top-level ``agents/`` catalog, skipping
+dependency, cache and VCS directories) with the same required-section
+rules as the pattern-learning test, plus schema checks on the fields the
+tooling reads:
+
+    python validate_aix.py                  # human summary, exit 1 on errors
+    python validate_aix.py --json           # machine-readable report on stdout
+    python validate_aix.py --report out.json --jobs 8 --strict
+    python validate_aix.py backend/aix_tasks agents
+
+- Files are validated in a process pool, each worker going through the
+  cached loader (aix_loader), so a spec is parsed at most once per change.
+- A manifest records each file's size, mtime and SHA-256 with its result;
+  files whose content has not changed since the last run (and under the
+  same rules) are reported from the manifest without being opened again.
+- Specs declaring ``genome`` or ``$schema`` must carry every required
+  section. Other documents (persona and plan files) only need ``meta``;
+  the missing genome sections are reported as a warning.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from aix_loader import DEFAULT_CACHE_DIR, AixError, AixSpec, load
+
+# Bump whenever a rule changes so every file is validated again
+RULES_VERSION = 1
+
+REQUIRED_SECTIONS = (
+    '$schema',
+    'version',
+    'genome',
+    'meta',
+    'identity',
+    'intelligence',
+    'interaction',
+    'workflow',
+    'apis',
+    'mcp_tools',
+    'security',
+    'monitoring',
+    'dna_scoring',
+    'deployment',
+)
+
+HTTP_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS',
+                'WS_CONNECT', 'WS_SEND', 'WS_BROADCAST'}
+
+# Below this many files a pool costs more to start than it saves
+MIN_PARALLEL_FILES = 8
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Every place specs live: the whole backend and the repository's agents/ catalog
+DEFAULT_ROOTS = tuple(p for p in (BACKEND_DIR, BACKEND_DIR.parent / 'agents') if p.is_dir())
+
+# Never descended into while looking for specs (hidden directories are skipped too)
+SKIP_DIRS = frozenset({'node_modules', '__pycache__', 'venv', 'dist', 'build', 'coverage'})
+
+
+def check_spec(spec: AixSpec) -> Dict[str, List[str]]:
+    """Section and schema rules for one parsed spec"""
+    errors: List[str] = []
+    warnings: List[str] = []
+    genome = spec.has_section('genome') or spec.has_section('$schema')
+
+    missing = [section for section in REQUIRED_SECTIONS if not spec.has_section(section)]
+    if genome:
+        errors.extend(f"missing section: {section}" for section in missing)
+    else:
+        if not spec.has_section('meta'):
+            errors.append("missing section: meta")
+        if missing:
+            warnings.append(f"not a genome spec ({len(missing)} of {len(REQUIRED_SECTIONS)} sections missing)")
+
+    # meta
+    if spec.has_section('meta'):
+        if not isinstance(spec.document.get('meta'), dict):
+            errors.append("meta: must be a mapping")
+        else:
+            if not (spec.meta.get('id') or spec.meta.get('name')):
+                (errors if genome else warnings).append("meta: no id or name")
+            version = spec.meta.get('version')
+            if version is not None and not isinstance(version, (str, int, float)):
+                errors.append("meta.version: must be a string")
+            elif version is None and genome:
+                warnings.append("meta.version: missing")
+
+    # intelligence.*.power_levels
+    for block, value in (spec.get('intelligence') or {}).items() if isinstance(spec.get('intelligence'), dict) else ():
+        levels = value.get('power_levels') if isinstance(value, dict) else None
+        if levels is None:
+            continue
+        if not isinstance(levels, dict):
+            errors.append(f"intelligence.{block}.power_levels: must be a mapping")
+            continue
+        for name, level in levels.items():
+            if isinstance(level, bool) or not isinstance(level, (int, float)) or not 0 <= level <= 100:
+                errors.append(f"intelligence.{block}.power_levels.{name}: must be a number in 0-100")
+
+    # mcp_tools
+    tools = spec.get('mcp_tools')
+    if tools is not None and not isinstance(tools, (dict, list)):
+        errors.append("mcp_tools: must be a mapping or a list")
+    elif isinstance(tools, dict) and isinstance(tools.get('tools'), list):
+        for i, tool in enumerate(tools['tools']):
+            if not isinstance(tool, dict) or 'id' not in tool:
+                errors.append(f"mcp_tools.tools[{i}]: needs an id")
+
+    # apis
+    apis = spec.get('apis')
+    if apis is not None and not isinstance(apis, (dict, list)):
+        errors.append("apis: must be a mapping or a list")
+    for api in spec.apis.values():
+        for endpoint in api.endpoints:
+            if not endpoint.path:
+                errors.append(f"apis.{api.id}.{endpoint.id or '?'}: endpoint needs a path")
+            if endpoint.method and endpoint.method.upper() not in HTTP_METHODS:
+                errors.append(f"apis.{api.id}.{endpoint.id or endpoint.path}: unknown method {endpoint.method}")
+    ids = [api.get('id') for api in apis if isinstance(api, dict) and 'id' in api] if isinstance(apis, list) else []
+    for dup in sorted({i for i in ids if ids.count(i) > 1}, key=str):
+        errors.append(f"apis: duplicate id {dup}")
+
+    # dna_scoring
+    if spec.has_section('dna_scoring'):
+        if spec.dna_score is None:
+            (errors if genome else warnings).append("dna_scoring: no numeric total")
+        elif not 0 <= spec.dna_score <= 100:
+            errors.append("dna_scoring.total: must be in 0-100")
+        for name, value in spec.dna_breakdown.items():
+            if not 0 <= value <= 100:
+                errors.append(f"dna_scoring.breakdown.{name}: must be in 0-100")
+
+    return {"errors": errors, "warnings": warnings}
+
+
+def validate_file(path: str, cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Load and check one file (runs in a pool worker)"""
+    start = time.perf_counter()
+    try:
+        spec = load(path, cache_dir)
+    except (AixError, OSError) as e:
+        return {"ok": False, "profile": None, "errors": [str(e)], "warnings": [],
+                "sha256": _digest(path), "ms": round((time.perf_counter() - start) * 1000, 2)}
+    result = check_spec(spec)
+    return dict(result,
+                ok=not result["errors"],
+                profile='genome' if spec.has_section('genome') or spec.has_section('$schema') else 'basic',
+                id=spec.id,
+                sha256=spec.digest,
+                ms=round((time.perf_counter() - start) * 1000, 2))
+
+
+def _digest(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def default_manifest(roots: Sequence[Path]) -> Path:
+    key = hashlib.sha1('\n'.join(sorted(str(r.resolve()) for r in roots)).encode()).hexdigest()[:16]
+    return DEFAULT_CACHE_DIR / f"validation-{key}.json"
+
+
+def find_specs(roots: Sequence[Path]) -> List[str]:
+    """Every .aix file under ``roots`` (each once), skipping ``SKIP_DIRS`` and hidden directories"""
+    found = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+            found.update(os.path.realpath(os.path.join(dirpath, name))
+                         for name in filenames if name.endswith('.aix'))
+    return sorted(found)
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get("files", {}) if manifest.get("rules") == RULES_VERSION else {}
+
+
+def write_manifest(path: Path, files: Dict[str, Any]):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"rules": RULES_VERSION, "files": files}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"warning: could not write manifest {path}: {e}", file=sys.stderr)
+
+
+def validate_catalog(roots: Union[Path, Sequence[Path]] = DEFAULT_ROOTS, jobs: Optional[int] = None,
+                     manifest_path: Optional[Path] = None, use_manifest: bool = True) -> Dict[str, Any]:
+    """Validate every .aix file under ``roots``, skipping files unchanged since the manifest"""
+    start = time.perf_counter()
+    roots = [Path(roots)] if isinstance(roots, (str, Path)) else [Path(r) for r in roots]
+    # Results are keyed relative to the directory all roots share
+    root = Path(os.path.commonpath([os.path.realpath(r) for r in roots]))
+    manifest_path = manifest_path or default_manifest(roots)
+    previous = read_manifest(manifest_path) if use_manifest else {}
+    files = find_specs(roots)
+
+    results: Dict[str, Any] = {}
+    entries: Dict[str, Any] = {}
+    pending: List[str] = []
+    for path in files:
+        rel = os.path.relpath(path, root)
+        stat = os.stat(path)
+        fingerprint = [stat.st_size, stat.st_mtime_ns]
+        entry = previous.get(rel)
+        if entry and entry["stat"] == fingerprint:
+            results[rel], entries[rel] = dict(entry["result"], cached=True), entry
+            continue
+        if entry and entry["result"].get("sha256") == _digest(path):
+            # Touched but unchanged: keep the result, refresh the fingerprint
+            results[rel] = dict(entry["result"], cached=True)
+            entries[rel] = dict(entry, stat=fingerprint)
+            continue
+        pending.append(path)
+
+    cache_dir = str(DEFAULT_CACHE_DIR)
+    if len(pending) >= MIN_PARALLEL_FILES and (jobs or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(pending) // ((jobs or os.cpu_count() or 1) * 4))
+            validated = list(pool.map(validate_file, pending, [cache_dir] * len(pending), chunksize=chunksize))
+    else:
+        validated = [validate_file(path, cache_dir) for path in pending]
+
+    for path, result in zip(pending, validated):
+        rel = os.path.relpath(path, root)
+        stat = os.stat(path)
+        results[rel] = dict(result, cached=False)
+        entries[rel] = {"stat": [stat.st_size, stat.st_mtime_ns], "result": result}
+    if use_manifest:
+        write_manifest(manifest_path, entries)
+
+    ordered = {rel: results[rel] for rel in sorted(results)}
+    return {
+        "root": str(root),
+        "roots": [str(r) for r in roots],
+        "rules_version": RULES_VERSION,
+        "files": len(ordered),
+        "validated": len(pending),
+        "skipped": len(ordered) - len(pending),
+        "passed": sum(1 for r in ordered.values() if r["ok"]),
+        "failed": sum(1 for r in ordered.values() if not r["ok"]),
+        "errors": sum(len(r["errors"]) for r in ordered.values()),
+        "warnings": sum(len(r["warnings"]) for r in ordered.values()),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        "results": ordered,
+    }
+
+
+def print_summary(report: Dict[str, Any]):
+    for rel, result in report["results"].items():
+        mark = '✅' if result["ok"] else '❌'
+        note = ' (unchanged)' if result["cached"] else ''
+        print(f"{mark} {rel}{note}")
+        for message in result["errors"]:
+            print(f"     error: {message}")
+        for message in result["warnings"]:
+            print(f"     warning: {message}")
+    print(f"\n{report['files']} files: {report['passed']} passed, {report['failed']} failed, "
+          f"{report['warnings']} warnings ({report['validated']} validated, {report['skipped']} unchanged) "
+          f"in {report['elapsed_ms']:.0f}ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Validate every .aix agent spec")
+    parser.add_argument('roots', nargs='*', type=Path,
+                        help="directories to scan recursively (default: backend/ and the top-level agents/)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--manifest', type=Path, default=None,
+                        help="hash manifest path (default: in the AIX cache directory)")
+    parser.add_argument('--no-manifest', action='store_true', help="validate every file, ignore the manifest")
+    parser.add_argument('--report', type=Path, help="also write the JSON report to this file")
+    parser.add_argument('--json', action='store_true', help="print the JSON report instead of a summary")
+    parser.add_argument('--strict', action='store_true', help="fail on warnings too")
+    args = parser.parse_args(argv)
+    for root in args.roots:
+        if not root.is_dir():
+            parser.error(f"not a directory: {root}")
+
+    report = validate_catalog(args.roots or DEFAULT_ROOTS, args.jobs, args.manifest, not args.no_manifest)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_summary(report)
+    return 1 if report["failed"] or (args.strict and report["warnings"]) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
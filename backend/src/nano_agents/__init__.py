@@ -0,0 +1,8 @@
+"""
+🤖 Nano agents: client SDK and the sample agents built on it
+"""
+
+from .batching import BatchingSender, unpack
+from .client import MeshConnection, NanoAgent, TaskError, handles, on_task
+
+__all__ = ['BatchingSender', 'MeshConnection', 'NanoAgent', 'TaskError', 'handles', 'on_task', 'unpack']
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+📦 Client-side batching for nano agents
+
+Opt-in helper that collects actions for a short window and sends them to
+the NanoCoordinator as one ``batch`` frame, so a bursty agent pays the
+per-frame cost (parse, registry update, commit, fan-out) once per batch
+instead of once per action:
+
+    batcher = BatchingSender(websocket, "NanoResearcher", window_ms=10)
+    await batcher.send("search: quantum computing")
+    ...
+    await batcher.close()
+
+A batch goes out when ``max_batch`` actions are pending or ``window_ms``
+after its first action, whichever comes first. A lone action is sent as
+a plain frame. Sending a batch also opts the connection into coalesced
+batch envelopes (``{"type": "batch", "relays": [...]}``), which
+``unpack`` flattens back into individual relays.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BatchingSender:
+    """Coalesces actions sent within ``window_ms`` into one batch frame"""
+
+    def __init__(self, websocket, agent: str, window_ms: float = 10.0, max_batch: int = 100,
+                 dumps: Callable[[Any], Any] = json.dumps):
+        self.websocket = websocket
+        self.agent = agent
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.dumps = dumps
+        self.frames_sent = 0
+        self.actions_sent = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: Optional[asyncio.Task] = None
+
+    async def send(self, action: str, **fields):
+        """Queue one action (stamped now); flushes when the batch is full"""
+        self._pending.append({"action": action, "sent_at": time.time() * 1000, **fields})
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.window, self._flush_later)
+
+    async def flush(self):
+        """Send everything pending now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        items, self._pending = self._pending, []
+        if len(items) == 1:
+            frame = dict(items[0], agent=self.agent)
+        else:
+            frame = {"agent": self.agent, "type": "batch", "actions": items}
+        await self.websocket.send(self.dumps(frame))
+        self.frames_sent += 1
+        self.actions_sent += len(items)
+
+    async def close(self):
+        """Flush what is left (call before closing the connection)"""
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+    def _flush_later(self):
+        self._timer = None
+        self._flushing = asyncio.ensure_future(self.flush())
+
+
+def unpack(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Relays carried by a received frame: the relays of a batch envelope, or the frame itself"""
+    if data.get('type') == 'batch':
+        return data.get('relays') or []
+    return [data]
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+🛰️ Client SDK for nano agents
+
+Subclass ``NanoAgent``, declare topics / capabilities and handlers, and
+run it; the SDK owns the connection to the NanoCoordinator:
+
+    class Researcher(NanoAgent):
+        topics = ["analyzing:"]
+        capabilities = ["research"]
+
+        @handles("analyzing:")
+        async def on_analysis(self, relay):
+            ...
+
+        @on_task("research")
+        async def research(self, payload, task):
+            return {"findings": [...]}
+
+        async def main(self):
+            self.send("search: quantum computing")
+
+    asyncio.run(Researcher("NanoResearcher").run())
+
+- ``send()`` never blocks: frames go to a local outbox that a writer task
+  drains, so an outage only buffers (up to ``outbox_size`` frames,
+  dropping the oldest) and nothing is lost across a reconnect.
+- Actions queued for the same agent are coalesced into one ``batch``
+  frame; ``batch_ms`` adds a linger window for bursty agents.
+- ``send(action, priority="high")`` puts an action in a priority lane
+  (``control``, ``high``, ``normal``, ``bulk``). It is only batched with
+  actions of the same priority, and it goes out ahead of queued
+  lower-priority actions.
+- Lost connections are re-established with exponential backoff and full
+  jitter; subscriptions, capabilities and registrations are replayed
+  before the outbox is flushed, then each agent resumes from the last
+  relay offset it saw and the coordinator streams what it missed.
+- Relays are dispatched to the handler with the longest matching action
+  prefix (``""`` catches everything). Handlers may be plain functions or
+  coroutines; each agent runs its handlers in arrival order in a task of
+  its own, so a slow handler (or one awaiting ``request()``) never holds
+  up the connection's reader or its other agents. At most
+  ``relay_backlog`` relays wait per agent; past that the oldest are
+  dropped.
+- Compressed frames may inflate to ``max_frame_bytes``; a larger one is
+  dropped rather than decompressed.
+- ``request()`` submits a load-balanced task and awaits the answer.
+- A ``throttled`` notice from the coordinator pauses outgoing actions for
+  its ``retry_after_ms`` (control and task frames still go out).
+
+Many agents can share one ``MeshConnection``; it then registers them as
+multiplexed logical agents and routes each relay by its ``"to"`` list:
+
+    connection = MeshConnection()
+    fleet = [Researcher(f"researcher-{i}", connection=connection) for i in range(200)]
+    asyncio.run(connection.run())
+"""
+
+import asyncio
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+import websockets
+
+from nano_mesh import codecs
+
+from .batching import unpack
+
+logger = logging.getLogger('NanoAgent')
+
+DEFAULT_URI = "ws://localhost:8765"
+
+_CONTROL_TYPES = ('subscribe', 'capabilities', 'register')
+_URGENT = ('control', 'high')
+
+
+class TaskError(Exception):
+    """A task submitted with ``request()`` failed (``task_error`` from the coordinator)"""
+
+    def __init__(self, reply: Dict[str, Any]):
+        super().__init__(reply.get('error'))
+        self.reply = reply
+
+
+def handles(prefix: str):
+    """Mark a ``NanoAgent`` method as the handler for relays starting with ``prefix``"""
+    def mark(func):
+        func._nano_prefixes = getattr(func, '_nano_prefixes', ()) + (prefix,)
+        return func
+    return mark
+
+
+def on_task(capability: str):
+    """Mark a ``NanoAgent`` method as the handler for tasks of ``capability``"""
+    def mark(func):
+        func._nano_capability = capability.lower()
+        return func
+    return mark
+
+
+async def _call(handler: Callable, *args):
+    result = handler(*args)
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+
+class NanoAgent:
+    """Base class for nano agents: declare topics, capabilities and handlers, then ``run()``"""
+
+    topics: Optional[Sequence[str]] = None  # None: receive every relay
+    capabilities: Sequence[str] = ()
+    max_inflight = 4
+    relay_backlog = 10000  # relays waiting for a busy handler before the oldest are dropped
+
+    def __init__(self, name: str, uri: str = DEFAULT_URI, connection: Optional['MeshConnection'] = None,
+                 **connection_options):
+        self.name = name
+        self.connection = connection or MeshConnection(uri, **connection_options)
+        self._handlers: Dict[str, Callable] = {}
+        self._task_handlers: Dict[str, Callable] = {}
+        self._running_tasks: Dict[str, asyncio.Task] = {}
+        self._relays: Deque[Any] = deque()  # (handler, relay) waiting for _handle_relays
+        self._relay_task: Optional[asyncio.Task] = None
+        self.relays_dropped = 0
+        self._request_ids = itertools.count(1)
+        self.last_offset: Optional[int] = None  # newest relay-log offset received
+        for attr in dir(type(self)):
+            method = getattr(self, attr, None)
+            for prefix in getattr(method, '_nano_prefixes', ()):
+                self.on(prefix, method)
+            capability = getattr(method, '_nano_capability', None)
+            if capability is not None:
+                self._task_handlers[capability] = method
+        self.connection.attach(self)
+
+    # Behaviour hooks
+
+    async def main(self):
+        """The agent's own activity; it keeps receiving after this returns"""
+
+    async def on_connect(self):
+        """Called after every (re)connect, once subscriptions are in place"""
+
+    def on(self, prefix: str, handler: Optional[Callable] = None):
+        """Register a relay handler for an action prefix (usable as a decorator)"""
+        if handler is None:
+            return lambda func: self.on(prefix, func) or func
+        self._handlers[prefix.lower()] = handler
+        return handler
+
+    # Sending
+
+    def send(self, action: str, **fields):
+        """Queue an action for the mesh (stamped now, never blocks)"""
+        self.connection.enqueue({"agent": self.name, "action": action,
+                                 "sent_at": self.connection.now_ms(), **fields})
+
+    async def request(self, capability: str, payload: Any = None, timeout: float = 30.0, **options) -> Any:
+        """Submit a load-balanced task and return its result (raises ``TaskError``)"""
+        request_id = f"{self.name}#{next(self._request_ids)}"
+        future = asyncio.get_running_loop().create_future()
+        self.connection.requests[request_id] = future
+        self.connection.enqueue({"agent": self.name, "type": "task", "id": request_id,
+                                 "capability": capability, "payload": payload, **options})
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        finally:
+            self.connection.requests.pop(request_id, None)
+        if reply.get('type') == 'task_error':
+            raise TaskError(reply)
+        return reply.get('result')
+
+    async def run(self):
+        """Run this agent (and its connection) until cancelled"""
+        await self.connection.run()
+
+    # Dispatch (called by the connection)
+
+    def control_frames(self) -> List[Dict[str, Any]]:
+        frames = []
+        if self.topics is not None:
+            frames.append({"agent": self.name, "type": "subscribe", "topics": list(self.topics),
+                           "batch": True})
+        if self.capabilities:
+            frames.append({"agent": self.name, "type": "capabilities",
+                           "capabilities": list(self.capabilities), "max_inflight": self.max_inflight})
+        return frames
+
+    async def dispatch(self, data: Dict[str, Any]):
+        kind = data.get('type')
+        if kind is None and 'relay' in data:
+            offset = data.get('offset')
+            if offset is not None and (self.last_offset is None or offset > self.last_offset):
+                self.last_offset = offset
+            handler = self._match(data['relay'])
+            if handler is not None:
+                if len(self._relays) >= self.relay_backlog:
+                    self._relays.popleft()
+                    self.relays_dropped += 1
+                self._relays.append((handler, data))
+                if self._relay_task is None or self._relay_task.done():
+                    self._relay_task = asyncio.ensure_future(self._handle_relays())
+        elif kind == 'task':
+            self._running_tasks[data['task_id']] = asyncio.ensure_future(self._run_task(data))
+        elif kind == 'task_cancel':
+            task = self._running_tasks.pop(data.get('task_id'), None)
+            if task is not None:
+                task.cancel()
+        elif kind == 'agent_taken':
+            logger.warning(f"[{self.name}] name taken over by another connection")
+        elif kind == 'rejected':
+            logger.error(f"[{self.name}] rejected by the coordinator ({data.get('reason')})")
+        elif kind == 'replay_done':
+            if data.get('offset', 0) > data.get('next_offset', 0):
+                self.last_offset = data['next_offset'] - 1  # the coordinator's log started over
+            logger.info(f"[{self.name}] caught up: {data.get('replayed', 0)} missed relays replayed"
+                        f"{' (older ones expired)' if data.get('truncated') else ''}")
+
+    def _match(self, action: str) -> Optional[Callable]:
+        action = action.lower()
+        best = None
+        for prefix, handler in self._handlers.items():
+            if action.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+                best = (prefix, handler)
+        return best[1] if best else None
+
+    async def _handle_relays(self):
+        """Run queued relay handlers one at a time, in arrival order"""
+        while self._relays:
+            handler, relay = self._relays.popleft()
+            try:
+                await _call(handler, relay)
+            except Exception as e:
+                logger.error(f"[{self.name}] handler for {relay['relay'][:40]!r} failed: {e}")
+
+    def _stop(self):
+        """Cancel the relay handlers and running tasks (the connection stopped)"""
+        self._relays.clear()
+        if self._relay_task is not None:
+            self._relay_task.cancel()
+        for task in list(self._running_tasks.values()):
+            task.cancel()
+
+    async def _run_task(self, task: Dict[str, Any]):
+        reply = {"agent": self.name, "type": "task_result", "task_id": task['task_id']}
+        handler = self._task_handlers.get(str(task.get('capability', '')).lower())
+        try:
+            if handler is None:
+                reply["error"] = "unsupported_capability"
+            else:
+                reply["result"] = await _call(handler, task.get('payload'), task)
+        except asyncio.CancelledError:
+            return  # the coordinator already has an answer
+        except Exception as e:
+            logger.error(f"[{self.name}] task {task['task_id']} failed: {e}")
+            reply["error"] = str(e) or type(e).__name__
+        finally:
+            self._running_tasks.pop(task['task_id'], None)
+        self.connection.enqueue(reply)
+
+
+class MeshConnection:
+    """Coordinator connection shared by one or more agents: reconnect, outbox, writer, reader"""
+
+    def __init__(self, uri: str = DEFAULT_URI, codec: str = 'json', outbox_size: int = 10000,
+                 batch_ms: float = 0.0, max_batch: int = 100, backoff_min: float = 0.5,
+                 backoff_max: float = 30.0, max_frame_bytes: int = 16 * codecs.MAX_FRAME_BYTES):
+        self.uri = uri
+        self.codec = codecs.get(codec)
+        self.outbox_size = outbox_size
+        self.batch_ms = batch_ms
+        self.max_batch = max_batch
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        # Coalesced envelopes from the coordinator can be larger than one client frame
+        self.max_frame_bytes = max_frame_bytes
+        self.agents: Dict[str, NanoAgent] = {}
+        self.requests: Dict[str, asyncio.Future] = {}
+        self.connected = asyncio.Event()
+        self._outbox: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+        self._resume_at = 0.0  # loop time before which actions are held back (throttled)
+
+        self.frames_sent = 0
+        self.actions_sent = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.throttled = 0
+        self.oversized = 0
+
+    def attach(self, agent: NanoAgent):
+        self.agents[agent.name] = agent
+
+    @property
+    def multiplexed(self) -> bool:
+        return len(self.agents) > 1
+
+    @staticmethod
+    def now_ms() -> float:
+        return time.time() * 1000
+
+    def enqueue(self, frame: Dict[str, Any]):
+        """Buffer a frame until the writer sends it (drops the oldest when full)"""
+        if len(self._outbox) >= self.outbox_size:
+            self._outbox.popleft()
+            self.dropped += 1
+        if frame.get('priority') in _URGENT and self._outbox and 'type' not in frame:
+            # Ahead of every queued action of a lower priority, behind control frames and its peers
+            for i, queued in enumerate(self._outbox):
+                if 'type' not in queued and queued.get('priority') not in _URGENT:
+                    self._outbox.insert(i, frame)
+                    break
+            else:
+                self._outbox.append(frame)
+        else:
+            self._outbox.append(frame)
+        self._ready.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected.is_set(),
+            "agents": len(self.agents),
+            "queued": len(self._outbox),
+            "frames_sent": self.frames_sent,
+            "actions_sent": self.actions_sent,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "throttled": self.throttled,
+            "oversized": self.oversized,
+        }
+
+    async def run(self):
+        """Keep the connection up and run every attached agent's ``main()``"""
+        mains = [asyncio.ensure_future(agent.main()) for agent in self.agents.values()]
+        try:
+            await self._connection_loop()
+        finally:
+            for task in mains:
+                task.cancel()
+            for agent in self.agents.values():
+                agent._stop()
+
+    async def _connection_loop(self):
+        attempt = 0
+        subprotocols = [self.codec.subprotocol] if self.codec is not codecs.JSON else None
+        while True:
+            try:
+                async with websockets.connect(self.uri, subprotocols=subprotocols,
+                                              max_size=self.max_frame_bytes) as websocket:
+                    attempt = 0
+                    await self._session(websocket)
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                logger.warning(f"Connection to {self.uri} lost ({type(e).__name__}: {e})")
+            finally:
+                self.connected.clear()
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_min * 2 ** attempt))
+            attempt += 1
+            self.reconnects += 1
+            logger.info(f"Reconnecting in {delay:.2f}s ({len(self._outbox)} frames buffered)")
+            await asyncio.sleep(delay)
+
+    async def _session(self, websocket):
+        # Replay registrations before anything buffered goes out
+        handshake = []
+        if self.multiplexed:
+            handshake.append({"type": "register", "agents": list(self.agents)})
+        for agent in self.agents.values():
+            handshake.extend(agent.control_frames())
+        # Catch up on the relays missed while disconnected (after subscribing: topics filter the replay)
+        offsets = {name: agent.last_offset + 1 for name, agent in self.agents.items()
+                   if agent.last_offset is not None}
+        if offsets and self.multiplexed:
+            handshake.append({"type": "resume", "offsets": offsets})
+        elif offsets:
+            name, offset = next(iter(offsets.items()))
+            handshake.append({"agent": name, "type": "resume", "offset": offset})
+        for frame in handshake:
+            await websocket.send(self.codec.encode(frame))
+        self.connected.set()
+        logger.info(f"Connected to {self.uri} ({len(self.agents)} agents)")
+        for agent in self.agents.values():
+            await agent.on_connect()
+
+        writer = asyncio.ensure_future(self._write(websocket))
+        try:
+            async for frame in websocket:
+                try:
+                    data = codecs.decode_frame(frame, self.codec, max_size=self.max_frame_bytes)
+                except codecs.FrameTooLarge as e:
+                    self.oversized += 1
+                    logger.warning(f"Dropped an oversized frame from {self.uri}: {e}")
+                    continue
+                await self._read(data)
+                if writer.done():
+                    break
+        finally:
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+        writer_error = not writer.cancelled() and writer.exception()
+        if writer_error:
+            raise writer_error
+
+    async def _read(self, data: Dict[str, Any]):
+        kind = data.get('type')
+        if kind in ('task_result', 'task_error'):
+            future = self.requests.get(data.get('id'))
+            if future is not None and not future.done():
+                future.set_result(data)
+            return
+        if kind == 'throttled':
+            self.throttled += data.get('dropped', 0)
+            self._resume_at = asyncio.get_running_loop().time() + data.get('retry_after_ms', 0) / 1000
+            logger.warning(f"[{data.get('agent')}] throttled ({data.get('reason')}): "
+                           f"{data.get('dropped', 0)} actions dropped, pausing {data.get('retry_after_ms', 0)}ms")
+            return
+        for item in unpack(data):
+            names = item.get('to') or list(self.agents)[:1]
+            for name in names:
+                agent = self.agents.get(name)
+                if agent is not None:
+                    await agent.dispatch(item)
+
+    async def _write(self, websocket):
+        """Drain the outbox, coalescing queued actions of one agent into batch frames"""
+        while True:
+            if not self._outbox:
+                self._ready.clear()
+                await self._ready.wait()
+            pause = self._resume_at - asyncio.get_running_loop().time()
+            if pause > 0 and 'type' not in self._outbox[0]:
+                await asyncio.sleep(pause)
+            if self.batch_ms and len(self._outbox) < self.max_batch:
+                await asyncio.sleep(self.batch_ms / 1000)
+            items = self._take()
+            if len(items) == 1:
+                frame = items[0]
+            else:
+                frame = {"agent": items[0]["agent"], "type": "batch",
+                         "actions": [{k: v for k, v in item.items() if k != 'agent'} for item in items]}
+                if 'priority' in items[0]:
+                    frame["priority"] = items[0]["priority"]
+            try:
+                await websocket.send(self.codec.encode(frame))
+            except Exception:
+                self._outbox.extendleft(reversed(items))  # resend after reconnecting
+                raise
+            self.frames_sent += 1
+            self.actions_sent += len(items)
+
+    def _take(self) -> List[Dict[str, Any]]:
+        """Next frame's worth of items: a run of plain actions from one agent (and priority), or one control frame"""
+        first = self._outbox.popleft()
+        items = [first]
+        if 'type' in first:
+            return items
+        while (self._outbox and len(items) < self.max_batch and 'type' not in self._outbox[0]
+               and self._outbox[0]['agent'] == first['agent']
+               and self._outbox[0].get('priority') == first.get('priority')):
+            items.append(self._outbox.popleft())
+        return items
@@ -5,58 +5,61 @@ Connects to NanoCoordinator for distributed analysis tasks
 """
 
 import asyncio
-import json
-import websockets
 import logging
+import os
+import sys
+
+if __package__ in (None, ''):  # run as a script: make the nano_agents package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nano_agents.client import NanoAgent, TaskError, handles
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('NanoAnalyst')
 
-async def nano_analyst():
+
+class NanoAnalyst(NanoAgent):
     """Simple analysis agent that connects to coordinator"""
-    uri = "ws://localhost:8765"
-    
-    async with websockets.connect(uri) as websocket:
+
+    # Only receive research traffic, not every relay in the mesh
+    topics = ["search:", "analyze:", "synthesize:"]
+
+    actions = [
+        "analyze: user behavior patterns",
+        "analyze: travel trends",
+        "calculate: budget optimization",
+        "detect: anomalies",
+        "generate: insights report"
+    ]
+
+    async def on_connect(self):
         logger.info("📊 NanoAnalyst connected to coordinator")
-        
-        # Send analysis actions
-        actions = [
-            "analyze: user behavior patterns",
-            "analyze: travel trends",
-            "calculate: budget optimization",
-            "detect: anomalies",
-            "generate: insights report"
-        ]
-        
-        # Listen for other agents
-        async def listen():
-            async for message in websocket:
-                data = json.loads(message)
-                logger.info(f"📨 Received from {data['from']}: {data['relay']}")
-                
-                # React to research findings
-                if "research" in data['relay'].lower():
-                    response = json.dumps({
-                        "agent": "NanoAnalyst",
-                        "action": f"analyzing: {data['relay']}"
-                    })
-                    await websocket.send(response)
-        
-        # Send messages
-        async def send():
-            await asyncio.sleep(1)  # Start after researcher
-            for action in actions:
-                message = json.dumps({
-                    "agent": "NanoAnalyst",
-                    "action": action
-                })
-                await websocket.send(message)
-                logger.info(f"📤 Sent: {action}")
-                await asyncio.sleep(3)
-        
-        # Run both tasks
-        await asyncio.gather(listen(), send())
 
-if __name__ == '__main__':
-    asyncio.run(nano_analyst())
+    @handles("")
+    def react(self, relay):
+        logger.info(f"📨 Received from {relay['from']}: {relay['relay']}")
+
+        # React to research findings
+        if "research" in relay['relay'].lower():
+            self.send(f"analyzing: {relay['relay']}")
+
+    async def research_trends(self):
+        # Hand research to whichever research agent is least loaded
+        try:
+            result = await self.request("research", {"query": "travel trends"}, timeout=10,
+                                        timeout_ms=5000, hedge_ms=1000)
+            logger.info(f"🎯 Task travel-trends: {result}")
+        except (TaskError, asyncio.TimeoutError) as e:
+            logger.info(f"🎯 Task travel-trends failed: {e or 'timeout'}")
 
+    async def main(self):
+        await asyncio.sleep(1)  # Start after researcher
+        asyncio.ensure_future(self.research_trends())
+        for action in self.actions:
+            self.send(action)
+            logger.info(f"📤 Sent: {action}")
+            await asyncio.sleep(3)
+
+
+if __name__ == '__main__':
+    asyncio.run(NanoAnalyst("NanoAnalyst").run())
@@ -5,49 +5,55 @@ Connects to NanoCoordinator for distributed research tasks
 """
 
 import asyncio
-import json
-import websockets
 import logging
+import os
+import sys
+
+if __package__ in (None, ''):  # run as a script: make the nano_agents package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nano_agents.client import NanoAgent, handles, on_task
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('NanoResearcher')
 
-async def nano_researcher():
+
+class NanoResearcher(NanoAgent):
     """Simple research agent that connects to coordinator"""
-    uri = "ws://localhost:8765"
-    
-    async with websockets.connect(uri) as websocket:
+
+    # Only receive analysis results, not every relay in the mesh
+    topics = ["analyzing:", "generate:", "detect:"]
+    # Accept load-balanced research tasks from the coordinator
+    capabilities = ["research"]
+    max_inflight = 4
+
+    actions = [
+        "search: quantum computing",
+        "search: AI agents",
+        "search: topology networks",
+        "analyze: research papers",
+        "synthesize: findings"
+    ]
+
+    async def on_connect(self):
         logger.info("🔬 NanoResearcher connected to coordinator")
-        
-        # Send research actions
-        actions = [
-            "search: quantum computing",
-            "search: AI agents",
-            "search: topology networks",
-            "analyze: research papers",
-            "synthesize: findings"
-        ]
-        
-        # Listen for other agents
-        async def listen():
-            async for message in websocket:
-                data = json.loads(message)
-                logger.info(f"📨 Received from {data['from']}: {data['relay']}")
-        
-        # Send messages
-        async def send():
-            for i, action in enumerate(actions):
-                message = json.dumps({
-                    "agent": "NanoResearcher",
-                    "action": action
-                })
-                await websocket.send(message)
-                logger.info(f"📤 Sent: {action}")
-                await asyncio.sleep(2)
-        
-        # Run both tasks
-        await asyncio.gather(listen(), send())
 
-if __name__ == '__main__':
-    asyncio.run(nano_researcher())
+    @handles("")
+    def log_relay(self, relay):
+        logger.info(f"📨 Received from {relay['from']}: {relay['relay']}")
+
+    @on_task("research")
+    def research(self, payload, task):
+        query = (payload or {}).get('query', '')
+        logger.info(f"🎯 Task {task['task_id']} from {task['from']}: research {query}")
+        return {"query": query, "findings": [f"search: {query}"]}
+
+    async def main(self):
+        for action in self.actions:
+            self.send(action)
+            logger.info(f"📤 Sent: {action}")
+            await asyncio.sleep(2)
 
+
+if __name__ == '__main__':
+    asyncio.run(NanoResearcher("NanoResearcher").run())
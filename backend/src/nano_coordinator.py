@@ -8,22 +8,49 @@ A lightweight orchestrator that connects multiple nanoagents via a
 quantum-inspired message bus for emergent distributed intelligence.
 
 Features:
-- <150 lines of code
+- Small core: subsystems live in nano_mesh/
 - <50ms message latency
 - Quantum-like entangled communication
 - Adaptive reward system
-- SQLite persistence
+- SQLite persistence (write-behind, batched WAL commits, dictionary-encoded rows)
 - WebSocket real-time messaging
+- Coordination HTTP API (cached snapshots, pooled read-only SQLite)
+- Multiplexed connections (many logical agents per socket)
+- Admission control, per-agent / global rate limits, lag-driven load shedding
+- Sampled per-stage tracing, on-demand profiling, opt-in slow-callback counters
+- Append-only relay log: reconnecting agents resume from their last offset
+- Priority lanes (control / high / normal / bulk) for processing and delivery
 """
 
 import asyncio
 import json
-import sqlite3
+import os
+import signal
+import time
 import websockets
 from datetime import datetime
-from typing import Dict, Set
+from typing import Dict, List
 import logging
 
+from nano_mesh import codecs, schema
+from nano_mesh.admission import TRY_AGAIN_LATER, AdmissionController
+from nano_mesh.analytics import AVAILABLE as ANALYTICS_AVAILABLE, RewardAnalytics
+from nano_mesh.api import CoordinationAPI, ReadPool
+from nano_mesh.graph import InteractionGraph
+from nano_mesh.lanes import BULK, CONTROL, HIGH, LANES, NORMAL, Inbound, LaneQueue, lane_of
+from nano_mesh.outbox import AgentOutbox
+from nano_mesh.metrics import MeshMetrics, serve_metrics, wall_clock_ms
+from nano_mesh.registry import UPSERT_SQL, AgentRegistry
+from nano_mesh.relaylog import RelayLog
+from nano_mesh.retention import RetentionPolicy
+from nano_mesh.rollups import Rollups
+from nano_mesh.routing import TopicRouter
+from nano_mesh.schema import MemoryCodec
+from nano_mesh.persistence import WriteBehindWriter, connect
+from nano_mesh.sharding import ShardBus, run_sharded
+from nano_mesh.tasks import DISPATCH_SHARD, FRAME_TYPES as TASK_FRAMES, TaskDispatcher, task_priority
+from nano_mesh.tracing import HotPathTracer
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -34,25 +61,118 @@ logger = logging.getLogger('NanoCoordinator')
 class NanoCoordinator:
     """Minimal quantum-inspired agent coordinator"""
     
-    def __init__(self, host='localhost', port=8765):
+    def __init__(self, host='localhost', port=8765, db_path='nano_memory.db',
+                 durability='normal', flush_batch_size=500, flush_interval_ms=50,
+                 metrics_port=9090, send_queue_size=1024, send_policy='drop-oldest',
+                 agent_send_policies: Dict[str, str] = None, snapshot_interval=5.0,
+                 reward_alpha=0.1, max_memories=10000, memory_ttl=86400, retention_interval=60.0,
+                 permessage_deflate=True, shard_id=0, shards=1, bus_dir=None,
+                 task_timeout=30.0, task_retries=2, api_port=8766, api_cache_ttl=1.0, read_pool_size=4,
+                 interaction_half_life=300.0, reward_function='step', analytics_interval=5.0,
+                 max_agents=1000, max_connections=None, agent_rate_limit=None, global_rate_limit=None,
+                 lag_target_ms=50.0, trace_sample_rate=0.01, trace_path=None, slow_callback_ms=None,
+                 profile_dir=None, relay_log_dir='nano_relay_log', relay_log_bytes=256 * 1024 * 1024,
+                 relay_log_ttl=86400.0, lane_mode='weighted', lane_max_wait=0.5,
+                 priority_topics: Dict[str, str] = None, inbound_limit=256, process_slice_ms=2.0,
+                 max_verbs=4096):
         self.host = host
         self.port = port
+        self.metrics_port = metrics_port
+        self.api_port = api_port
+        self.db_path = db_path
+        self.durability = durability
         self.agents: Dict[str, websockets.WebSocketServerProtocol] = {}
+        self.shard_id = shard_id
+        self.shards = shards
+        self.retention = RetentionPolicy(max_memories, memory_ttl, shard=shard_id, shards=shards)
+        self.retention_interval = retention_interval
+        self.memory_codec = MemoryCodec(shard_id, shards, max_verbs)
+        self.outboxes: Dict[str, AgentOutbox] = {}  # logical agent → its connection's outbox
+        self.connections: Dict[object, AgentOutbox] = {}  # websocket → outbox
+        self.name_takeovers = 0
+        self.send_queue_size = send_queue_size
+        self.send_policy = send_policy
+        self.agent_send_policies = dict(agent_send_policies or {})
+        self.disconnected_slow_consumers = 0
+        self.permessage_deflate = permessage_deflate
+        self.router = TopicRouter()
+        self.broadcast_messages = 0
+        self.graph = InteractionGraph(interaction_half_life, receives=self.router.subscribed)
+        self.tracer = HotPathTracer(trace_sample_rate, slow_callback_ms, trace_path, profile_dir)
+        
+        # Relay log: every delivered relay gets an offset; reconnecting agents catch up from it.
+        # A relative directory lives next to the database, not in the working directory.
+        if relay_log_dir:
+            relay_log_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), relay_log_dir)
+            if shards > 1:
+                relay_log_dir = os.path.join(relay_log_dir, f"shard-{shard_id}")
+        self.relay_log = RelayLog(relay_log_dir, max_bytes=relay_log_bytes,
+                                  max_age=relay_log_ttl) if relay_log_dir else None
+        self.live_from: Dict[str, int] = {}  # agent → first offset delivered live since it attached
+        self.replays = 0
+        
+        # Priority lanes: readers queue decoded frames, _process_loop handles them lane by lane
+        self.lane_mode = lane_mode
+        self.lane_max_wait = lane_max_wait
+        self.inbound = LaneQueue(mode=lane_mode, max_wait=lane_max_wait)
+        self._inbound_ready = asyncio.Event()
+        self.inbound_limit = inbound_limit
+        self.process_slice = process_slice_ms / 1000
+        self.priority_topics = dict(priority_topics or {})  # action prefix → lane name
+        self.lane_router = TopicRouter()
+        for prefix, lane in self.priority_topics.items():
+            self.lane_router.subscribe(LANES[lane_of(lane)], [prefix])
+        
+        # Admission: connection ceiling, token buckets and overload shedding (limits split across shards)
+        self.admission = AdmissionController(
+            max_agents=max_agents,
+            max_connections=-(-(max_connections or max_agents) // shards),
+            agent_rate=agent_rate_limit,
+            global_rate=global_rate_limit / shards if global_rate_limit else None,
+            lag_target_ms=lag_target_ms,
+        )
+        self.tasks = TaskDispatcher(self._send_task_frame, self._agent_reward,
+                                    default_timeout=task_timeout, default_retries=task_retries)
         self.db = self._init_database()
+        self.writer = WriteBehindWriter(
+            db_path,
+            batch_size=flush_batch_size,
+            flush_interval=flush_interval_ms / 1000,
+            durability=durability,
+            on_reject=self.memory_codec.discard,
+        )
+        self.metrics = MeshMetrics()
+        self.registry = AgentRegistry(reward_alpha)
+        self.snapshot_interval = snapshot_interval
+        loaded = self.registry.load(self.db)
+        if loaded:
+            logger.info(f"🗂️ Restored {loaded} agents from registry")
+        self.rollups = Rollups()
+        self.rollups.load(self.db)
+        
+        # reward_tracker: vectorized per-agent scoring (needs numpy, otherwise histogram rewards)
+        self.analytics = RewardAnalytics(reward=reward_function) if ANALYTICS_AVAILABLE else None
+        self.analytics_interval = analytics_interval
+        
+        # Coordination API: dashboards read through a TTL cache and a read-only pool
+        self.read_pool = ReadPool(db_path, read_pool_size)
+        self.api = CoordinationAPI(self, self.read_pool, cache_ttl=api_cache_ttl)
+        
+        # Sharded mode: agent directory and peer state shared over the shard bus
+        self.directory: Dict[str, int] = {}
+        self.shard_router = TopicRouter()
+        self.peer_stats: Dict[int, dict] = {}
+        self._published_topics = None
+        self.advertised: Dict[str, dict] = {}  # local agents' capabilities, re-sent when the dispatch shard reconnects
+        self.bus = ShardBus(shard_id, shards, bus_dir, self._on_bus_message,
+                            self._on_peer_up, self._on_peer_down) if shards > 1 else None
         logger.info(f"🧠 NanoCoordinator initialized on {host}:{port}")
     
     def _init_database(self):
         """Initialize SQLite memory database"""
-        db = sqlite3.connect('nano_memory.db')
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS memory (
-                ts TEXT,
-                agent TEXT,
-                action TEXT,
-                reward REAL,
-                latency_ms REAL
-            )
-        ''')
+        db = connect(self.db_path, self.durability)
+        # Dictionary-encoded memory_log plus the ``memory`` view (migrates a legacy table)
+        schema.create(db, self.memory_codec.max_verbs)
         db.execute('''
             CREATE TABLE IF NOT EXISTS agent_registry (
                 agent TEXT PRIMARY KEY,
@@ -62,7 +182,10 @@ class NanoCoordinator:
                 avg_reward REAL
             )
         ''')
+        Rollups.create_tables(db)
         db.commit()
+        self.retention.prepare(db)
+        self.memory_codec.load(db)
         logger.info("✅ Database initialized")
         return db
     
@@ -77,134 +200,1111 @@ class NanoCoordinator:
         else:
             return 0.4
     
-    def _register_agent(self, agent_name: str):
-        """Register or update agent in registry"""
-        now = datetime.now().isoformat()
-        cursor = self.db.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO agent_registry 
-            (agent, first_seen, last_seen, message_count, avg_reward)
-            VALUES (?, COALESCE((SELECT first_seen FROM agent_registry WHERE agent=?), ?), ?, 
-                    COALESCE((SELECT message_count FROM agent_registry WHERE agent=?), 0) + 1,
-                    COALESCE((SELECT avg_reward FROM agent_registry WHERE agent=?), 1.0))
-        ''', (agent_name, agent_name, now, now, agent_name, agent_name))
-        self.db.commit()
-    
-    async def handle_message(self, websocket, path):
-        """Handle incoming messages from nano-agents"""
-        agent_name = None
+    def _register_agent(self, agent_name: str, reward: float):
+        """Register or update agent in the in-memory registry (snapshotted periodically)"""
+        self.registry.record(agent_name, reward)
+    
+    def flush_registry(self):
+        """Queue a snapshot of every changed registry entry for the writer thread"""
+        for row in self.registry.snapshot():
+            self.writer.submit(UPSERT_SQL, row)
+    
+    def flush_rollups(self):
+        """Queue the per-minute rollup deltas for the writer thread"""
+        for sql, params in self.rollups.drain():
+            self.writer.submit(sql, params)
+    
+    async def _retention_loop(self):
+        """Periodically expire memory and rollups past their TTL (runs on the writer thread)"""
+        while True:
+            await asyncio.sleep(self.retention_interval)
+            for sql, params in self.retention.sweep():
+                self.writer.submit(sql, params)
+    
+    async def _analytics_loop(self):
+        """Periodically rescore every agent from the columnar analytics buffers"""
+        while True:
+            await asyncio.sleep(self.analytics_interval)
+            try:
+                await self.analytics.refresh()
+            except Exception as e:
+                logger.error(f"❌ Analytics pass failed: {e}")
+    
+    async def _snapshot_loop(self):
+        """Periodically persist the in-memory registry and rollups, and prune decayed state"""
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            self.flush_registry()
+            self.flush_rollups()
+            self.graph.prune()
+            self.admission.prune()
+            self.tracer.flush()
+            if self.relay_log is not None:
+                self.relay_log.enforce()
+    
+    async def handle_message(self, websocket, path=None):
+        """Read frames from one connection into the priority lanes (``_process_loop`` handles them)"""
+        outbox = None
+        inbound = Inbound(self.inbound_limit)
+        codec = codecs.get(websocket.subprotocol)
+        
+        # Past the connection ceiling: wait in the admission queue, or be told to come back later
+        if not await self.admission.admit_connection():
+            logger.warning("🚦 Connection rejected: coordinator at capacity")
+            await websocket.close(TRY_AGAIN_LATER, 'coordinator at capacity')
+            return
         try:
             # Register connection
             async for message in websocket:
-                start_time = asyncio.get_event_loop().time()
-                
-                # Parse message
-                data = json.loads(message)
-                agent_name = data.get('agent', 'unknown')
-                action = data.get('action', 'none')
+                loop = asyncio.get_event_loop()
+                received_at = loop.time()
+                received_wall_ms = wall_clock_ms()
+                trace = self.tracer.begin()  # None unless this message is sampled
                 
-                # Register agent
-                self.agents[agent_name] = websocket
-                self._register_agent(agent_name)
-                
-                # Calculate latency
-                latency_ms = (asyncio.get_event_loop().time() - start_time) * 1000
-                reward = self._calculate_reward(latency_ms)
-                
-                # Log action
-                logger.info(f"[{agent_name}] → {action} (latency: {latency_ms:.2f}ms, reward: {reward:.2f})")
+                # Parse message with the codec negotiated at connect time (bounded decompression)
+                try:
+                    data = codecs.decode_frame(message, codec)
+                except codecs.FrameTooLarge as e:
+                    logger.warning(f"[{outbox.name if outbox else None}] {e}: closing the connection")
+                    await websocket.close(codecs.MESSAGE_TOO_BIG, 'frame too large')
+                    break
+                if trace is not None:
+                    trace.mark('decode')
                 
-                # Store in memory
-                self.db.execute('''
-                    INSERT INTO memory (ts, agent, action, reward, latency_ms)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (datetime.now().isoformat(), agent_name, action, reward, latency_ms))
-                self.db.commit()
+                # One send queue per connection, however many logical agents it hosts
+                if outbox is None:
+                    outbox = self._open_connection(websocket, codec, data)
                 
-                # Quantum-like broadcast (entangled communication)
-                await self._broadcast_message(agent_name, action, latency_ms, reward)
+                # Stop reading while this connection already has inbound_limit frames waiting
+                await inbound.reserve()
+                self.inbound.push(self._lane(data), (outbox, inbound, data, received_wall_ms, trace), received_at)
+                self._inbound_ready.set()
                 
         except websockets.exceptions.ConnectionClosed:
-            logger.info(f"[{agent_name}] disconnected")
+            logger.info(f"[{outbox.name if outbox else None}] disconnected")
         except Exception as e:
             logger.error(f"Error handling message: {e}")
         finally:
-            # Cleanup
-            if agent_name and agent_name in self.agents:
-                del self.agents[agent_name]
+            # Cleanup every logical agent this connection still owns, once its queued frames are done
+            inbound.hung_up = True
+            if outbox is not None and not inbound.pending:
+                self._close_connection(outbox)
+            self.admission.release_connection()
+    
+    def _lane(self, data: dict) -> int:
+        """Priority lane of an inbound frame"""
+        kind = data.get('type')
+        if kind is not None and kind != 'batch':
+            return CONTROL  # registration, subscriptions, resume, task traffic
+        lane = lane_of(data.get('priority'), -1)
+        if lane < 0:
+            lanes = self.lane_router.match(str(data.get('action', ''))) if self.priority_topics else ()
+            lane = min(lane_of(name) for name in lanes) if lanes else NORMAL
+        return lane
+    
+    async def _process_loop(self):
+        """Handle queued frames lane by lane, yielding to the readers and writers every ``process_slice``"""
+        loop = asyncio.get_running_loop()
+        inbound = self.inbound
+        while True:
+            while not inbound:
+                self._inbound_ready.clear()
+                await self._inbound_ready.wait()
+            deadline = loop.time() + self.process_slice
+            while inbound:
+                now = loop.time()
+                lane, received_at, (outbox, connection, data, received_wall_ms, trace) = inbound.pop(now)
+                self.metrics.record_lane('queue', lane, (now - received_at) * 1000)
+                if trace is not None:
+                    trace.mark('queue')
+                try:
+                    self._process_frame(outbox, data, lane, received_at, received_wall_ms, trace)
+                except Exception as e:
+                    logger.error(f"Error handling message: {e}")
+                done_at = loop.time()
+                self.metrics.record_lane('handle', lane, (done_at - received_at) * 1000)
+                if connection.done():
+                    self._close_connection(outbox)  # hung up while these frames were queued
+                if done_at >= deadline:
+                    break
+            await asyncio.sleep(0)
+    
+    def _backlog_ms(self) -> float:
+        """How long the oldest frame in the processing lanes has waited"""
+        return self.inbound.oldest(asyncio.get_event_loop().time()) * 1000
+    
+    def _process_frame(self, outbox: AgentOutbox, data: dict, lane: int, received_at: float,
+                       received_wall_ms: float, trace=None):
+        """Handle one frame from a connection"""
+        loop = asyncio.get_event_loop()
+        
+        # Multiplexing: one connection registers many logical agent ids
+        if data.get('type') in ('register', 'unregister'):
+            self._handle_registration(outbox, data)
+            return
+        
+        # Catch-up after a reconnect: stream the relays missed since the given offset(s)
+        if data.get('type') == 'resume':
+            self._handle_resume(outbox, data)
+            return
+        
+        agent_name = data.get('agent', 'unknown')
+        action = schema.action_text(data.get('action', 'none'))  # non-string actions travel as JSON text
+        sent_at = data.get('sent_at')
+        
+        # Register agent (no-op while this connection owns the name; refused past max_agents)
+        if not self._attach_agent(agent_name, outbox):
+            return
+        if trace is not None:
+            trace.mark('attach')
+        
+        # Subscription control frames are not relayed or stored
+        if data.get('type') in ('subscribe', 'unsubscribe'):
+            self._handle_subscription(agent_name, data)
+            return
+        
+        # Task request/reply frames go to the dispatcher (distribute_task); submissions pay admission
+        if data.get('type') in TASK_FRAMES:
+            if data['type'] == 'task' and not self._admit_task(agent_name, data):
+                return
+            self._task_frame(agent_name, data)
+            return
+        
+        # Many actions in one frame: processed and relayed as a unit
+        if data.get('type') == 'batch':
+            actions = data.get('actions') or ()
+            admitted = self._admit(agent_name, len(actions), lane)
+            if admitted:
+                if admitted < len(actions):
+                    data = dict(data, actions=actions[:admitted])
+                if trace is not None:
+                    trace.mark('admit')
+                self._handle_batch(agent_name, data, received_at, received_wall_ms, trace, lane)
+            return
+        
+        # Rate limits and overload shedding, before any fan-out or persistence work
+        if not self._admit(agent_name, 1, lane):
+            return
+        if trace is not None:
+            trace.mark('admit')
+        
+        # Sender → coordinator latency from the sender's stamp (0 if unstamped)
+        ingress_ms = self.metrics.ingress_ms(sent_at, received_wall_ms)
+        processed_at = loop.time()
+        relay_latency_ms = (ingress_ms or 0.0) + (processed_at - received_at) * 1000
+        
+        # Quantum-like broadcast (entangled communication)
+        self._broadcast_message(agent_name, action, relay_latency_ms,
+                                self._agent_reward(agent_name), sent_at,
+                                broadcast=data.get('mode') == 'broadcast', lane=lane)
+        fanned_out_at = loop.time()
+        if trace is not None:
+            trace.mark('relay')
+        
+        # End-to-end latency: sender stamp → fan-out enqueued (queue wait is the 'delivery' stage)
+        latency_ms = (ingress_ms or 0.0) + (fanned_out_at - received_at) * 1000
+        reward = self._calculate_reward(latency_ms)
+        self._register_agent(agent_name, reward)
+        self.rollups.record(agent_name, latency_ms, reward)
+        self.graph.react(agent_name)
+        if self.analytics is not None:
+            self.analytics.record(agent_name, latency_ms, reward)
+        if trace is not None:
+            trace.mark('account')
+        
+        # Log action
+        logger.info(f"[{agent_name}] → {action} (latency: {latency_ms:.2f}ms, reward: {reward:.2f})")
+        if trace is not None:
+            trace.mark('log')
+        
+        # Store in memory (ring slot, flushed in batches by the writer thread)
+        statements = []
+        row = self.memory_codec.encode(time.time_ns() // 1000, agent_name, action, reward, latency_ms, statements)
+        statements.append(self.retention.insert(row))
+        self.writer.submit_many(statements)
+        persisted_at = loop.time()
+        if trace is not None:
+            trace.mark('persist')
+        
+        stages = {
+            "process": (processed_at - received_at) * 1000,
+            "fanout": (fanned_out_at - processed_at) * 1000,
+            "persist": (persisted_at - fanned_out_at) * 1000,
+            "e2e": latency_ms,
+        }
+        if ingress_ms is not None:
+            stages["ingress"] = ingress_ms
+        self.metrics.record_message(agent_name, stages)
+        if trace is not None:
+            trace.mark('metrics')
+            self.tracer.finish(trace, agent_name)
+    
+    def _open_connection(self, websocket, codec, data: dict) -> AgentOutbox:
+        """Give a connection its own bounded send queue and writer task"""
+        name = data.get('agent') or next(iter(data.get('agents') or ()), 'unknown')
+        policy = self.agent_send_policies.get(name, self.send_policy)
+        outbox = AgentOutbox(name, websocket, self.send_queue_size, policy,
+                             on_delivered=self.metrics.record_delivery, codec=codec,
+                             lane_mode=self.lane_mode, lane_max_wait=self.lane_max_wait)
+        self.connections[websocket] = outbox
+        return outbox
+    
+    def _close_connection(self, outbox: AgentOutbox):
+        for agent_name in list(outbox.agents):
+            self._detach_agent(agent_name, outbox)
+        self.connections.pop(outbox.websocket, None)
+        if outbox.disconnected_slow:
+            self.disconnected_slow_consumers += 1
+        outbox.close()
+    
+    def _attach_agent(self, agent_name: str, outbox: AgentOutbox) -> bool:
+        """Bind a logical agent name to a connection (the newest connection wins the name)"""
+        current = self.outboxes.get(agent_name)
+        if current is outbox:
+            return True
+        if agent_name not in self.directory and not self.admission.admit_agent(len(self.directory)):
+            if self.admission.should_notify(agent_name):
+                logger.warning(f"[{agent_name}] rejected: mesh is at max_agents ({self.admission.max_agents})")
+                msg = {"type": "rejected", "agent": agent_name, "reason": "max_agents"}
+                if outbox.multiplexed:
+                    msg["to"] = [agent_name]
+                outbox.put(outbox.codec.encode(msg), shed=False)
+            return False
+        if current is not None:
+            # The name moved to another connection (e.g. a reconnect): tell the old one
+            self._detach_agent(agent_name, current)
+            current.put(current.codec.encode({"type": "agent_taken", "agent": agent_name}), shed=False)
+            self.name_takeovers += 1
+            logger.warning(f"[{agent_name}] taken over by a new connection")
+        self.agents[agent_name] = outbox.websocket
+        self.outboxes[agent_name] = outbox
+        if self.relay_log is not None:
+            self.live_from[agent_name] = self.relay_log.next_offset
+        outbox.agents.add(agent_name)
+        self.router.attach(agent_name)
+        self.directory[agent_name] = self.shard_id
+        if self.bus is not None:
+            self.bus.publish(('join', agent_name))
+            self._publish_topics()
+        return True
+    
+    def _admit(self, agent_name: str, n: int = 1, lane: int = NORMAL) -> int:
+        """How many of ``n`` actions to process; the sender hears about the rest (at most once a second)"""
+        admitted = self.admission.admit(agent_name, n, sheddable=lane > HIGH)
+        if admitted < n and self.admission.should_notify(agent_name):
+            self._send_control(agent_name, {
+                "type": "throttled",
+                "agent": agent_name,
+                "reason": "overload" if self.admission.overloaded else "rate_limit",
+                "dropped": n - admitted,
+                "retry_after_ms": self.admission.retry_after_ms(agent_name),
+            })
+        return admitted
+    
+    def _admit_task(self, agent_name: str, data: dict) -> bool:
+        """Charge a task submission to the rate limits; urgent (priority > 0) ones are never shed on overload"""
+        try:
+            sheddable = task_priority(data.get('priority')) <= 0
+        except ValueError:
+            sheddable = True  # the dispatcher answers invalid_request if it gets through
+        if self.admission.admit(agent_name, 1, sheddable=sheddable):
+            return True
+        self._send_control(agent_name, {
+            "type": "task_error",
+            "id": data.get('id'),
+            "error": "overload" if self.admission.overloaded else "rate_limit",
+            "retry_after_ms": self.admission.retry_after_ms(agent_name),
+        })
+        return False
+    
+    def _task_frame(self, agent_name: str, data: dict):
+        """Hand a task frame to the dispatcher (on the dispatch shard when sharded)"""
+        if self.bus is None or self.shard_id == DISPATCH_SHARD:
+            self.tasks.handle(agent_name, data)
+            return
+        if data['type'] == 'capabilities':
+            self.advertised[agent_name] = data
+        self.bus.send(DISPATCH_SHARD, ('task', agent_name, data))
+    
+    def _send_task_frame(self, agent_name: str, msg: dict) -> bool:
+        """Dispatcher output: straight to local agents, over the shard bus to the others"""
+        if agent_name in self.outboxes:
+            return self._send_control(agent_name, msg)
+        shard = self.directory.get(agent_name)
+        if self.bus is None or shard is None or shard == self.shard_id:
+            return False
+        self.bus.send(shard, ('control', agent_name, msg))
+        return True
+    
+    def _detach_agent(self, agent_name: str, outbox: AgentOutbox):
+        """Unbind a logical agent from a connection, if the connection still owns it"""
+        outbox.agents.discard(agent_name)
+        if self.outboxes.get(agent_name) is not outbox:
+            return
+        del self.outboxes[agent_name]
+        del self.agents[agent_name]
+        self.live_from.pop(agent_name, None)
+        self.router.detach(agent_name)
+        if self.bus is None or self.shard_id == DISPATCH_SHARD:
+            self.tasks.remove_agent(agent_name)
+        else:
+            self.advertised.pop(agent_name, None)
+            self.bus.send(DISPATCH_SHARD, ('task_leave', agent_name))
+        self.graph.forget(agent_name)
+        if self.directory.get(agent_name) == self.shard_id:
+            del self.directory[agent_name]
+            if self.bus is not None:
+                self.bus.publish(('leave', agent_name))
+                self._publish_topics()
+    
+    def _handle_registration(self, outbox: AgentOutbox, data: dict):
+        """Apply a register / unregister frame: {"type": ..., "agents": [logical agent ids]}
+
+        A registering connection is multiplexed: relays for any of its
+        agents arrive once per connection with a ``"to"`` list, and it
+        receives coalesced batch envelopes.
+        """
+        names = data.get('agents') or []
+        if isinstance(names, str):
+            names = [names]
+        if data['type'] == 'register':
+            outbox.multiplexed = True
+            outbox.accepts_batches = True
+            for name in names:
+                self._attach_agent(name, outbox)
+        else:
+            for name in names:
+                self._detach_agent(name, outbox)
+        logger.info(f"🔀 Connection {outbox.name}: {len(outbox.agents)} logical agents")
+    
+    def _handle_resume(self, outbox: AgentOutbox, data: dict):
+        """Apply a resume frame: {"type": "resume", "agent": ..., "offset": n}
+
+        A multiplexed connection resumes all its agents in one scan with
+        ``{"type": "resume", "offsets": {agent: n, ...}}``. Send it after the
+        subscriptions: the catch-up only includes what the agent's current
+        topics match.
+        """
+        offsets = data.get('offsets')
+        if not isinstance(offsets, dict):
+            agent_name = data.get('agent', 'unknown')
+            if not self._attach_agent(agent_name, outbox):
+                return
+            offsets = {agent_name: data.get('offset')}
+        offsets = {name: offset for name, offset in offsets.items()
+                   if isinstance(offset, int) and self.outboxes.get(name) is outbox}
+        if not offsets:
+            return
+        if self.relay_log is None:
+            for name, offset in offsets.items():
+                self._send_control(name, {"type": "replay_done", "agent": name, "offset": offset,
+                                          "next_offset": offset, "replayed": 0, "error": "relay_log_disabled"})
+            return
+        self.replays += 1
+        asyncio.ensure_future(self._replay(outbox, offsets))
+    
+    async def _replay(self, outbox: AgentOutbox, offsets: Dict[str, int], chunk: int = 500):
+        """Stream the logged relays each agent missed, in offset order, as batch envelopes
+
+        An agent gets the relays in ``[offset, live_from)`` that it would
+        have received (its current topics or a broadcast, not its own);
+        everything from ``live_from`` on was delivered live after it
+        attached. The outbox is kept at most half full so the catch-up
+        never pushes out live traffic.
+        """
+        log = self.relay_log
+        ends = {name: self.live_from.get(name, log.next_offset) for name in offsets}
+        topics = {name: tuple(self.router.topics(name)) for name in offsets}
+        replayed = dict.fromkeys(offsets, 0)
+        
+        def recipients(offset: int, broadcast: bool, sender: str, action: str) -> List[str]:
+            action = action.lower()
+            return [name for name, start in offsets.items()
+                    if start <= offset < ends[name] and name != sender
+                    and (broadcast or any(action.startswith(t) for t in topics[name]))]
+        
+        position = min(offsets.values())
+        end = max(ends.values())
+        while position < end and not outbox.closed:
+            records, position = log.read(position, chunk, end, lambda *record: bool(recipients(*record)))
+            if records:
+                relays = []
+                for offset, broadcast, sender, action, body in records:
+                    names = recipients(offset, broadcast, sender, action)
+                    relay = json.loads(body)
+                    if outbox.multiplexed:
+                        relay["to"] = names
+                    relays.append(relay)
+                    for name in names:
+                        replayed[name] += 1
+                outbox.put(outbox.codec.encode({"type": "batch", "replay": True, "relays": relays}), lane=BULK)
+            while outbox.depth > outbox.maxsize // 2 and not outbox.closed:
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(0)
+        for name, offset in offsets.items():
+            self._send_control(name, {
+                "type": "replay_done",
+                "agent": name,
+                "offset": offset,
+                "next_offset": ends[name],
+                "replayed": replayed[name],
+                "truncated": offset < log.first_offset,  # older relays already aged out
+            })
+        logger.info(f"📼 Replayed {sum(replayed.values())} relays to {outbox.name} "
+                    f"({len(offsets)} agents, from offset {min(offsets.values())})")
+    
+    def _handle_subscription(self, agent_name: str, data: dict):
+        """Apply a subscribe / unsubscribe frame: {"type": ..., "topics": [prefixes]}
+
+        ``"batch": true`` opts the connection into coalesced batch envelopes.
+        """
+        if data.get('batch'):
+            self.outboxes[agent_name].accepts_batches = True
+        topics = data.get('topics')
+        if isinstance(topics, str):
+            topics = [topics]
+        if data['type'] == 'subscribe':
+            self.router.subscribe(agent_name, topics or [])
+        else:
+            self.router.unsubscribe(agent_name, topics)
+        self._publish_topics()
+        logger.info(f"[{agent_name}] topics: {sorted(self.router.topics(agent_name)) or 'none'}")
+    
+    def _send_control(self, agent_name: str, msg: dict) -> bool:
+        """Queue a control frame (task traffic) for one locally connected agent"""
+        outbox = self.outboxes.get(agent_name)
+        if outbox is None:
+            return False
+        if outbox.multiplexed:
+            msg = dict(msg, to=[agent_name])
+        return outbox.put(outbox.codec.encode(msg), shed=False)
+    
+    def set_send_policy(self, agent_name: str, policy: str):
+        """Choose the slow-consumer policy for one agent (applies immediately)"""
+        outbox = self.outboxes.get(agent_name)
+        if outbox is not None:
+            outbox.policy = policy
+        self.agent_send_policies[agent_name] = policy
+    
+    def toggle_profiling(self, seconds: float = None) -> dict:
+        """Start or stop cProfile on the event loop (SIGUSR1, ``POST /api/profile``)"""
+        return self.tracer.toggle_profile(seconds)
+    
+    def set_rate_limit(self, agent_name: str, actions_per_second: float):
+        """Override one agent's action rate limit (applies immediately)"""
+        self.admission.set_rate_limit(agent_name, actions_per_second)
+    
+    def _agent_reward(self, agent_name: str) -> float:
+        """Current reward of an agent, scored on its p95 end-to-end latency"""
+        # Windowed score from the last analytics pass; the all-time histogram until there is one
+        score = self.analytics.score(agent_name) if self.analytics is not None else None
+        if score is not None:
+            return score
+        p95 = self.metrics.agent_percentile(agent_name, 95)
+        return self._calculate_reward(p95) if p95 is not None else 1.0
     
-    async def _broadcast_message(self, sender: str, action: str, latency_ms: float, reward: float):
-        """Broadcast message to all other connected agents (quantum entanglement)"""
-        message = json.dumps({
+    def _broadcast_message(self, sender: str, action: str, latency_ms: float, reward: float,
+                           sent_at: float = None, broadcast: bool = False, lane: int = NORMAL):
+        """Enqueue a relay for every subscriber of the action (quantum entanglement)
+
+        Only agents subscribed to a prefix of ``action`` receive it, unless
+        the sender explicitly asked for an all-to-all ``broadcast``. Relays
+        outside the normal lane carry their ``priority``.
+        """
+        relay = {
             "from": sender,
             "relay": action,
             "timestamp": datetime.now().isoformat(),
+            "sent_at": sent_at,
             "latency_ms": round(latency_ms, 2),
             "reward": round(reward, 2),
-            "mesh_size": len(self.agents)
-        })
+            "mesh_size": len(self.directory)
+        }
+        if lane != NORMAL:
+            relay["priority"] = LANES[lane]
+        self._deliver(relay, action, broadcast)
+        
+        # Forward once per shard that has a matching subscriber
+        if self.bus is not None:
+            shards = self.bus.peers if broadcast else [int(s) for s in self.shard_router.match(action)]
+            for shard in shards:
+                self.bus.send(shard, ('relay', relay, action, broadcast))
+    
+    def _handle_batch(self, agent_name: str, data: dict, received_at: float, received_wall_ms: float,
+                      trace=None, lane: int = NORMAL):
+        """Process a batch frame: {"type": "batch", "actions": [action or {"action", "sent_at", "mode"}]}
+
+        The whole batch costs one registry update, one rollup lookup, one
+        writer submission (committed in one transaction) and one envelope
+        per recipient, instead of one of each per action.
+        """
+        loop = asyncio.get_event_loop()
+        items = [{"action": item} if isinstance(item, str) else item for item in data.get('actions') or ()]
+        if not items:
+            return
+        self.outboxes[agent_name].accepts_batches = True
+        default_sent_at = data.get('sent_at')
+        ingress = [self.metrics.ingress_ms(item.get('sent_at', default_sent_at), received_wall_ms)
+                   for item in items]
+        processed_at = loop.time()
+        process_ms = (processed_at - received_at) * 1000
+        
+        # Relay every action in one pass, coalesced per recipient
+        reward = round(self._agent_reward(agent_name), 2)
+        timestamp = datetime.now().isoformat()
+        mesh_size = len(self.directory)
+        relays = []
+        for item, ingress_ms in zip(items, ingress):
+            action = schema.action_text(item.get('action', 'none'))
+            relays.append(({
+                "from": agent_name,
+                "relay": action,
+                "timestamp": timestamp,
+                "sent_at": item.get('sent_at', default_sent_at),
+                "latency_ms": round((ingress_ms or 0.0) + process_ms, 2),
+                "reward": reward,
+                "mesh_size": mesh_size
+            }, action, item.get('mode', data.get('mode')) == 'broadcast'))
+        if lane != NORMAL:
+            for relay, _, _ in relays:
+                relay["priority"] = LANES[lane]
+        self._relay_batch(agent_name, relays)
+        fanned_out_at = loop.time()
+        if trace is not None:
+            trace.mark('relay')
+        
+        # One registry update and one rollup lookup for the whole batch
+        fanout_ms = (fanned_out_at - received_at) * 1000
+        latencies = [(ingress_ms or 0.0) + fanout_ms for ingress_ms in ingress]
+        rewards = [self._calculate_reward(latency_ms) for latency_ms in latencies]
+        self.registry.record_many(agent_name, rewards)
+        self.rollups.record_many(agent_name, zip(latencies, rewards))
+        self.graph.react(agent_name)
+        if self.analytics is not None:
+            self.analytics.record_many(agent_name, latencies, rewards)
+        if trace is not None:
+            trace.mark('account')
+        
+        logger.info(f"[{agent_name}] → batch of {len(items)} actions "
+                    f"(max latency: {max(latencies):.2f}ms, min reward: {min(rewards):.2f})")
+        if trace is not None:
+            trace.mark('log')
+        
+        # All rows of the batch go to the writer as one group (same transaction)
+        statements = []
+        ts_us = time.time_ns() // 1000
+        encode = self.memory_codec.encode
+        for (relay, _, _), reward, latency_ms in zip(relays, rewards, latencies):
+            statements.append(self.retention.insert(
+                encode(ts_us, agent_name, relay["relay"], reward, latency_ms, statements)))
+        self.writer.submit_many(statements)
+        persisted_at = loop.time()
+        if trace is not None:
+            trace.mark('persist')
+        
+        self.metrics.record_batch(agent_name, {
+            "process": process_ms,
+            "fanout": (fanned_out_at - processed_at) * 1000,
+            "persist": (persisted_at - fanned_out_at) * 1000,
+        }, latencies, [i for i in ingress if i is not None])
+        if trace is not None:
+            trace.mark('metrics')
+            self.tracer.finish(trace, agent_name, 'batch', len(items))
+    
+    def _relay_batch(self, sender: str, relays):
+        """Deliver a batch of (relay, action, broadcast) locally and forward each shard its share"""
+        self._deliver_batch(sender, relays)
+        if self.bus is not None:
+            shares: Dict[int, list] = {}
+            for item in relays:
+                _, action, broadcast = item
+                for shard in self.bus.peers if broadcast else [int(s) for s in self.shard_router.match(action)]:
+                    shares.setdefault(shard, []).append(item)
+            for shard, share in shares.items():
+                self.bus.send(shard, ('relay_batch', sender, share))
+    
+    def _deliver_batch(self, sender: str, relays):
+        """Enqueue each local recipient's share of a batch as one envelope (a batch travels in one lane)"""
+        if self.relay_log is not None:
+            for relay, action, broadcast in relays:
+                self.relay_log.append(relay, action, broadcast)
+        lane = lane_of(relays[0][0].get('priority')) if relays else NORMAL
+        shares: Dict[str, List[int]] = {}
+        for i, (_, action, broadcast) in enumerate(relays):
+            self.graph.heard(sender, action, broadcast)  # lets the interaction graph credit reactions
+            if broadcast:
+                self.broadcast_messages += 1
+                targets = self.outboxes.keys()
+            else:
+                targets = self.router.match(action)
+            deliveries = 0
+            for target_name in targets:
+                if target_name != sender and target_name in self.outboxes:
+                    shares.setdefault(target_name, []).append(i)
+                    deliveries += 1
+            self.router.record(deliveries)
+        
+        # Recipients with the same share and codec get the same encoded frame
+        encoded = {}
+        multiplexed: Dict[AgentOutbox, Dict[int, List[str]]] = {}
+        for target_name, share in shares.items():
+            outbox = self.outboxes[target_name]
+            if outbox.multiplexed:
+                per_relay = multiplexed.setdefault(outbox, {})
+                for i in share:
+                    per_relay.setdefault(i, []).append(target_name)
+                continue
+            if not outbox.accepts_batches:
+                # Plain relays for agents that never opted into batch envelopes
+                for i in share:
+                    frame = encoded.get((i, outbox.codec))
+                    if frame is None:
+                        frame = encoded[(i, outbox.codec)] = outbox.codec.encode(relays[i][0])
+                    outbox.put(frame, key=sender, lane=lane)
+                continue
+            key = (tuple(share), outbox.codec)
+            frame = encoded.get(key)
+            if frame is None:
+                if len(share) == 1:
+                    envelope = relays[share[0]][0]
+                else:
+                    envelope = {"type": "batch", "from": sender, "relays": [relays[i][0] for i in share]}
+                frame = encoded[key] = outbox.codec.encode(envelope)
+            outbox.put(frame, key=sender, lane=lane)
+        
+        # One envelope per multiplexed connection, each relay naming its recipients
+        for outbox, per_relay in multiplexed.items():
+            items = [dict(relays[i][0], to=names) for i, names in sorted(per_relay.items())]
+            envelope = items[0] if len(items) == 1 else {"type": "batch", "from": sender, "relays": items}
+            outbox.put(outbox.codec.encode(envelope), key=sender, lane=lane)
+    
+    def _deliver(self, relay: dict, action: str, broadcast: bool):
+        """Enqueue a relay for the matching agents connected to this shard"""
+        sender = relay["from"]
+        lane = lane_of(relay.get('priority'))
+        if self.relay_log is not None:
+            self.relay_log.append(relay, action, broadcast)  # stamps relay["offset"]
+        if broadcast:
+            self.broadcast_messages += 1
+            targets = self.outboxes.keys()
+        else:
+            targets = self.router.match(action)
         
-        # Send to all agents except sender
-        for target_name, target_ws in self.agents.items():
+        # Encode once per codec in use, never once per recipient
+        encoded = {}
+        
+        # Enqueue for every target except sender; writer tasks deliver concurrently
+        deliveries = 0
+        self.graph.heard(sender, action, broadcast)  # lets the interaction graph credit reactions
+        multiplexed: Dict[AgentOutbox, List[str]] = {}
+        for target_name in targets:
             if target_name != sender:
-                try:
-                    await target_ws.send(message)
-                except websockets.exceptions.ConnectionClosed:
-                    logger.warning(f"Failed to send to {target_name} - connection closed")
+                outbox = self.outboxes.get(target_name)
+                if outbox is not None:
+                    deliveries += 1
+                    if outbox.multiplexed:
+                        # Co-hosted agents share one frame naming every recipient
+                        multiplexed.setdefault(outbox, []).append(target_name)
+                        continue
+                    frame = encoded.get(outbox.codec)
+                    if frame is None:
+                        frame = encoded[outbox.codec] = outbox.codec.encode(relay)
+                    outbox.put(frame, key=sender, lane=lane)
+        for outbox, recipients in multiplexed.items():
+            outbox.put(outbox.codec.encode(dict(relay, to=recipients)), key=sender, lane=lane)
+        self.router.record(deliveries)
     
     def get_stats(self):
-        """Get coordinator statistics"""
-        cursor = self.db.cursor()
+        """Get coordinator statistics (served from running aggregates, no table scans)"""
+        totals = self.rollups.totals
         
         # Get total messages
-        total_messages = cursor.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+        total_messages = totals.messages
         
         # Get average latency
-        avg_latency = cursor.execute('SELECT AVG(latency_ms) FROM memory').fetchone()[0] or 0
+        avg_latency = totals.latency_sum / totals.messages if totals.messages else 0
         
         # Get active agents
         active_agents = len(self.agents)
         
+        # Sharded mode: add every peer's session counters to the shared on-disk base
+        if self.bus is not None:
+            shards = [self._shard_summary()] + list(self.peer_stats.values())
+            session = self.rollups.session
+            total_messages = totals.messages - session.messages + sum(s["session_messages"] for s in shards)
+            latency_sum = totals.latency_sum - session.latency_sum + sum(s["session_latency_sum"] for s in shards)
+            avg_latency = latency_sum / total_messages if total_messages else 0
+            active_agents = sum(s["active_agents"] for s in shards)
+        
         # Get registered agents
-        total_agents = cursor.execute('SELECT COUNT(*) FROM agent_registry').fetchone()[0]
+        total_agents = len(self.registry)
+        
+        # Mesh health follows the live end-to-end p95 once samples exist
+        e2e = self.metrics.stage_latency['e2e']
+        health_latency = e2e.percentile(95) if e2e.count else avg_latency
         
         return {
             "active_agents": active_agents,
             "total_agents_registered": total_agents,
             "total_messages": total_messages,
             "avg_latency_ms": round(avg_latency, 2),
-            "mesh_health": "excellent" if avg_latency < 50 else "good" if avg_latency < 100 else "degraded"
+            "mesh_health": "excellent" if health_latency < 50 else "good" if health_latency < 100 else "degraded",
+            "windows": {
+                "5m": self.window_stats(300),
+                "1h": self.window_stats(3600),
+            },
+            "latency": self.metrics.summary(),
+            "delivery": self._delivery_stats(),
+            "connections": {
+                "connections": len(self.connections),
+                "multiplexed": sum(1 for o in self.connections.values() if o.multiplexed),
+                "logical_agents": len(self.agents),
+                "name_takeovers": self.name_takeovers,
+            },
+            "admission": self.admission.stats(),
+            "tracing": self.tracer.stats(),
+            "lanes": dict(self.inbound.stats(), queued=len(self.inbound),
+                          priority_topics=self.priority_topics),
+            "relay_log": dict(self.relay_log.stats(), replays=self.replays) if self.relay_log else None,
+            "routing": dict(self.router.stats(), broadcast_messages=self.broadcast_messages),
+            "interactions": self.graph.summary(),
+            "analytics": self.analytics.stats() if self.analytics is not None else None,
+            "tasks": self.tasks.stats(),
+            "registry": self.registry.stats(),
+            "retention": self.retention.stats(),
+            "memory_dictionary": self.memory_codec.stats(),
+            "persistence": self.writer.stats(),
+            "api": self.api.stats(),
+            "cluster": self._cluster_stats()
+        }
+    
+    def agent_views(self) -> Dict[str, dict]:
+        """Per-agent view for the coordination API: registry counters plus live state"""
+        views = {name: dict(record.as_dict(), online=False) for name, record in self.registry.agents.items()}
+        for name, shard in self.directory.items():
+            views.setdefault(name, {}).update(online=True, shard=shard)
+        for name, outbox in self.outboxes.items():
+            worker = self.tasks.workers.get(name)
+            p95 = self.metrics.agent_percentile(name, 95)
+            views.setdefault(name, {}).update(
+                online=True,
+                shard=self.shard_id,
+                multiplexed=outbox.multiplexed,
+                codec=outbox.codec.name,
+                send_policy=outbox.policy,
+                topics=sorted(self.router.topics(name)),
+                capabilities=sorted(worker.capabilities) if worker else [],
+                p95_ms=round(p95, 2) if p95 is not None else None,
+                reward=self._agent_reward(name),
+                analytics=self.analytics.agent(name) if self.analytics is not None else None,
+            )
+        return views
+    
+    def topology(self) -> dict:
+        """Mesh structure: connections, topic subscriptions, capabilities and shard placement"""
+        subscribers: Dict[str, List[str]] = {}
+        for name in self.outboxes:
+            for topic in self.router.topics(name):
+                subscribers.setdefault(topic or '*', []).append(name)
+        placement: Dict[int, int] = {}
+        for shard in self.directory.values():
+            placement[shard] = placement.get(shard, 0) + 1
+        
+        # Who reacts to whom, with the send backlog of each bottleneck's connection
+        interactions = dict(self.graph.analysis())  # cached between decay ticks: annotate a copy
+        interactions["bottlenecks"] = [
+            dict(entry, queue_depth=self.outboxes[entry["agent"]].depth if entry["agent"] in self.outboxes else None)
+            for entry in interactions["bottlenecks"]
+        ]
+        return {
+            "shard": self.shard_id,
+            "shards": self.shards,
+            "agents": len(self.outboxes),
+            "connections": [
+                {
+                    "connection": outbox.name,
+                    "agents": sorted(outbox.agents),
+                    "multiplexed": outbox.multiplexed,
+                    "codec": outbox.codec.name,
+                    "queue_depth": outbox.depth,
+                    "dropped": outbox.dropped,
+                }
+                for outbox in self.connections.values()
+            ],
+            "topics": {topic: sorted(agents) for topic, agents in sorted(subscribers.items())},
+            "capabilities": {cap: sorted(agents) for cap, agents in sorted(self.tasks.by_capability.items()) if agents},
+            "placement": placement or {self.shard_id: len(self.outboxes)},
+            "interactions": interactions,
+        }
+    
+    def optimize_topology(self, dry_run: bool = False) -> dict:
+        """``optimize_topology`` from nano-coordinator.aix: retune slow consumers, snapshot state now
+
+        Connections that are dropping relays (or are over half full) under a
+        drop policy are switched to ``coalesce``, which keeps the newest
+        relay per sender instead of losing whole streams.
+        """
+        changes = []
+        for outbox in list(self.connections.values()):
+            if outbox.policy not in ('drop-oldest', 'drop-newest'):
+                continue
+            if not outbox.dropped and outbox.depth <= outbox.maxsize // 2:
+                continue
+            changes.append({
+                "connection": outbox.name,
+                "agents": sorted(outbox.agents),
+                "send_policy": [outbox.policy, 'coalesce'],
+                "dropped": outbox.dropped,
+                "queue_depth": outbox.depth,
+            })
+            if not dry_run:
+                for agent_name in outbox.agents:
+                    self.set_send_policy(agent_name, 'coalesce')
+        if not dry_run:
+            self.flush_registry()
+            self.flush_rollups()
+            logger.info(f"🛠️ Topology optimized: {len(changes)} slow consumers switched to coalesce")
+        return {
+            "dry_run": dry_run,
+            "changes": changes,
+            "snapshot_queued": not dry_run,
+            # bottleneck_detection: reported for review, never rewired automatically
+            "bottlenecks": self.graph.analysis(top=3)["bottlenecks"],
+        }
+    
+    def _shard_summary(self):
+        """Compact per-shard figures pushed to peers over the shard bus"""
+        session = self.rollups.session
+        return {
+            "shard": self.shard_id,
+            "active_agents": len(self.agents),
+            "session_messages": session.messages,
+            "session_latency_sum": session.latency_sum,
+            "send_queue_depth": sum(o.depth for o in self.connections.values()),
+            "send_queue_dropped": sum(o.dropped for o in self.connections.values()),
         }
     
+    def _cluster_stats(self):
+        if self.bus is None:
+            return None
+        shards = {self.shard_id: self._shard_summary(), **self.peer_stats}
+        return {
+            "bus": self.bus.stats(),
+            "directory_size": len(self.directory),
+            "shards": {shard: shards[shard] for shard in sorted(shards)},
+        }
+    
+    # Sharded mode: shard bus callbacks
+    
+    def _publish_topics(self):
+        """Tell peers which prefixes this shard's agents subscribe to (on change)"""
+        if self.bus is None:
+            return
+        topics = self.router.distinct_topics()
+        if topics != self._published_topics:
+            self._published_topics = topics
+            self.bus.publish(('topics', sorted(topics)))
+    
+    def _on_peer_up(self, peer: int):
+        """Replay our part of the directory and our topics to a (re)connected peer"""
+        local = [name for name, shard in self.directory.items() if shard == self.shard_id]
+        self.bus.send(peer, ('snapshot', local, sorted(self.router.distinct_topics())))
+        if peer == DISPATCH_SHARD:
+            for name, data in self.advertised.items():
+                self.bus.send(peer, ('task', name, data))
+    
+    def _on_peer_down(self, peer: int):
+        for name in [name for name, shard in self.directory.items() if shard == peer]:
+            del self.directory[name]
+            if self.shard_id == DISPATCH_SHARD:
+                self.tasks.remove_agent(name)
+        self.shard_router.unsubscribe(str(peer))
+        self.peer_stats.pop(peer, None)
+    
+    def _on_bus_message(self, peer: int, msg: tuple):
+        kind = msg[0]
+        if kind == 'relay':
+            _, relay, action, broadcast = msg
+            self._deliver(relay, action, broadcast)
+        elif kind == 'relay_batch':
+            _, sender, relays = msg
+            self._deliver_batch(sender, relays)
+        elif kind == 'task':
+            self.tasks.handle(msg[1], msg[2])
+        elif kind == 'task_leave':
+            if self.directory.get(msg[1], peer) == peer:  # not already re-attached on another shard
+                self.tasks.remove_agent(msg[1])
+        elif kind == 'control':
+            self._send_control(msg[1], msg[2])
+        elif kind == 'join':
+            self.directory[msg[1]] = peer
+        elif kind == 'leave':
+            if self.directory.get(msg[1]) == peer:
+                del self.directory[msg[1]]
+        elif kind == 'topics':
+            self._set_peer_topics(peer, msg[1])
+        elif kind == 'snapshot':
+            _, agents, topics = msg
+            for name in agents:
+                self.directory[name] = peer
+            self._set_peer_topics(peer, topics)
+        elif kind == 'stats':
+            self.peer_stats[peer] = msg[1]
+    
+    def _set_peer_topics(self, peer: int, topics):
+        self.shard_router.unsubscribe(str(peer))
+        self.shard_router.subscribe(str(peer), topics)
+    
+    async def _shard_stats_loop(self, interval: float = 1.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.bus.publish(('stats', self._shard_summary()))
+    
+    def window_stats(self, seconds: int, agent: str = None):
+        """Message count, latency and reward over the last ``seconds``
+
+        Windows up to an hour come from the in-memory minute ring; longer
+        ones read the per-minute / per-hour rollup tables.
+        """
+        if seconds <= self.rollups.keep_minutes * 60:
+            return self.rollups.window(seconds, agent).summary()
+        return self.rollups.query_window(self.db, seconds, agent).summary()
+    
+    def _delivery_stats(self, top_agents: int = 10):
+        """Outbound queue depth and drop counts across all connections"""
+        outboxes = list(self.connections.values())
+        backlogged = sorted(outboxes, key=lambda o: (o.depth, o.dropped), reverse=True)
+        return {
+            "queued": sum(o.depth for o in outboxes),
+            "max_queue_depth": max((o.max_depth for o in outboxes), default=0),
+            "sent": sum(o.sent for o in outboxes),
+            "dropped": sum(o.dropped for o in outboxes),
+            "coalesced": sum(o.coalesced for o in outboxes),
+            "disconnected_slow_consumers": self.disconnected_slow_consumers,
+            "bytes_sent": sum(o.bytes_sent for o in outboxes),
+            "codecs": self._codec_counts(outboxes),
+            "agents": {o.name: o.stats() for o in backlogged[:top_agents] if o.depth or o.dropped or o.coalesced},
+        }
+    
+    @staticmethod
+    def _codec_counts(outboxes):
+        counts: Dict[str, int] = {}
+        for outbox in outboxes:
+            counts[outbox.codec.name] = counts.get(outbox.codec.name, 0) + 1
+        return counts
+    
+    def render_metrics(self) -> str:
+        """Prometheus text exposition of latency histograms and mesh gauges"""
+        persistence = self.writer.stats()
+        return self.metrics.render_prometheus({
+            "agent_count": len(self.agents),
+            "connection_count": len(self.connections),
+            "send_queue_depth": sum(o.depth for o in self.connections.values()),
+            "send_queue_dropped": sum(o.dropped for o in self.connections.values()),
+            "persistence_pending_writes": persistence["pending_writes"],
+            "persistence_last_flush_ms": persistence["last_flush_ms"],
+            "persistence_rows_dropped": persistence["rows_dropped"],
+            "admission_throttled": self.admission.throttled_agent + self.admission.throttled_global,
+            "admission_shed": self.admission.shed,
+            "admission_rejected_connections": self.admission.rejected_connections,
+            "event_loop_lag_ms": round(self.admission.lag_ms, 2),
+            "slow_callbacks": self.tracer.slow_callbacks,
+            "inbound_queue_depth": len(self.inbound),
+        })
+    
     async def run(self):
         """Start the coordinator server"""
         logger.info(f"🚀 Starting NanoCoordinator on ws://{self.host}:{self.port}")
-        async with websockets.serve(self.handle_message, self.host, self.port):
-            logger.info("✅ NanoCoordinator active and ready for agents!")
-            logger.info(f"📊 Connect agents using: ws://{self.host}:{self.port}")
-            await asyncio.Future()  # Run forever
-
-# Main entry point
-async def main():
-    """Main coordinator loop"""
-    coordinator = NanoCoordinator()
+        self.writer.start()
+        metrics_server = None
+        api_server = None
+        tasks = [asyncio.ensure_future(self._process_loop()),
+                 asyncio.ensure_future(self._snapshot_loop()),
+                 asyncio.ensure_future(self.admission.monitor(self.tracer.record_lag, self._backlog_ms))]
+        self.tracer.install()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.toggle_profiling)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            pass  # no SIGUSR1 here (Windows, or not the main thread): use POST /api/profile
+        if self.shard_id == 0:
+            tasks.append(asyncio.ensure_future(self._retention_loop()))
+        if self.analytics is not None:
+            tasks.append(asyncio.ensure_future(self._analytics_loop()))
+        try:
+            if self.metrics_port:
+                metrics_server = await serve_metrics(self.render_metrics, self.host, self.metrics_port)
+            if self.api_port:
+                api_server = await self.api.start(self.host, self.api_port)
+            if self.bus is not None:
+                await self.bus.start()
+                tasks.append(asyncio.ensure_future(self._shard_stats_loop()))
+            async with websockets.serve(self.handle_message, self.host, self.port,
+                                        select_subprotocol=codecs.select_subprotocol,
+                                        compression='deflate' if self.permessage_deflate else None,
+                                        max_size=codecs.MAX_FRAME_BYTES,
+                                        reuse_port=self.shards > 1):
+                logger.info("✅ NanoCoordinator active and ready for agents!")
+                logger.info(f"📊 Connect agents using: ws://{self.host}:{self.port}")
+                await asyncio.Future()  # Run forever
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.bus is not None:
+                await self.bus.close()
+            if metrics_server:
+                metrics_server.close()
+            if api_server:
+                api_server.close()
+            self.tracer.uninstall()
+            self.close()
     
-    # Print startup banner
+    def close(self):
+        """Snapshot the registry and rollups, flush pending writes and close the database"""
+        self.flush_registry()
+        self.flush_rollups()
+        self.tracer.stop_profile()
+        self.tracer.flush()
+        if self.relay_log is not None:
+            self.relay_log.close()
+        self.writer.stop()
+        self.read_pool.close()
+        self.db.close()
+
+def print_banner(shards: int = 1):
+    """Print startup banner"""
     print("\n" + "=" * 60)
     print("🧠 NanoCoordinator - Quantum Mesh Orchestrator v1.0.0")
     print("=" * 60)
     print(f"📡 WebSocket Server: ws://localhost:8765")
     print(f"💾 Memory Database: nano_memory.db")
+    print(f"📈 Prometheus Metrics: http://localhost:9090/metrics")
+    print(f"🌐 Coordination API: http://localhost:8766/api")
     print(f"🎯 Target Latency: <50ms")
     print(f"🔗 Max Agents: 1000")
     print(f"⚡ Quantum Mesh: Enabled")
+    if shards > 1:
+        print(f"🧬 Shards: {shards} processes (SO_REUSEPORT)")
     print("=" * 60 + "\n")
-    
+
+# Main entry point
+async def main():
+    """Main coordinator loop"""
+    coordinator = NanoCoordinator()
+    print_banner()
     await coordinator.run()
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="NanoCoordinator - Quantum Mesh Orchestrator")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="worker processes sharing the port (default: 1, single event loop)")
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        if args.shards > 1:
+            print_banner(args.shards)
+            run_sharded(args.shards)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("\n👋 NanoCoordinator shutting down gracefully...")
 
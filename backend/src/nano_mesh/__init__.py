@@ -0,0 +1,12 @@
+"""
+🧩 nano_mesh - NanoCoordinator internals
+
+Building blocks used by ``nano_coordinator.py``. Each module owns one
+subsystem of the mesh so the coordinator itself stays small.
+"""
+
+from .persistence import WriteBehindWriter
+
+__all__ = [
+    "WriteBehindWriter",
+]
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+🚦 Admission control and overload shedding
+
+Three layers keep a flood from one agent (or from everyone at once) from
+taking the whole mesh down:
+
+- connections: at most ``max_connections`` sockets are served; the next
+  ``connection_queue`` wait up to ``admit_timeout`` seconds for a slot,
+  the rest are closed with 1013 (try again later). Logical agents are
+  capped at ``max_agents`` (the ``max_agents`` of nano-coordinator.aix).
+- rates (opt-in): a token bucket per agent and one for the whole
+  coordinator, charged per action (a batch frame costs one token per action and is
+  trimmed to the tokens available rather than rejected whole).
+- overload: a probe measures event-loop lag every ``probe_interval``
+  (or the wait of the oldest queued frame, when that is longer);
+  while the smoothed lag is above ``lag_target_ms`` the shed fraction
+  grows additively, and it halves once the loop catches up. That
+  fraction of actions is dropped before any fan-out or persistence work,
+  so the loop spends its time on the traffic it keeps and tail latency
+  levels off instead of growing with the backlog. Control and high
+  priority lanes are never shed, only rate limited.
+
+Relayed actions and task submissions are throttled or shed (a refused
+submission is answered with a ``task_error`` carrying ``retry_after_ms``).
+Registration, subscription and task answers always pass: dropping a task
+reply would just make the dispatcher retry the work.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+logger = logging.getLogger('NanoCoordinator.admission')
+
+# Close code telling clients to back off and reconnect (RFC 6455 "Try Again Later")
+TRY_AGAIN_LATER = 1013
+
+# Per-agent throttle counts kept for stats(); the smallest are forgotten past this
+MAX_TRACKED_AGENTS = 1024
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: float, now: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, n: int = 1, now: Optional[float] = None) -> int:
+        """Take up to ``n`` whole tokens; returns how many were granted"""
+        self._refill(time.monotonic() if now is None else now)
+        granted = min(n, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def refund(self, n: int):
+        self.tokens = min(self.burst, self.tokens + n)
+
+    def retry_after(self) -> float:
+        """Seconds until the next token"""
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate else float('inf')
+
+    def full(self, now: Optional[float] = None) -> bool:
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= self.burst
+
+
+class AdmissionController:
+    """Connection ceiling, per-agent and global token buckets, lag-driven shedding"""
+
+    def __init__(self, max_agents: int = 1000, max_connections: Optional[int] = None,
+                 connection_queue: int = 64, admit_timeout: float = 5.0,
+                 agent_rate: Optional[float] = None, agent_burst: Optional[float] = None,
+                 global_rate: Optional[float] = None, global_burst: Optional[float] = None,
+                 lag_target_ms: float = 50.0, probe_interval: float = 0.1,
+                 shed_step: float = 0.05, max_shed: float = 0.95):
+        self.max_agents = max_agents
+        self.max_connections = max_connections or max_agents
+        self.connection_queue = connection_queue
+        self.admit_timeout = admit_timeout
+        self.agent_rate = agent_rate
+        self.agent_burst = agent_burst or (agent_rate * 2 if agent_rate else None)
+        self.global_bucket = (TokenBucket(global_rate, global_burst or global_rate * 2)
+                              if global_rate else None)
+        self.lag_target_ms = lag_target_ms
+        self.probe_interval = probe_interval
+        self.shed_step = shed_step
+        self.max_shed = max_shed
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.agent_limits: Dict[str, float] = {}  # per-agent rate overrides
+        self.connections = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # Loop lag (milliseconds, smoothed over ~8 probes) and the shed fraction it drives
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.shed_fraction = 0.0
+        self._shed_credit = 0.0
+        self._notified: Dict[str, float] = {}
+
+        self.admitted_connections = 0
+        self.queued_connections = 0
+        self.rejected_connections = 0
+        self.rejected_agents = 0
+        self.throttled_agent = 0
+        self.throttled_global = 0
+        self.shed = 0
+        self.throttled_by_agent: Dict[str, int] = {}
+
+    # Connections
+
+    async def admit_connection(self) -> bool:
+        """Take a connection slot, waiting in the admission queue when full"""
+        if self.connections < self.max_connections and not self._waiters:
+            self.connections += 1
+            self.admitted_connections += 1
+            return True
+        if len(self._waiters) >= self.connection_queue:
+            self.rejected_connections += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_connections += 1
+        try:
+            await asyncio.wait_for(waiter, self.admit_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done() or waiter.cancelled():
+                self.rejected_connections += 1
+                return False
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted_connections += 1
+        return True  # the slot was handed over by release_connection()
+
+    def release_connection(self):
+        """Free a slot, handing it straight to the oldest queued connection"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.connections -= 1
+
+    def admit_agent(self, mesh_size: int) -> bool:
+        """Whether a new logical agent fits under ``max_agents``"""
+        if mesh_size < self.max_agents:
+            return True
+        self.rejected_agents += 1
+        return False
+
+    # Actions
+
+    def admit(self, agent: str, n: int = 1, now: Optional[float] = None, sheddable: bool = True) -> int:
+        """How many of ``n`` actions from ``agent`` to process (the rest are throttled or shed)"""
+        now = time.monotonic() if now is None else now
+        granted = n
+        bucket = self.buckets.get(agent)
+        if bucket is not None or self.agent_rate or agent in self.agent_limits:
+            if bucket is None:
+                bucket = self.buckets[agent] = TokenBucket(*self._limit(agent), now)
+            granted = bucket.take(n, now)
+            if granted < n:
+                self.throttled_agent += n - granted
+                self.throttled_by_agent[agent] = self.throttled_by_agent.get(agent, 0) + n - granted
+        if granted and self.global_bucket is not None:
+            allowed = self.global_bucket.take(granted, now)
+            if allowed < granted:
+                self.throttled_global += granted - allowed
+                if bucket is not None:
+                    bucket.refund(granted - allowed)
+                granted = allowed
+        if granted and self.shed_fraction and sheddable:
+            # Deterministic thinning: exactly shed_fraction of actions over time
+            self._shed_credit += granted * self.shed_fraction
+            dropped = min(granted, int(self._shed_credit))
+            self._shed_credit -= dropped
+            self.shed += dropped
+            granted -= dropped
+        return granted
+
+    def should_notify(self, agent: str, now: Optional[float] = None, interval: float = 1.0) -> bool:
+        """Rate-limit the throttle notices themselves (one per agent per ``interval``)"""
+        now = time.monotonic() if now is None else now
+        if now - self._notified.get(agent, 0.0) < interval:
+            return False
+        self._notified[agent] = now
+        return True
+
+    def retry_after_ms(self, agent: str) -> int:
+        bucket = self.buckets.get(agent)
+        wait = bucket.retry_after() if bucket is not None else 0.0
+        if self.shed_fraction:
+            wait = max(wait, self.probe_interval)
+        return int(wait * 1000) + 1
+
+    def set_rate_limit(self, agent: str, rate: float):
+        """Override one agent's actions per second (applies immediately)"""
+        self.agent_limits[agent] = rate
+        bucket = self.buckets.get(agent)
+        if bucket is not None:
+            bucket.rate, bucket.burst = self._limit(agent)
+
+    def _limit(self, agent: str):
+        """(rate, burst) of an agent's bucket"""
+        rate = self.agent_limits.get(agent)
+        return (rate, rate * 2) if rate is not None else (self.agent_rate, self.agent_burst)
+
+    def prune(self):
+        """Forget the buckets of idle agents (a full bucket is the same as a new one)
+
+        Per-agent throttle counts are trimmed to the largest ones once more
+        than ``MAX_TRACKED_AGENTS`` names have been seen.
+        """
+        now = time.monotonic()
+        for agent in [a for a, bucket in self.buckets.items() if bucket.full(now)]:
+            del self.buckets[agent]
+            self._notified.pop(agent, None)
+        if len(self.throttled_by_agent) > MAX_TRACKED_AGENTS:
+            top = sorted(self.throttled_by_agent.items(), key=lambda kv: kv[1], reverse=True)
+            self.throttled_by_agent = dict(top[:MAX_TRACKED_AGENTS // 2])
+
+    # Overload
+
+    async def monitor(self, on_lag: Optional[Callable[[float], None]] = None,
+                      backlog: Optional[Callable[[], float]] = None):
+        """Probe event-loop lag and adjust the shed fraction (AIMD)
+
+        ``on_lag`` sees every loop-lag measurement; ``backlog`` returns how
+        long (ms) the oldest queued frame has waited, which counts as lag too.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.probe_interval
+            await asyncio.sleep(self.probe_interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.observe_lag(max(lag_ms, backlog()) if backlog is not None else lag_ms)
+            if on_lag is not None:
+                on_lag(lag_ms)
+
+    def observe_lag(self, lag_ms: float):
+        self.lag_ms += (lag_ms - self.lag_ms) / 8
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        before = self.shed_fraction
+        if self.lag_ms > self.lag_target_ms:
+            self.shed_fraction = min(self.max_shed, self.shed_fraction + self.shed_step)
+        elif self.shed_fraction:
+            self.shed_fraction = self.shed_fraction / 2 if self.shed_fraction > 0.01 else 0.0
+        if before == 0.0 and self.shed_fraction:
+            logger.warning(f"🚦 Event loop lag {self.lag_ms:.1f}ms: shedding load")
+        elif before and not self.shed_fraction:
+            logger.info("🚦 Event loop caught up: shedding stopped")
+
+    @property
+    def overloaded(self) -> bool:
+        return self.shed_fraction > 0
+
+    def stats(self, top: int = 10) -> Dict[str, object]:
+        throttled = sorted(self.throttled_by_agent.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "max_agents": self.max_agents,
+            "waiting_connections": len(self._waiters),
+            "admitted_connections": self.admitted_connections,
+            "queued_connections": self.queued_connections,
+            "rejected_connections": self.rejected_connections,
+            "rejected_agents": self.rejected_agents,
+            "agent_rate": self.agent_rate,
+            "global_rate": self.global_bucket.rate if self.global_bucket else None,
+            "throttled": self.throttled_agent + self.throttled_global,
+            "throttled_agent_rate": self.throttled_agent,
+            "throttled_global_rate": self.throttled_global,
+            "shed": self.shed,
+            "shed_fraction": round(self.shed_fraction, 3),
+            "overloaded": self.overloaded,
+            "loop_lag_ms": round(self.lag_ms, 2),
+            "max_loop_lag_ms": round(self.max_lag_ms, 2),
+            "top_throttled": dict(throttled),
+        }
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+📊 Columnar reward analytics (the ``reward_tracker`` tool of nano-coordinator.aix)
+
+Every agent owns one row of three NumPy matrices (timestamp, latency,
+reward); each row is a ring buffer of its last ``capacity`` messages.
+Recording a message is three scalar stores. Scoring works on whole
+matrices, so all agents are scored in one vectorized pass over the
+``window``:
+
+- mean, standard deviation, p50/p95/p99 latency per agent;
+- time-decayed EWMA of latency and reward (``ewma_half_life`` seconds);
+- latency trend (least-squares slope, ms per minute);
+- anomaly flags: ``spike`` when an agent's newest sample is more than
+  ``anomaly_z`` deviations above its window mean, ``outlier`` when its p95
+  is far from the rest of the mesh (median/MAD modified z-score);
+- a reward per agent from a pluggable reward function.
+
+A reward function maps those per-agent statistic columns to a reward
+column; register one with ``@reward_function("name")``. A pass copies
+the live rows on the event loop (a few hundred KB for a thousand agents)
+and scores the copy on a worker thread, so messages recorded meanwhile
+never race the computation.
+
+Rows are recycled: each pass first frees the rows of agents with no
+sample left in the window (agents that left or went quiet), and new
+agents reuse them, so the matrices only grow with the number of agents
+active at once, not with every name ever seen.
+
+NumPy is optional: without it ``AVAILABLE`` is False and the coordinator
+keeps its histogram-based rewards.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+logger = logging.getLogger('NanoCoordinator.analytics')
+
+AVAILABLE = np is not None
+
+RewardFunction = Callable[[Dict[str, 'np.ndarray']], 'np.ndarray']
+REWARD_FUNCTIONS: Dict[str, RewardFunction] = {}
+
+
+def reward_function(name: str):
+    """Register a vectorized reward function under ``name``"""
+    def register(func: RewardFunction) -> RewardFunction:
+        REWARD_FUNCTIONS[name] = func
+        return func
+    return register
+
+
+@reward_function('step')
+def step_reward(stats: Dict[str, 'np.ndarray']) -> 'np.ndarray':
+    """The coordinator's latency tiers applied to p95: <50ms 1.0, <100ms 0.8, <200ms 0.6, else 0.4"""
+    p95 = stats['p95_ms']
+    return np.select([p95 < 50, p95 < 100, p95 < 200], [1.0, 0.8, 0.6], 0.4)
+
+
+@reward_function('exponential')
+def exponential_reward(stats: Dict[str, 'np.ndarray']) -> 'np.ndarray':
+    """Smooth decay on the latency EWMA: 1.0 at 0ms, halved every 50ms"""
+    return np.exp2(-stats['ewma_latency_ms'] / 50.0)
+
+
+@reward_function('trend')
+def trend_reward(stats: Dict[str, 'np.ndarray']) -> 'np.ndarray':
+    """Step reward, docked up to 0.2 for latency rising faster than 10ms per minute"""
+    penalty = np.clip(stats['trend_ms_per_min'] / 50.0, 0.0, 0.2)
+    return np.clip(step_reward(stats) - penalty, 0.0, 1.0)
+
+
+class RewardAnalytics:
+    """Per-agent columnar ring buffers scored for all agents in one vectorized pass"""
+
+    def __init__(self, capacity: int = 256, window: float = 300.0, ewma_half_life: float = 30.0,
+                 reward: str = 'step', anomaly_z: float = 3.0, outlier_z: float = 3.5,
+                 min_deviation_ms: float = 1.0, initial_agents: int = 64):
+        if np is None:
+            raise RuntimeError("reward analytics need numpy (pip install numpy)")
+        if reward not in REWARD_FUNCTIONS:
+            raise ValueError(f"Unknown reward function '{reward}' (expected one of {sorted(REWARD_FUNCTIONS)})")
+        self.capacity = capacity
+        self.window = window
+        self.ewma_half_life = ewma_half_life
+        self.reward = reward
+        self.anomaly_z = anomaly_z
+        self.outlier_z = outlier_z
+        self.min_deviation_ms = min_deviation_ms  # spread floor: sub-millisecond jitter is not an anomaly
+        self.ts = np.zeros((initial_agents, capacity))
+        self.latency = np.zeros((initial_agents, capacity))
+        self.rewards = np.zeros((initial_agents, capacity))
+        self.ids: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self._free: List[int] = []   # rows released by prune()
+        self._head: List[int] = []    # next slot per row
+        self._filled: List[int] = []  # valid slots per row
+        self.scores: Dict[str, float] = {}
+        self.flags: Dict[str, List[str]] = {}
+        self.columns: Dict[str, 'np.ndarray'] = {}
+        self._scored: List[Optional[str]] = []  # row owners when ``columns`` was computed
+        self.recycled = 0
+        self.runs = 0
+        self.last_run: Optional[float] = None
+        self.last_compute_ms = 0.0
+
+    # Recording (event loop)
+
+    def record(self, agent: str, latency_ms: float, reward: float, ts: Optional[float] = None):
+        """Append one message to the agent's ring"""
+        row = self._row(agent)
+        slot = self._head[row]
+        self.ts[row, slot] = time.time() if ts is None else ts
+        self.latency[row, slot] = latency_ms
+        self.rewards[row, slot] = reward
+        self._head[row] = (slot + 1) % self.capacity
+        if self._filled[row] < self.capacity:
+            self._filled[row] += 1
+
+    def record_many(self, agent: str, latencies: Sequence[float], rewards: Sequence[float],
+                    ts: Optional[float] = None):
+        """Append a batch of messages (one timestamp) with one vectorized store per column"""
+        n = len(latencies)
+        if not n:
+            return
+        row = self._row(agent)
+        keep = min(n, self.capacity)
+        slots = (self._head[row] + np.arange(n - keep, n)) % self.capacity
+        self.ts[row, slots] = time.time() if ts is None else ts
+        self.latency[row, slots] = latencies[n - keep:]
+        self.rewards[row, slots] = rewards[n - keep:]
+        self._head[row] = (self._head[row] + n) % self.capacity
+        self._filled[row] = min(self._filled[row] + n, self.capacity)
+
+    # Scoring
+
+    async def refresh(self, now: Optional[float] = None):
+        """Score every agent on a worker thread and publish the results"""
+        self.prune(now)
+        snapshot = self.snapshot()
+        start = time.perf_counter()
+        columns = await asyncio.get_running_loop().run_in_executor(None, self.compute, snapshot, now)
+        self.publish(snapshot[0], columns)
+        self.last_compute_ms = (time.perf_counter() - start) * 1000
+
+    def snapshot(self):
+        """Copies of the live rows plus the ring positions as of now"""
+        n = len(self.names)
+        return (list(self.names), self.ts[:n].copy(), self.latency[:n].copy(), self.rewards[:n].copy(),
+                np.array(self._head, dtype=np.int64), np.array(self._filled, dtype=np.int64))
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Free the rows of agents with no sample left in the window"""
+        n = len(self.names)
+        if not n:
+            return 0
+        now = time.time() if now is None else now
+        newest = self.ts[np.arange(n), (np.array(self._head) - 1) % self.capacity]
+        freed = 0
+        for row in np.flatnonzero(newest < now - self.window).tolist():
+            name = self.names[row]
+            if name is None:
+                continue
+            del self.ids[name]
+            self.names[row] = None
+            self._head[row] = self._filled[row] = 0
+            self._free.append(row)
+            self.scores.pop(name, None)
+            self.flags.pop(name, None)
+            freed += 1
+        self.recycled += freed
+        return freed
+
+    def compute(self, snapshot, now: Optional[float] = None) -> Dict[str, 'np.ndarray']:
+        """Windowed statistics, anomaly flags and reward for every agent (pure NumPy)"""
+        names, ts, latency, rewards, head, filled = snapshot
+        now = time.time() if now is None else now
+        agents, capacity = latency.shape
+        if not agents:
+            return {}
+        valid = (np.arange(capacity) < filled[:, None]) & (ts >= now - self.window)
+        count = valid.sum(axis=1)
+        has = count > 0
+        n = np.maximum(count, 1)
+
+        mean = np.where(valid, latency, 0.0).sum(axis=1) / n
+        deviation = np.where(valid, latency - mean[:, None], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=1) / n)
+
+        # Percentiles: invalid slots sort to the end, then index by each row's count
+        ordered = np.sort(np.where(valid, latency, np.inf), axis=1)
+
+        def percentile(p: float) -> 'np.ndarray':
+            k = np.clip(np.ceil(p / 100 * count).astype(np.int64) - 1, 0, capacity - 1)
+            return np.where(has, np.take_along_axis(ordered, k[:, None], axis=1)[:, 0], 0.0)
+
+        # Time-decayed EWMA: weight halves every ``ewma_half_life`` seconds of age
+        weight = np.where(valid, np.exp2(-(now - ts) / self.ewma_half_life), 0.0)
+        total_weight = np.maximum(weight.sum(axis=1), 1e-12)
+        ewma_latency = (weight * latency).sum(axis=1) / total_weight
+        ewma_reward = (weight * rewards).sum(axis=1) / total_weight
+
+        # Trend: least-squares slope of latency over time
+        mean_ts = np.where(valid, ts, 0.0).sum(axis=1) / n
+        centered = np.where(valid, ts - mean_ts[:, None], 0.0)
+        spread = (centered ** 2).sum(axis=1)
+        slope = np.where(spread > 0, (centered * deviation).sum(axis=1) / np.maximum(spread, 1e-12), 0.0)
+
+        # Spike: the newest sample far above the agent's own window
+        newest = latency[np.arange(agents), (head - 1) % capacity]
+        spike = has & (count >= 8) & (newest - mean > self.anomaly_z * np.maximum(std, self.min_deviation_ms))
+
+        columns = {
+            "count": count,
+            "mean_ms": mean,
+            "std_ms": std,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "ewma_latency_ms": ewma_latency,
+            "ewma_reward": ewma_reward,
+            "trend_ms_per_min": slope * 60,
+            "spike": spike,
+        }
+
+        # Outlier: modified z-score of p95 against the mesh median
+        outlier = np.zeros(agents, dtype=bool)
+        if has.sum() >= 3:
+            p95 = columns["p95_ms"][has]
+            median = np.median(p95)
+            mad = max(np.median(np.abs(p95 - median)) * 1.4826, self.min_deviation_ms)
+            outlier[has] = (p95 - median) / mad > self.outlier_z
+        columns["outlier"] = outlier
+        columns["reward"] = np.where(has, REWARD_FUNCTIONS[self.reward](columns), np.nan)
+        return columns
+
+    def publish(self, names: List[str], columns: Dict[str, 'np.ndarray']):
+        """Make a computed pass the current scores"""
+        self.columns = columns
+        self._scored = names
+        if not columns:
+            return
+        reward = columns["reward"]
+        self.scores = {name: float(r) for name, r in zip(names, reward) if not np.isnan(r)}
+        flags: Dict[str, List[str]] = {}
+        for flag in ('spike', 'outlier'):
+            for i in np.flatnonzero(columns[flag]):
+                flags.setdefault(names[i], []).append(flag)
+        self.flags = flags
+        self.runs += 1
+        self.last_run = time.time()
+
+    def score(self, agent: str) -> Optional[float]:
+        """Reward from the last pass (None if the agent had no samples in the window)"""
+        return self.scores.get(agent)
+
+    def agent(self, agent: str) -> Optional[Dict[str, float]]:
+        """Every statistic of one agent from the last pass"""
+        row = self.ids.get(agent)
+        if (row is None or not self.columns or row >= len(self._scored) or self._scored[row] != agent
+                or not self.columns["count"][row]):
+            return None
+        return {key: (bool(values[row]) if values.dtype == bool else round(float(values[row]), 3))
+                for key, values in self.columns.items()}
+
+    def stats(self, top: int = 10) -> Dict[str, object]:
+        lowest = sorted(self.scores.items(), key=lambda kv: kv[1])[:top]
+        return {
+            "reward_function": self.reward,
+            "window_seconds": self.window,
+            "agents_tracked": len(self.ids),
+            "rows": self.latency.shape[0],
+            "recycled_rows": self.recycled,
+            "agents_scored": len(self.scores),
+            "runs": self.runs,
+            "last_compute_ms": round(self.last_compute_ms, 2),
+            "anomalies": {name: flags for name, flags in list(self.flags.items())[:top]},
+            "lowest_rewards": {name: round(score, 3) for name, score in lowest},
+        }
+
+    def _row(self, agent: str) -> int:
+        row = self.ids.get(agent)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self.names[row] = agent
+            else:
+                row = len(self.names)
+                self.names.append(agent)
+                self._head.append(0)
+                self._filled.append(0)
+                if row >= self.latency.shape[0]:
+                    self._grow()
+            self.ids[agent] = row
+        return row
+
+    def _grow(self):
+        rows = self.latency.shape[0] * 2
+        for attr in ('ts', 'latency', 'rewards'):
+            old = getattr(self, attr)
+            grown = np.zeros((rows, self.capacity))
+            grown[:old.shape[0]] = old
+            setattr(self, attr, grown)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+🌐 Coordination HTTP API
+
+Serves the ``coordination-api`` declared in nano-coordinator.aix next to
+the websocket bus (``http://localhost:8766/api``):
+
+    GET  /api/agents      registry counters + live state, paged by name
+    GET  /api/topology    connections, topic subscriptions, capabilities
+    POST /api/optimize    run ``optimize_topology`` now (``{"dry_run": true}``)
+    GET  /api/stats       the coordinator's get_stats()
+    GET  /api/memory      message history, newest first, cursor-paginated
+                          (``?format=ndjson`` streams every page)
+    POST /api/profile     start / stop cProfile on the coordinator
+                          (``{"action": "toggle", "seconds": 30}``)
+
+Dashboard traffic must not slow routing, so:
+
+- snapshots of in-memory state are built at most once per ``cache_ttl``
+  per query and served as pre-encoded bytes to every concurrent caller;
+- database reads run on a small pool of read-only SQLite connections in
+  worker threads (WAL lets them read while the writer commits), and the
+  rows are encoded to JSON there too;
+- history uses keyset cursors on ``(ts_us, id)`` of the compact
+  ``memory_log`` table, so a deep page costs the same as the first one
+  and streaming never holds more than one page.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, quote, urlsplit
+
+from .schema import LATENCY_SCALE, MEMORY_TABLE, REWARD_SCALE, from_micros
+
+logger = logging.getLogger('NanoCoordinator.api')
+
+MAX_BODY_BYTES = 64 * 1024
+
+Body = Union[bytes, AsyncIterator[bytes]]
+
+
+class ApiError(Exception):
+    """Client error answered with ``status`` and a JSON ``{"error": ...}`` body"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ReadPool:
+    """Read-only SQLite connections used from worker threads, off the event loop"""
+
+    def __init__(self, db_path: str, size: int = 4):
+        self.uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro"
+        self.size = size
+        self._executor = ThreadPoolExecutor(size, thread_name_prefix='nano-read')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self.queries = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_ms = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run ``fn(db, *args)`` on a pooled read-only connection"""
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+        finally:
+            self.in_flight -= 1
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "connections": len(self._connections),
+            "queries": self.queries,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_query_ms": round(self.total_ms / self.queries, 2) if self.queries else 0.0,
+        }
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        start = time.perf_counter()
+        try:
+            return fn(self._connection(), *args)
+        except sqlite3.Error:
+            self.errors += 1
+            raise
+        finally:
+            self.queries += 1
+            self.total_ms += (time.perf_counter() - start) * 1000
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.uri, uri=True, timeout=5, check_same_thread=False)
+            db.execute('PRAGMA query_only=ON')
+            self._local.db = db
+            with self._lock:
+                self._connections.append(db)
+        return db
+
+
+class TTLCache:
+    """Encoded responses kept for ``ttl`` seconds; concurrent misses share one computation"""
+
+    def __init__(self, ttl: float = 1.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, compute: Callable[[], Awaitable[bytes]]) -> bytes:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        pending = self._pending[key] = asyncio.ensure_future(compute())
+        try:
+            value = await asyncio.shield(pending)
+        finally:
+            self._pending.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "ttl_seconds": self.ttl,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def encode_cursor(ts_us: int, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([ts_us, row_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        ts_us, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return int(ts_us), int(row_id)
+    except (ValueError, TypeError):
+        raise ApiError('400 Bad Request', 'invalid cursor')
+
+
+def history_page(db: sqlite3.Connection, agent: Optional[str], cursor: Optional[Tuple[int, int]],
+                 limit: int, ndjson: bool = False) -> Tuple[bytes, Optional[Tuple[int, int]]]:
+    """One page of memory rows (newest first) decoded and encoded on the calling thread"""
+    clauses, params = [], []
+    if agent is not None:
+        clauses.append('m.agent_id IN (SELECT id FROM memory_agents WHERE name = ?)')
+        params.append(agent)
+    if cursor is not None:
+        clauses.append('(m.ts_us, m.id) < (?, ?)')
+        params.extend(cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    rows = db.execute(f'''
+        SELECT m.id, m.ts_us, a.name,
+               CASE WHEN m.verb_id IS NULL THEN m.detail
+                    WHEN m.detail IS NULL THEN v.verb
+                    ELSE v.verb || ':' || m.detail END,
+               m.reward_q, m.latency_us
+        FROM {MEMORY_TABLE} m
+        LEFT JOIN memory_agents a ON a.id = m.agent_id
+        LEFT JOIN memory_verbs v ON v.id = m.verb_id
+        {where}
+        ORDER BY m.ts_us DESC, m.id DESC LIMIT ?
+    ''', (*params, limit)).fetchall()
+    items = [{
+        "id": row_id,
+        "ts": from_micros(ts_us),
+        "agent": name,
+        "action": action,
+        "reward": reward_q / REWARD_SCALE if reward_q is not None else None,
+        "latency_ms": latency_us / LATENCY_SCALE if latency_us is not None else None,
+    } for row_id, ts_us, name, action, reward_q, latency_us in rows]
+    next_cursor = (rows[-1][1], rows[-1][0]) if len(rows) == limit else None
+    if ndjson:
+        return ''.join(json.dumps(item) + '\n' for item in items).encode(), next_cursor
+    return json.dumps({
+        "memory": items,
+        "next_cursor": encode_cursor(*next_cursor) if next_cursor else None,
+    }).encode(), next_cursor
+
+
+class CoordinationAPI:
+    """HTTP front end over a NanoCoordinator: cached snapshots plus pooled history reads"""
+
+    def __init__(self, coordinator, pool: ReadPool, cache_ttl: float = 1.0,
+                 page_size: int = 100, max_page_size: int = 1000):
+        self.coordinator = coordinator
+        self.pool = pool
+        self.cache = TTLCache(cache_ttl)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.requests = 0
+        self.errors = 0
+        self.routes: Dict[Tuple[str, str], Callable[..., Awaitable[Body]]] = {
+            ('GET', '/api/agents'): self.agents,
+            ('GET', '/api/topology'): self.topology,
+            ('POST', '/api/optimize'): self.optimize,
+            ('GET', '/api/stats'): self.stats_view,
+            ('GET', '/api/memory'): self.memory,
+            ('POST', '/api/profile'): self.profile,
+        }
+
+    async def start(self, host: str = 'localhost', port: int = 8766):
+        server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"🌐 Coordination API on http://{host}:{port}/api")
+        return server
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "cache": self.cache.stats(),
+            "read_pool": self.pool.stats(),
+        }
+
+    # Endpoints
+
+    async def agents(self, query: Dict[str, str], body: Any) -> bytes:
+        limit = self._limit(query)
+        cursor = query.get('cursor')
+
+        async def page() -> bytes:
+            views = self.coordinator.agent_views()
+            names = sorted(name for name in views if cursor is None or name > cursor)
+            selected = names[:limit]
+            return json.dumps({
+                "agents": {name: views[name] for name in selected},
+                "total": len(views),
+                "next_cursor": selected[-1] if len(names) > limit else None,
+            }).encode()
+        return await self.cache.get(f"agents?{cursor}&{limit}", page)
+
+    async def topology(self, query: Dict[str, str], body: Any) -> bytes:
+        async def snapshot() -> bytes:
+            return json.dumps(self.coordinator.topology()).encode()
+        return await self.cache.get('topology', snapshot)
+
+    async def optimize(self, query: Dict[str, str], body: Any) -> bytes:
+        dry_run = bool((body or {}).get('dry_run', False)) if isinstance(body, dict) else False
+        result = self.coordinator.optimize_topology(dry_run=dry_run)
+        if not dry_run:
+            self.cache.clear()
+        return json.dumps(result).encode()
+
+    async def stats_view(self, query: Dict[str, str], body: Any) -> bytes:
+        async def snapshot() -> bytes:
+            return json.dumps(self.coordinator.get_stats(), default=str).encode()
+        return await self.cache.get('stats', snapshot)
+
+    async def memory(self, query: Dict[str, str], body: Any) -> Body:
+        agent = query.get('agent')
+        cursor = decode_cursor(query['cursor']) if query.get('cursor') else None
+        limit = self._limit(query)
+        if query.get('format') == 'ndjson':
+            return self._stream_history(agent, cursor, limit)
+
+        async def page() -> bytes:
+            encoded, _ = await self.pool.run(history_page, agent, cursor, limit)
+            return encoded
+        return await self.cache.get(f"memory?{agent}&{query.get('cursor')}&{limit}", page)
+
+    async def profile(self, query: Dict[str, str], body: Any) -> bytes:
+        body = body if isinstance(body, dict) else {}
+        action = body.get('action', 'toggle')
+        seconds = body.get('seconds')
+        if seconds is not None and not isinstance(seconds, (int, float)):
+            raise ApiError('400 Bad Request', 'seconds must be a number')
+        tracer = self.coordinator.tracer
+        if action == 'start':
+            status = tracer.start_profile(seconds)
+        elif action == 'stop':
+            status = tracer.stop_profile()
+        elif action == 'toggle':
+            status = tracer.toggle_profile(seconds)
+        else:
+            raise ApiError('400 Bad Request', 'action must be start, stop or toggle')
+        return json.dumps(status).encode()
+
+    async def _stream_history(self, agent: Optional[str], cursor: Optional[Tuple[int, int]],
+                              limit: int) -> AsyncIterator[bytes]:
+        while True:
+            chunk, cursor = await self.pool.run(history_page, agent, cursor, limit, True)
+            if chunk:
+                yield chunk
+            if cursor is None:
+                return
+
+    def _limit(self, query: Dict[str, str]) -> int:
+        try:
+            limit = int(query.get('limit', self.page_size))
+        except ValueError:
+            raise ApiError('400 Bad Request', 'limit must be an integer')
+        return min(max(limit, 1), self.max_page_size)
+
+    # HTTP plumbing
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0], urlsplit(parts[1])
+            self.requests += 1
+            try:
+                body = await self._read_body(reader, headers)
+                handler = self.routes.get((method, target.path.rstrip('/')))
+                if handler is None:
+                    known = any(path == target.path.rstrip('/') for _, path in self.routes)
+                    raise ApiError('405 Method Not Allowed' if known else '404 Not Found',
+                                   'method not allowed' if known else 'not found')
+                query = {k: v[-1] for k, v in parse_qs(target.query).items()}
+                status, result = '200 OK', await handler(query, body)
+            except ApiError as e:
+                self.errors += 1
+                status, result = e.status, json.dumps({"error": str(e)}).encode()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"❌ API {method} {target.path} failed: {e}")
+                status, result = '500 Internal Server Error', json.dumps({"error": "internal error"}).encode()
+            if isinstance(result, bytes):
+                writer.write(self._head(status, 'application/json', f"Content-Length: {len(result)}") + result)
+            else:
+                await self._write_chunked(writer, status, result)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> Any:
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ApiError('400 Bad Request', 'invalid Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise ApiError('413 Payload Too Large', 'request body too large')
+        if not length:
+            return None
+        raw = await reader.readexactly(length)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            raise ApiError('400 Bad Request', 'body must be JSON')
+
+    @staticmethod
+    def _head(status: str, content_type: str, framing: str) -> bytes:
+        return (f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"{framing}\r\n"
+                f"Connection: close\r\n\r\n").encode()
+
+    async def _write_chunked(self, writer: asyncio.StreamWriter, status: str, chunks: AsyncIterator[bytes]):
+        writer.write(self._head(status, 'application/x-ndjson', 'Transfer-Encoding: chunked'))
+        try:
+            async for chunk in chunks:
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()  # the client's read speed paces the page queries
+        except (sqlite3.Error, ApiError) as e:
+            # Headers are out: end without the terminating chunk so the client sees a truncated stream
+            self.errors += 1
+            logger.error(f"❌ API history stream failed: {e}")
+            return
+        writer.write(b"0\r\n\r\n")
@@ -0,0 +1,5 @@
+"""
+⏱️ NanoCoordinator benchmarks
+
+Run from ``backend/src`` with ``python -m nano_mesh.benchmarks.<name>``.
+"""
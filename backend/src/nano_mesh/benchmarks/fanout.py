@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+📡 Fan-out benchmark: all-to-all broadcast vs topic routing
+
+Replays the NanoResearcher / NanoAnalyst traffic pattern over a mesh of
+simulated agents and counts how many relays each routing mode delivers.
+Half the mesh are researchers, half analysts; every analyst reacts to
+"research" relays the way ``nano_analyst.listen()`` does.
+
+    python -m nano_mesh.benchmarks.fanout --agents 1000 --rounds 1
+"""
+
+import argparse
+import json
+import time
+
+from nano_mesh.routing import TopicRouter
+
+RESEARCHER_ACTIONS = [
+    "search: quantum computing",
+    "search: AI agents",
+    "search: topology networks",
+    "analyze: research papers",
+    "synthesize: findings",
+]
+ANALYST_ACTIONS = [
+    "analyze: user behavior patterns",
+    "analyze: travel trends",
+    "calculate: budget optimization",
+    "detect: anomalies",
+    "generate: insights report",
+]
+RESEARCHER_TOPICS = ["analyzing:", "generate:", "detect:"]
+ANALYST_TOPICS = ["search:", "analyze:", "synthesize:"]
+
+
+def run(agents: int, rounds: int):
+    researchers = [f"researcher-{i}" for i in range(agents // 2)]
+    analysts = [f"analyst-{i}" for i in range(agents - len(researchers))]
+
+    router = TopicRouter()
+    for name in researchers:
+        router.attach(name)
+        router.subscribe(name, RESEARCHER_TOPICS)
+    for name in analysts:
+        router.attach(name)
+        router.subscribe(name, ANALYST_TOPICS)
+
+    messages = 0
+    topic_deliveries = 0
+    match_seconds = 0.0
+
+    def route(sender, action):
+        nonlocal messages, topic_deliveries, match_seconds
+        start = time.perf_counter()
+        targets = router.match(action)
+        match_seconds += time.perf_counter() - start
+        targets.discard(sender)
+        messages += 1
+        topic_deliveries += len(targets)
+        return targets
+
+    for _ in range(rounds):
+        for name in researchers:
+            for action in RESEARCHER_ACTIONS:
+                for target in route(name, action):
+                    # Analysts answer research relays (see nano_analyst.listen)
+                    if target.startswith("analyst-") and "research" in action.lower():
+                        route(target, f"analyzing: {action}")
+        for name in analysts:
+            for action in ANALYST_ACTIONS:
+                route(name, action)
+
+    broadcast_deliveries = messages * (agents - 1)
+    return {
+        "agents": agents,
+        "rounds": rounds,
+        "messages": messages,
+        "broadcast_deliveries": broadcast_deliveries,
+        "topic_deliveries": topic_deliveries,
+        "broadcast_fanout": agents - 1,
+        "topic_fanout": round(topic_deliveries / messages, 2),
+        "fanout_reduction_pct": round(100 * (1 - topic_deliveries / broadcast_deliveries), 2),
+        "match_us_per_message": round(match_seconds / messages * 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the result as JSON only")
+    args = parser.parse_args()
+
+    result = run(args.agents, args.rounds)
+    if args.json:
+        print(json.dumps(result))
+        return
+    print("\n📡 Fan-out: broadcast vs topic routing")
+    print("=" * 50)
+    for key, value in result.items():
+        print(f"{key:>24}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+🌊 Synthetic mesh load generator
+
+Starts a coordinator against a temporary database and drives it with
+simulated agents modeled on the researcher / analyst interplay:
+
+- researchers subscribe to ``analyzing:`` / ``generate:`` / ``detect:``
+  and send ``search:`` / ``analyze:`` / ``synthesize:`` actions
+- analysts subscribe to ``search:`` / ``analyze:`` / ``synthesize:``,
+  send ``analyze:`` / ``calculate:`` / ``detect:`` / ``generate:`` and
+  answer a fraction of the relays they receive with ``analyzing: ...``
+
+Agents are split into teams (``--team-size``) whose actions carry a team
+prefix, so fan-out stays bounded as the agent count grows; a team size
+of 0 puts everyone in one team, which is exactly the two sample agents'
+pattern. Each agent sends with exponential inter-arrival times at
+``--rate`` bursts/s of ``--burst`` actions each; ``--batch-ms`` turns on
+client-side batching (``nano_agents.batching``).
+
+Records sent / delivered throughput, end-to-end latency percentiles
+(sender stamp → receiving agent), coordinator RSS and CPU (from /proc)
+and writes it all as JSON. ``--compare`` diffs a run against an earlier
+result file and exits non-zero on a regression.
+
+    python -m nano_mesh.benchmarks.load --scenario target --output load.json
+    python -m nano_mesh.benchmarks.load --scenario target --compare load.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.request import urlopen
+
+from websockets.asyncio.client import connect
+
+from nano_agents.batching import BatchingSender, unpack
+from nano_mesh import codecs
+from nano_mesh.benchmarks.sharding import wait_for_port
+from nano_mesh.metrics import LatencyHistogram
+from nano_mesh.sharding import serve
+
+SCENARIOS = {
+    "smoke": {"agents": 50, "rate": 2.0, "duration": 10.0},
+    "target": {"agents": 1000, "rate": 0.5, "duration": 30.0},
+    "burst": {"agents": 200, "rate": 2.0, "burst": 20, "duration": 15.0},
+}
+
+ROLES = {
+    "researcher": {
+        "topics": ["analyzing:", "generate:", "detect:"],
+        "actions": ["search: quantum computing", "search: AI agents", "search: topology networks",
+                    "analyze: research papers", "synthesize: findings"],
+    },
+    "analyst": {
+        "topics": ["search:", "analyze:", "synthesize:"],
+        "actions": ["analyze: user behavior patterns", "analyze: travel trends",
+                    "calculate: budget optimization", "detect: anomalies", "generate: insights report"],
+    },
+}
+
+# Relative change beyond --tolerance that counts as a regression (+1: higher is better)
+COMPARED = {
+    ("throughput", "sent_per_sec"): +1,
+    ("throughput", "delivered_per_sec"): +1,
+    ("latency", "p50_ms"): -1,
+    ("latency", "p95_ms"): -1,
+    ("latency", "p99_ms"): -1,
+    ("coordinator", "rss_mb_peak"): -1,
+    ("coordinator", "cpu_percent"): -1,
+    ("coordinator", "cpu_us_per_action"): -1,
+}
+
+LATENCY_TARGET_MS = 50
+
+
+# Coordinator resource usage, from /proc (no psutil)
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def proc_sample(pid: int) -> Optional[Tuple[float, float]]:
+    """(RSS in MB, CPU seconds) of a process, or None where /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration, IndexError, ValueError):
+        return None
+    # utime and stime are fields 14 and 15; fields[0] here is field 3 (state)
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLK_TCK
+    return rss_kb / 1024, cpu_seconds
+
+
+def scrape_metrics(port: int) -> Dict[str, float]:
+    """Gauges from the coordinator's Prometheus endpoint"""
+    try:
+        with urlopen(f'http://localhost:{port}/metrics', timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    gauges = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#') and '{' not in line:
+            name, _, value = line.partition(' ')
+            try:
+                gauges[name] = float(value)
+            except ValueError:
+                pass
+    return gauges
+
+
+# Simulated agents
+
+class AgentStats:
+    """Counters shared by the agents of one client process"""
+
+    def __init__(self, measure_from: float):
+        self.measure_from = measure_from
+        self.latency = LatencyHistogram()
+        self.sent = 0
+        self.received = 0
+        self.reactions = 0
+        self.errors = 0
+
+
+def _action(role: str, team: str, size: int, rng: random.Random) -> str:
+    action = rng.choice(ROLES[role]["actions"])
+    verb, _, text = action.partition(': ')
+    action = f"{team}{verb}: {text}"
+    return action.ljust(size, '.') if len(action) < size else action
+
+
+async def _connection(members: List[Tuple[str, str, str]], cfg: Dict[str, Any], start_at: float,
+                      stop_at: float, stats: AgentStats, rng: random.Random):
+    """One websocket hosting ``members`` (multiplexed when there is more than one)"""
+    codec = codecs.get(cfg["codec"])
+    subprotocols = [codec.subprotocol] if codec is not codecs.JSON else None
+    try:
+        ws = await connect(cfg["uri"], subprotocols=subprotocols, max_queue=None)
+    except OSError:
+        stats.errors += len(members)
+        return
+
+    roles = {name: (role, team) for name, role, team in members}
+    batchers = {
+        name: BatchingSender(ws, name, cfg["batch_ms"], dumps=codec.encode) if cfg["batch_ms"] else None
+        for name in roles
+    }
+
+    async def send(name: str, action: str):
+        batcher = batchers[name]
+        if batcher is not None:
+            await batcher.send(action)
+        else:
+            await ws.send(codec.encode({"agent": name, "action": action, "sent_at": time.time() * 1000}))
+        stats.sent += 1
+
+    async def receive():
+        async for frame in ws:
+            for data in unpack(codecs.decode_frame(frame, codec)):
+                if 'relay' not in data:
+                    continue
+                now = time.time()
+                for name in data.get('to') or (members[0][0],):
+                    if now >= stats.measure_from and data.get('sent_at'):
+                        stats.received += 1
+                        stats.latency.record(now * 1000 - data['sent_at'])
+                    role, team = roles[name]
+                    if role == 'analyst' and now < stop_at and rng.random() < cfg["react"]:
+                        stats.reactions += 1
+                        await send(name, f"{team}analyzing: {data['relay'][len(team):]}"[:max(cfg['size'], 64)])
+
+    async def agent(name: str, agent_rng: random.Random):
+        role, team = roles[name]
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        while True:
+            await asyncio.sleep(agent_rng.expovariate(cfg["rate"]))
+            if time.time() >= stop_at:
+                break
+            for _ in range(cfg["burst"]):
+                await send(name, _action(role, team, cfg["size"], agent_rng))
+        if batchers[name] is not None:
+            await batchers[name].close()
+
+    try:
+        if len(members) > 1:
+            await ws.send(codec.encode({"type": "register", "agents": list(roles)}))
+        for name, (role, team) in roles.items():
+            topics = [team + topic for topic in ROLES[role]["topics"]]
+            await ws.send(codec.encode({"agent": name, "type": "subscribe", "topics": topics}))
+        receiver = asyncio.ensure_future(receive())
+        await asyncio.gather(*(agent(name, random.Random(rng.random())) for name in roles))
+        await asyncio.sleep(cfg["grace"])  # collect relays still in flight
+        receiver.cancel()
+    except Exception:
+        stats.errors += 1
+    finally:
+        await ws.close()
+
+
+async def _simulate(agents: List[Tuple[str, str, str]], cfg: Dict[str, Any], start_at: float,
+                    seed: int) -> AgentStats:
+    stop_at = start_at + cfg["duration"]
+    stats = AgentStats(start_at + cfg["warmup"])
+    rng = random.Random(seed)
+    connecting = []
+    per_connection = max(1, cfg["mux"])
+    for i in range(0, len(agents), per_connection):
+        connecting.append(asyncio.ensure_future(_connection(
+            agents[i:i + per_connection], cfg, start_at, stop_at, stats, random.Random(rng.random())
+        )))
+        if len(connecting) % 50 == 0:
+            await asyncio.sleep(0.05)  # don't stampede the accept queue
+    await asyncio.gather(*connecting)
+    return stats
+
+
+def _client(agents, cfg, start_at, seed, results):
+    stats = asyncio.run(_simulate(agents, cfg, start_at, seed))
+    results.put({
+        "sent": stats.sent,
+        "received": stats.received,
+        "reactions": stats.reactions,
+        "errors": stats.errors,
+        "latency": stats.latency,
+    })
+
+
+def plan_agents(count: int, team_size: int) -> List[Tuple[str, str, str]]:
+    """(name, role, team prefix) for every simulated agent, half researchers, half analysts"""
+    agents = []
+    for i in range(count):
+        team = f"team{i // team_size}/" if team_size else ""
+        role = 'researcher' if i % 2 == 0 else 'analyst'
+        agents.append((f"Nano{role.title()}-{i}", role, team))
+    return agents
+
+
+# Run and report
+
+def run(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='nano-load-') as tmp:
+        coordinator = ctx.Process(target=serve, args=(dict(
+            port=cfg["port"],
+            metrics_port=cfg["metrics_port"],
+            api_port=None,
+            db_path=os.path.join(tmp, 'load.db'),
+            relay_log_dir=os.path.join(tmp, 'relay'),
+        ), 'WARNING'))
+        coordinator.start()
+        try:
+            wait_for_port('localhost', cfg["port"])
+            agents = plan_agents(cfg["agents"], cfg["team_size"])
+            clients = max(1, min(cfg["clients"], len(agents)))
+            per_client = -(-len(agents) // clients)
+            connect_s = 1.0 + len(agents) / clients * 0.002  # ramp-up before traffic starts
+            start_at = time.time() + connect_s
+            results = ctx.Queue()
+            procs = [
+                ctx.Process(target=_client, args=(agents[c * per_client:(c + 1) * per_client], cfg, start_at,
+                                                 cfg["seed"] + c, results))
+                for c in range(clients)
+            ]
+            for proc in procs:
+                proc.start()
+
+            # Sample coordinator RSS / CPU over the measured part of the run
+            time.sleep(max(0.0, start_at + cfg["warmup"] - time.time()))
+            first = proc_sample(coordinator.pid)
+            peak_rss = first[0] if first else None
+            while time.time() < start_at + cfg["duration"]:
+                time.sleep(0.5)
+                sample = proc_sample(coordinator.pid)
+                if sample and peak_rss is not None:
+                    peak_rss = max(peak_rss, sample[0])
+            last = proc_sample(coordinator.pid)
+            gauges = scrape_metrics(cfg["metrics_port"])
+
+            totals = [results.get(timeout=cfg["duration"] + 120) for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            coordinator.terminate()  # serve() flushes and closes on SIGTERM
+            coordinator.join(30)
+
+    latency = LatencyHistogram()
+    for t in totals:
+        latency.merge(t["latency"])
+    measured_s = cfg["duration"] - cfg["warmup"]
+    sent = sum(t["sent"] for t in totals)
+    received = sum(t["received"] for t in totals)
+    cpu = None
+    if first and last:
+        cpu_s = last[1] - first[1]
+        sent_measured = sent * measured_s / cfg["duration"]
+        cpu = {"cpu_seconds": round(cpu_s, 2),
+               "cpu_percent": round(cpu_s / measured_s * 100, 1),
+               "cpu_us_per_action": round(cpu_s / sent_measured * 1e6, 1) if sent_measured else None}
+    summary = latency.summary()
+    return {
+        "benchmark": "load",
+        "timestamp": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {k: v for k, v in cfg.items() if k not in ("uri",)},
+        "throughput": {
+            "sent": sent,
+            "delivered": received,
+            "reactions": sum(t["reactions"] for t in totals),
+            "sent_per_sec": round(sent / cfg["duration"], 1),
+            "delivered_per_sec": round(received / measured_s, 1),
+        },
+        "latency": summary,
+        "meets_latency_target": summary.get("p95_ms", 0) < LATENCY_TARGET_MS,
+        "coordinator": {
+            "rss_mb_start": round(first[0], 1) if first else None,
+            "rss_mb_peak": round(peak_rss, 1) if peak_rss is not None else None,
+            "rss_mb_end": round(last[0], 1) if last else None,
+            **(cpu or {"cpu_seconds": None, "cpu_percent": None, "cpu_us_per_action": None}),
+            "send_queue_dropped": gauges.get("send_queue_dropped"),
+            "persistence_rows_dropped": gauges.get("persistence_rows_dropped"),
+        },
+        "errors": sum(t["errors"] for t in totals),
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print a diff against a baseline result; return the regressed metrics"""
+    regressions = []
+    print(f"\n{'metric':>32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for (section, key), direction in COMPARED.items():
+        old = (baseline.get(section) or {}).get(key)
+        new = (result.get(section) or {}).get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change * direction < -tolerance
+        if regressed:
+            regressions.append(f"{section}.{key}")
+        print(f"{section + '.' + key:>32} {old:>10} {new:>10} {change:>+7.1%}{'  ❌' if regressed else ''}")
+    return regressions
+
+
+def print_result(result: Dict[str, Any]):
+    cfg, tp, lat, proc = result["config"], result["throughput"], result["latency"], result["coordinator"]
+    print(f"\n🌊 {cfg['agents']} agents × {cfg['rate']:g} sends/s × {cfg['burst']} actions, {cfg['duration']:g}s "
+          f"(team size {cfg['team_size'] or 'all'}, {cfg['codec']}, batch window {cfg['batch_ms'] or 'off'}, "
+          f"{cfg['mux']} agents/connection, "
+          f"{cfg['clients']} client processes)")
+    print(f"   sent {tp['sent']} ({tp['sent_per_sec']}/s), delivered {tp['delivered']} "
+          f"({tp['delivered_per_sec']}/s), reactions {tp['reactions']}, errors {result['errors']}")
+    if lat.get("count"):
+        print(f"   latency p50 {lat['p50_ms']}ms  p95 {lat['p95_ms']}ms  p99 {lat['p99_ms']}ms  "
+              f"max {lat['max_ms']}ms  {'✅' if result['meets_latency_target'] else '❌'} <{LATENCY_TARGET_MS}ms p95")
+    print(f"   coordinator RSS {proc['rss_mb_start']} → {proc['rss_mb_end']} MB (peak {proc['rss_mb_peak']}), "
+          f"CPU {proc['cpu_percent']}% ({proc['cpu_us_per_action']}µs/action), dropped {proc['send_queue_dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="smoke")
+    parser.add_argument("--agents", type=int, help="simulated agents (half researchers, half analysts)")
+    parser.add_argument("--rate", type=float, help="send events (bursts) per second per agent")
+    parser.add_argument("--burst", type=int, help="actions sent back-to-back per send event")
+    parser.add_argument("--batch-ms", type=float, default=0,
+                        help="client-side batching window in ms (0: one frame per action)")
+    parser.add_argument("--duration", type=float, help="seconds of traffic")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds excluded from latency stats")
+    parser.add_argument("--size", type=int, default=32, help="minimum action length (characters)")
+    parser.add_argument("--react", type=float, default=0.05,
+                        help="probability that an analyst answers a relay with 'analyzing:'")
+    parser.add_argument("--team-size", type=int, default=10, help="agents per team (0: one team)")
+    parser.add_argument("--codec", default="json", choices=codecs.available())
+    parser.add_argument("--mux", type=int, default=1,
+                        help="logical agents multiplexed per connection (1: one socket per agent)")
+    parser.add_argument("--clients", type=int, default=min(4, os.cpu_count() or 1), help="client processes")
+    parser.add_argument("--port", type=int, default=8875)
+    parser.add_argument("--metrics-port", type=int, default=9195)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON result to this file")
+    parser.add_argument("--compare", help="earlier JSON result to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON only")
+    args = parser.parse_args()
+
+    cfg = dict({"burst": 1}, **SCENARIOS[args.scenario], scenario=args.scenario)
+    for key in ("agents", "rate", "burst", "duration"):
+        if getattr(args, key) is not None:
+            cfg[key] = getattr(args, key)
+    cfg.update(
+        warmup=min(args.warmup, cfg["duration"] / 2), size=args.size, react=args.react,
+        team_size=args.team_size, codec=args.codec, batch_ms=args.batch_ms, mux=args.mux, clients=args.clients, port=args.port,
+        metrics_port=args.metrics_port, seed=args.seed, grace=1.0,
+        uri=f"ws://localhost:{args.port}",
+    )
+
+    result = run(cfg)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print_result(result)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
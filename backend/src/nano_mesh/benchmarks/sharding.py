@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+🧬 Sharded coordinator throughput benchmark
+
+Starts the coordinator with 1, 2, 4, ... shards and drives it with
+agent pairs playing ping-pong: every agent subscribes to ``to:<name> ``
+and answers each relay it receives with a relay to its partner, keeping
+``--window`` messages in flight per agent. Partners usually land on
+different shards, so the numbers include cross-shard forwarding over
+the shard bus. Reports delivered relays per second for each shard count.
+
+    python -m nano_mesh.benchmarks.sharding --shards 1,2,4 --pairs 64
+
+Throughput can only scale up to the number of CPU cores; by default
+shard counts above ``os.cpu_count()`` are skipped.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+
+from websockets.asyncio.client import connect
+
+from nano_mesh.sharding import run_sharded
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"coordinator did not start on {host}:{port}")
+
+
+async def _pair_traffic(uri: str, client: int, pairs: int, window: int, duration: float) -> dict:
+    names = [f"bench-{client}-{i}" for i in range(pairs * 2)]
+    partners = {name: names[i ^ 1] for i, name in enumerate(names)}
+    conns = {name: await connect(uri) for name in names}
+    received = 0
+    seq = 0
+
+    def message(name: str) -> str:
+        nonlocal seq
+        seq += 1
+        return json.dumps({
+            "agent": name,
+            "action": f"to:{partners[name]} {seq}",
+            "sent_at": time.time() * 1000,
+        })
+
+    for name, ws in conns.items():
+        await ws.send(json.dumps({"agent": name, "type": "subscribe", "topics": [f"to:{name} "]}))
+    await asyncio.sleep(1.0)  # let subscriptions reach every shard
+
+    deadline = time.monotonic() + duration
+
+    async def play(name: str):
+        nonlocal received
+        ws = conns[name]
+        for _ in range(window):
+            await ws.send(message(name))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(ws.recv(), remaining)
+            except asyncio.TimeoutError:
+                return
+            received += 1
+            await ws.send(message(name))
+
+    await asyncio.gather(*(play(name) for name in names))
+    for ws in conns.values():
+        await ws.close()
+    return {"sent": seq, "received": received}
+
+
+def _client(uri: str, client: int, pairs: int, window: int, duration: float, results):
+    results.put(asyncio.run(_pair_traffic(uri, client, pairs, window, duration)))
+
+
+def run_one(shards: int, clients: int, pairs: int, window: int, duration: float, port: int) -> dict:
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='nano-bench-') as tmp:
+        coordinator = ctx.Process(
+            target=run_sharded, args=(shards,),
+            kwargs=dict(port=port, db_path=os.path.join(tmp, 'bench.db'), relay_log_dir=os.path.join(tmp, 'relay'),
+                        metrics_port=None, api_port=None, log_level='WARNING'),
+        )
+        coordinator.start()
+        try:
+            wait_for_port('localhost', port)
+            time.sleep(0.5 * shards)  # every worker binds the port shortly after the first
+            results = ctx.Queue()
+            uri = f"ws://localhost:{port}"
+            procs = [ctx.Process(target=_client, args=(uri, c, pairs, window, duration, results))
+                     for c in range(clients)]
+            for proc in procs:
+                proc.start()
+            totals = [results.get(timeout=duration + 60) for _ in procs]
+            for proc in procs:
+                proc.join()
+        finally:
+            os.kill(coordinator.pid, signal.SIGINT)  # run_sharded stops its workers on SIGINT
+            coordinator.join(30)
+    received = sum(t["received"] for t in totals)
+    return {
+        "shards": shards,
+        "agents": clients * pairs * 2,
+        "sent": sum(t["sent"] for t in totals),
+        "received": received,
+        "relays_per_sec": round(received / duration, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--shards", default="1,2,4", help="comma-separated shard counts")
+    parser.add_argument("--clients", type=int, default=2, help="client processes")
+    parser.add_argument("--pairs", type=int, default=32, help="agent pairs per client process")
+    parser.add_argument("--window", type=int, default=4, help="messages in flight per agent")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=8865)
+    parser.add_argument("--all", action="store_true", help="also run shard counts above the CPU count")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON only")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    counts = [int(n) for n in args.shards.split(",")]
+    if not args.all:
+        counts = [n for n in counts if n <= cpus] or [1]
+
+    results = [run_one(n, args.clients, args.pairs, args.window, args.duration, args.port)
+               for n in counts]
+    if args.json:
+        print(json.dumps({"cpus": cpus, "runs": results}))
+        return
+    print(f"\n🧬 Sharded throughput ({cpus} CPUs, {args.duration:g}s per run)")
+    print(f"{'shards':>6} {'agents':>7} {'sent':>9} {'received':>9} {'relays/s':>10} {'speedup':>8}")
+    base = results[0]["relays_per_sec"] or 1
+    for r in results:
+        print(f"{r['shards']:>6} {r['agents']:>7} {r['sent']:>9} {r['received']:>9} "
+              f"{r['relays_per_sec']:>10} {r['relays_per_sec'] / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
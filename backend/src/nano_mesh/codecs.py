@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+🗜️ Wire codecs for the coordinator protocol
+
+nano-coordinator.aix lists ``json``, ``binary`` and ``compressed``
+modalities. Each connection negotiates one codec at connect time through
+the WebSocket subprotocol header, e.g. ``nano.msgpack+zstd``:
+
+- serialization: ``json`` (text frames), ``msgpack`` or ``cbor``
+  (binary frames, when ``msgpack`` / ``cbor2`` are installed)
+- optional compression layer: ``zlib`` (stdlib) or ``zstd`` (when
+  ``zstandard`` is installed); compressed frames are always binary
+
+Clients that offer no ``nano.*`` subprotocol get plain JSON, so existing
+agents keep working unchanged.
+
+Decompression is bounded: a frame that inflates past ``MAX_FRAME_BYTES``
+(the same limit the WebSocket layer puts on the wire frame) raises
+``FrameTooLarge`` instead of expanding a 1 MB bomb into a gigabyte, and
+the coordinator closes that connection with 1009 (message too big).
+"""
+
+import json
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # optional dependency
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+SUBPROTOCOL_PREFIX = 'nano.'
+
+# Largest frame accepted, on the wire (websockets ``max_size``) and after decompression
+MAX_FRAME_BYTES = 2 ** 20
+
+# Close code for an oversized message (RFC 6455 "Message Too Big")
+MESSAGE_TOO_BIG = 1009
+
+Frame = Union[str, bytes]
+
+
+class FrameTooLarge(ValueError):
+    """A compressed frame that decompresses past the size limit"""
+
+
+class Codec:
+    """One serialization, optionally wrapped in a compression layer"""
+
+    __slots__ = ('name', 'binary', '_dumps', '_loads', '_compress', '_decompress')
+
+    def __init__(self, name: str, dumps: Callable[[Any], Frame], loads: Callable[[Frame], Any],
+                 binary: bool, compress: Optional[Callable[[bytes], bytes]] = None,
+                 decompress: Optional[Callable[[bytes, Optional[int]], bytes]] = None):
+        self.name = name
+        self.binary = binary or compress is not None
+        self._dumps = dumps
+        self._loads = loads
+        self._compress = compress
+        self._decompress = decompress
+
+    @property
+    def subprotocol(self) -> str:
+        return SUBPROTOCOL_PREFIX + self.name
+
+    def encode(self, obj: Any) -> Frame:
+        data = self._dumps(obj)
+        if self._compress is None:
+            return data
+        if isinstance(data, str):
+            data = data.encode()
+        return self._compress(data)
+
+    def decode(self, frame: Frame, max_size: Optional[int] = MAX_FRAME_BYTES) -> Any:
+        """Decode a frame, refusing to decompress more than ``max_size`` bytes (None: no limit)"""
+        if self._decompress is not None:
+            return self._loads(self._decompress(frame, max_size))
+        return self._loads(frame)
+
+    def __repr__(self):
+        return f"Codec({self.name!r})"
+
+
+def _serializers() -> Dict[str, tuple]:
+    found = {'json': (lambda obj: json.dumps(obj, separators=(',', ':')), json.loads, False)}
+    if msgpack is not None:
+        found['msgpack'] = (msgpack.packb, lambda b: msgpack.unpackb(b, raw=False), True)
+    if cbor2 is not None:
+        found['cbor'] = (cbor2.dumps, cbor2.loads, True)
+    return found
+
+
+def _inflate(data: bytes, max_size: Optional[int]) -> bytes:
+    """zlib-decompress at most ``max_size`` bytes"""
+    if max_size is None:
+        return zlib.decompress(data)
+    inflater = zlib.decompressobj()
+    out = inflater.decompress(data, max_size + 1)
+    if len(out) > max_size or inflater.unconsumed_tail:
+        raise FrameTooLarge(f"frame decompresses past {max_size} bytes")
+    return out
+
+
+def _zstd_decompress(decompressor) -> Callable[[bytes, Optional[int]], bytes]:
+    """Bounded zstd decompression
+
+    Reads through a stream reader: ``decompress(max_output_size=...)`` trusts
+    the content size declared in the frame header, so it cannot bound a bomb.
+    """
+    def decompress(data: bytes, max_size: Optional[int]) -> bytes:
+        if max_size is None:
+            return decompressor.decompress(data)
+        chunks, size = [], 0
+        with decompressor.stream_reader(data) as reader:
+            while size <= max_size:
+                chunk = reader.read(max_size + 1 - size)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+        if size > max_size:
+            raise FrameTooLarge(f"frame decompresses past {max_size} bytes")
+        return b''.join(chunks)
+    return decompress
+
+
+def _compressors() -> Dict[str, tuple]:
+    found = {'zlib': (lambda b: zlib.compress(b, 1), _inflate)}
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=1)
+        found['zstd'] = (compressor.compress, _zstd_decompress(zstandard.ZstdDecompressor()))
+    return found
+
+
+def _build() -> Dict[str, Codec]:
+    codecs = {}
+    for sname, (dumps, loads, binary) in _serializers().items():
+        codecs[sname] = Codec(sname, dumps, loads, binary)
+        for cname, (compress, decompress) in _compressors().items():
+            name = f"{sname}+{cname}"
+            codecs[name] = Codec(name, dumps, loads, binary, compress, decompress)
+    return codecs
+
+
+CODECS: Dict[str, Codec] = _build()
+JSON = CODECS['json']
+
+
+def available() -> List[str]:
+    """Names of every codec usable in this environment"""
+    return list(CODECS)
+
+
+def get(name: Optional[str]) -> Codec:
+    """Codec by name (or ``nano.`` subprotocol); JSON when unknown or None"""
+    if name and name.startswith(SUBPROTOCOL_PREFIX):
+        name = name[len(SUBPROTOCOL_PREFIX):]
+    return CODECS.get(name, JSON) if name else JSON
+
+
+def negotiate(offered: Sequence[str]) -> Optional[str]:
+    """First ``nano.*`` subprotocol offered by the client that we support"""
+    for subprotocol in offered or ():
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX) and subprotocol[len(SUBPROTOCOL_PREFIX):] in CODECS:
+            return subprotocol
+    return None
+
+
+def select_subprotocol(connection, offered: Sequence[str]) -> Optional[str]:
+    """``websockets.serve(select_subprotocol=...)`` hook; None means plain JSON"""
+    return negotiate(offered)
+
+
+def decode_frame(frame: Frame, codec: Codec, max_size: Optional[int] = MAX_FRAME_BYTES) -> Any:
+    """Decode an incoming frame; text frames are always JSON"""
+    if isinstance(frame, str):
+        return json.loads(frame)
+    return codec.decode(frame, max_size)
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+🕸️ Interaction graph for the mesh_optimizer tool
+
+Maintains, as relays flow, who reacts to whom: when an agent sends an
+action within ``window`` seconds of receiving a relay, the edge
+``source → reactor`` gains weight (NanoAnalyst answering NanoResearcher's
+"research" relays gives ``NanoResearcher → NanoAnalyst``). Each received
+relay explains at most one reaction.
+
+Delivery only appends each relay to a short ring of recent relays, not
+once per recipient; a reaction walks the ring back from the newest relay
+to find the last one the reactor was subscribed to (``receives``).
+
+Edge weights decay exponentially with ``half_life`` using forward decay:
+weights are stored scaled by ``exp(λ·(t − t0))``, so an update is one
+addition and all weights share one read-time factor. Nothing is recomputed
+from nano_memory.db:
+
+- strength and degree per agent are running sums over the adjacency;
+- centrality is PageRank over reactor → source edges, warm-started from
+  the previous vector so it converges in a few passes as the mesh drifts;
+- hot spots are the agents carrying the largest share of the traffic;
+- bottlenecks are agents many others depend on: for each "dependent" they
+  supply most of its reactions, and they both receive and drive traffic.
+
+Node ids of agents whose edges have all decayed away are recycled on
+``prune()``, and ``analysis()`` is cached until the next prune (the decay
+tick), so PageRank runs once per tick at most.
+
+In sharded mode each shard records the reactions of its own agents.
+"""
+
+import itertools
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Rebase the forward-decay scale before exp() gets anywhere near overflow
+_REBASE_EXPONENT = 50.0
+
+
+class InteractionGraph:
+    """Decayed who-reacts-to-whom adjacency with incremental node metrics"""
+
+    def __init__(self, half_life: float = 300.0, window: float = 5.0, min_weight: float = 0.05,
+                 receives: Callable[[str, str], bool] = lambda agent, action: True,
+                 max_recent: int = 4096, scan_limit: int = 256):
+        self.half_life = half_life
+        self.window = window
+        self.min_weight = min_weight
+        self.receives = receives
+        self.scan_limit = scan_limit
+        self._lambda = math.log(2) / half_life
+        self._t0 = time.monotonic()
+        self.ids: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self._free: List[int] = []  # ids of nodes with no edges left
+        self.out: Dict[int, Dict[int, float]] = {}   # source → {reactor: scaled weight}
+        self.inn: Dict[int, Dict[int, float]] = {}   # reactor → {source: scaled weight}
+        self.out_strength: Dict[int, float] = {}
+        self.in_strength: Dict[int, float] = {}
+        self.total = 0.0
+        # (seq, monotonic time, sender, action, broadcast) of the latest relays
+        self.recent: Deque[Tuple[int, float, str, str, bool]] = deque(maxlen=max_recent)
+        self._seq = itertools.count(1)
+        self._credited: Dict[str, int] = {}  # agent → seq of the relay its last reaction was credited to
+        self.reactions = 0
+        self.pruned = 0
+        self.recycled = 0
+        self._rank: Dict[int, float] = {}
+        self._analysis: Dict[int, Dict[str, Any]] = {}
+
+    def heard(self, sender: str, action: str, broadcast: bool = False):
+        """Note a relay as it is delivered (once per relay, whatever the fan-out)"""
+        self.recent.append((next(self._seq), time.monotonic(), sender, action, broadcast))
+
+    def react(self, agent: str, weight: float = 1.0, now: Optional[float] = None) -> Optional[str]:
+        """Credit an action by ``agent`` to the relay it last heard, if recent enough"""
+        now = time.monotonic() if now is None else now
+        credited = self._credited.get(agent, 0)
+        for seq, heard_at, source, action, broadcast in itertools.islice(reversed(self.recent), self.scan_limit):
+            if seq <= credited or now - heard_at > self.window:
+                return None
+            if source == agent or not (broadcast or self.receives(agent, action)):
+                continue
+            self._credited[agent] = seq
+            self.add(source, agent, weight, now)
+            self.reactions += 1
+            return source
+        return None
+
+    def add(self, source: str, reactor: str, weight: float = 1.0, now: Optional[float] = None):
+        """Add ``weight`` to the edge ``source → reactor`` at time ``now``"""
+        now = time.monotonic() if now is None else now
+        scaled = weight * math.exp(self._lambda * (now - self._t0))
+        s, r = self._id(source), self._id(reactor)
+        edges = self.out.setdefault(s, {})
+        edges[r] = edges.get(r, 0.0) + scaled
+        back = self.inn.setdefault(r, {})
+        back[s] = back.get(s, 0.0) + scaled
+        self.out_strength[s] = self.out_strength.get(s, 0.0) + scaled
+        self.in_strength[r] = self.in_strength.get(r, 0.0) + scaled
+        self.total += scaled
+
+    def forget(self, agent: str):
+        """Drop what a disconnected agent had heard (its edges decay on their own)"""
+        self._credited.pop(agent, None)
+        node = self.ids.get(agent)
+        if node is not None and node not in self.out and node not in self.inn:
+            self._recycle(node)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Remove edges decayed below ``min_weight`` and rebase the decay scale"""
+        now = time.monotonic() if now is None else now
+        factor = self._factor(now)
+        threshold = self.min_weight / factor
+        removed = 0
+        for s, edges in list(self.out.items()):
+            for r, w in list(edges.items()):
+                if w < threshold:
+                    del edges[r]
+                    del self.inn[r][s]
+                    self.out_strength[s] -= w
+                    self.in_strength[r] -= w
+                    self.total -= w
+                    removed += 1
+            if not edges:
+                del self.out[s]
+        for r in [r for r, sources in self.inn.items() if not sources]:
+            del self.inn[r]
+        for strengths in (self.out_strength, self.in_strength):
+            for node in [n for n, w in strengths.items() if w < threshold]:
+                del strengths[node]
+        for node in [n for n in self.ids.values() if n not in self.out and n not in self.inn]:
+            self._recycle(node)
+        if self._lambda * (now - self._t0) > _REBASE_EXPONENT:
+            self._rebase(now, factor)
+        while self.recent and now - self.recent[0][1] > self.window:
+            self.recent.popleft()
+        self.pruned += removed
+        self._analysis.clear()
+        return removed
+
+    def centrality(self, damping: float = 0.85, tol: float = 1e-6, max_iter: int = 50) -> Dict[str, float]:
+        """PageRank over reactor → source edges, warm-started from the last result"""
+        nodes = set(self.out) | set(self.inn)
+        if not nodes:
+            self._rank = {}
+            return {}
+        n = len(nodes)
+        rank = {node: self._rank.get(node, 1.0 / n) for node in nodes}
+        norm = sum(rank.values())
+        rank = {node: value / norm for node, value in rank.items()}
+        for _ in range(max_iter):
+            # Agents that react to nobody spread their rank evenly
+            dangling = sum(rank[node] for node in nodes if not self.inn.get(node))
+            base = (1 - damping) / n + damping * dangling / n
+            nxt = dict.fromkeys(nodes, base)
+            for reactor, sources in self.inn.items():
+                strength = self.in_strength.get(reactor)
+                if not strength:
+                    continue
+                share = damping * rank[reactor] / strength
+                for source, w in sources.items():
+                    nxt[source] += share * w
+            delta = sum(abs(nxt[node] - rank[node]) for node in nodes)
+            rank = nxt
+            if delta < tol:
+                break
+        self._rank = rank
+        return {self.names[node]: value for node, value in rank.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        """Cheap counters for get_stats"""
+        return {
+            "agents": len(set(self.out) | set(self.inn)),
+            "edges": sum(len(edges) for edges in self.out.values()),
+            "reactions": self.reactions,
+            "weight": round(self.total * self._factor(), 2),
+            "pruned_edges": self.pruned,
+            "recycled_ids": self.recycled,
+            "half_life_seconds": self.half_life,
+        }
+
+    def analysis(self, top: int = 10) -> Dict[str, Any]:
+        """Degree, centrality, hot spots and bottlenecks for the topology view (cached until ``prune()``)"""
+        cached = self._analysis.get(top)
+        if cached is None:
+            cached = self._analysis[top] = self._analyze(top)
+        return cached
+
+    def _analyze(self, top: int) -> Dict[str, Any]:
+        factor = self._factor()
+        total = self.total or 1.0
+        centrality = self.centrality()
+        nodes = set(self.out) | set(self.inn)
+
+        def load(node: int) -> float:
+            return self.out_strength.get(node, 0.0) + self.in_strength.get(node, 0.0)
+
+        hot_spots = sorted(nodes, key=load, reverse=True)[:top]
+
+        # A source is a reactor's dominant upstream when it supplies most of its reactions
+        dependents: Dict[int, int] = {}
+        for reactor, sources in self.inn.items():
+            strength = self.in_strength.get(reactor, 0.0)
+            source, w = max(sources.items(), key=lambda kv: kv[1])
+            if strength and w / strength >= 0.5:
+                dependents[source] = dependents.get(source, 0) + 1
+
+        def broker(node: int) -> float:
+            return math.sqrt(self.out_strength.get(node, 0.0) * self.in_strength.get(node, 0.0)) / total
+
+        bottlenecks = sorted((node for node in nodes if dependents.get(node)),
+                             key=lambda node: (dependents[node], broker(node)), reverse=True)[:top]
+        strongest = sorted(((w, s, r) for s, edges in self.out.items() for r, w in edges.items()),
+                           reverse=True)[:top]
+        return dict(self.summary(), **{
+            "hot_spots": [{
+                "agent": self.names[node],
+                "load_share": round(load(node) / (2 * total), 4),
+                "in_degree": len(self.inn.get(node, ())),
+                "out_degree": len(self.out.get(node, ())),
+                "centrality": round(centrality[self.names[node]], 4),
+            } for node in hot_spots],
+            "bottlenecks": [{
+                "agent": self.names[node],
+                "dependents": dependents[node],
+                "broker_score": round(broker(node), 4),
+                "centrality": round(centrality[self.names[node]], 4),
+            } for node in bottlenecks],
+            "strongest_edges": [{
+                "source": self.names[s],
+                "reactor": self.names[r],
+                "weight": round(w * factor, 2),
+            } for w, s, r in strongest],
+        })
+
+    def _id(self, agent: str) -> int:
+        node = self.ids.get(agent)
+        if node is None:
+            if self._free:
+                node = self._free.pop()
+                self.names[node] = agent
+            else:
+                node = len(self.names)
+                self.names.append(agent)
+            self.ids[agent] = node
+        return node
+
+    def _recycle(self, node: int):
+        """Free the id of a node with no edges left"""
+        del self.ids[self.names[node]]
+        self.names[node] = None
+        self.out_strength.pop(node, None)
+        self.in_strength.pop(node, None)
+        self._rank.pop(node, None)
+        self._free.append(node)
+        self.recycled += 1
+
+    def _factor(self, now: Optional[float] = None) -> float:
+        """Multiplier turning stored weights into weights decayed to ``now``"""
+        now = time.monotonic() if now is None else now
+        return math.exp(-self._lambda * (now - self._t0))
+
+    def _rebase(self, now: float, factor: float):
+        for edges in self.out.values():
+            for r in edges:
+                edges[r] *= factor
+        for sources in self.inn.values():
+            for s in sources:
+                sources[s] *= factor
+        for strengths in (self.out_strength, self.in_strength):
+            for node in strengths:
+                strengths[node] *= factor
+        self.total *= factor
+        self._t0 = now
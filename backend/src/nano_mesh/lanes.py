@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+🚥 Priority lanes for processing and delivery
+
+nano-coordinator.aix gives the quantum_router ``priority_queueing``. Every
+inbound frame and every outbound frame travels in one of four lanes:
+
+    control   registration, subscriptions, resume and task frames,
+              throttle / takeover notices
+    high      urgent actions (alerts)
+    normal    plain actions and batches (the default)
+    bulk      background traffic and catch-up replays
+
+Senders pick a lane with ``"priority": "high"`` (any lane name) on an
+action or batch frame. The coordinator's ``priority_topics`` maps action
+prefixes to lanes for senders that don't. Relays keep their lane
+all the way to each recipient's outbox.
+
+``LaneQueue`` schedules the coordinator's processing queue and every
+connection's outbox:
+
+- ``weighted`` (default): stride scheduling. Backlogged lanes are served
+  in proportion to their weights (8:4:2:1), so no lane starves. A lane
+  that was idle re-enters at the current virtual time instead of
+  spending credit it banked while idle, so an urgent frame waits for at
+  most one frame from each busier lane.
+- ``strict``: always the highest non-empty lane, with starvation
+  protection. When a lower lane's oldest frame has waited longer than
+  ``max_wait``, one of its frames is served, at most once per
+  ``max_wait`` per lane. A saturated high lane therefore still lets
+  everything else trickle through without losing its priority.
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+LANES = ('control', 'high', 'normal', 'bulk')
+CONTROL, HIGH, NORMAL, BULK = range(len(LANES))
+DEFAULT_WEIGHTS = (8, 4, 2, 1)
+MODES = ('weighted', 'strict')
+
+_BY_NAME = {name: lane for lane, name in enumerate(LANES)}
+
+
+def lane_of(priority: Any, default: int = NORMAL) -> int:
+    """Lane of a ``"priority"`` field: a lane name or index, ``default`` otherwise"""
+    if isinstance(priority, str):
+        return _BY_NAME.get(priority.strip().lower(), default)
+    if isinstance(priority, int) and not isinstance(priority, bool) and 0 <= priority < len(LANES):
+        return priority
+    return default
+
+
+class LaneQueue:
+    """Weighted-fair (or strict) queue over the priority lanes, with starvation protection"""
+
+    def __init__(self, weights: Sequence[float] = DEFAULT_WEIGHTS, mode: str = 'weighted',
+                 max_wait: Optional[float] = 0.5):
+        if mode not in MODES:
+            raise ValueError(f"Unknown lane scheduling mode '{mode}' (expected one of {MODES})")
+        if len(weights) != len(LANES) or min(weights) <= 0:
+            raise ValueError(f"Need one positive weight per lane {LANES}")
+        self.mode = mode
+        self.weights = tuple(weights)
+        self.max_wait = max_wait
+        self.lanes: List[Deque[Tuple[float, Any]]] = [deque() for _ in LANES]
+        self._strides = [1.0 / weight for weight in weights]
+        self._passes = [0.0] * len(LANES)
+        self._vtime = 0.0
+        self._promoted_at = [float('-inf')] * len(LANES)
+        self._size = 0
+        self.served = [0] * len(LANES)
+        self.max_depth = [0] * len(LANES)
+        self.promoted = 0  # served early by starvation protection
+
+    def __len__(self) -> int:
+        return self._size
+
+    def depth(self, lane: int) -> int:
+        return len(self.lanes[lane])
+
+    def push(self, lane: int, item: Any, now: float):
+        queue = self.lanes[lane]
+        if not queue and self._passes[lane] < self._vtime:
+            self._passes[lane] = self._vtime  # no credit banked while idle
+        queue.append((now, item))
+        self._size += 1
+        if len(queue) > self.max_depth[lane]:
+            self.max_depth[lane] = len(queue)
+
+    def pop(self, now: float) -> Tuple[int, float, Any]:
+        """(lane, enqueued at, item) of the next item to serve"""
+        lanes = self.lanes
+        lane = -1
+        if self.mode == 'strict':
+            for i, queue in enumerate(lanes):
+                if queue:
+                    lane = i
+                    break
+            if self.max_wait is not None:
+                for i in range(len(lanes) - 1, lane, -1):
+                    if (lanes[i] and now - lanes[i][0][0] > self.max_wait
+                            and now - self._promoted_at[i] > self.max_wait):
+                        lane = i
+                        self._promoted_at[i] = now
+                        self.promoted += 1
+                        break
+        else:
+            best = None
+            for i, queue in enumerate(lanes):
+                if queue and (best is None or self._passes[i] < best):
+                    lane, best = i, self._passes[i]
+            self._vtime = best
+            self._passes[lane] += self._strides[lane]
+        enqueued_at, item = lanes[lane].popleft()
+        self._size -= 1
+        self.served[lane] += 1
+        return lane, enqueued_at, item
+
+    def drop(self) -> Optional[Tuple[int, float, Any]]:
+        """Discard the oldest item of the lowest-priority non-empty lane (shed bulk first)"""
+        for lane in range(len(self.lanes) - 1, -1, -1):
+            if self.lanes[lane]:
+                enqueued_at, item = self.lanes[lane].popleft()
+                self._size -= 1
+                return lane, enqueued_at, item
+        return None
+
+    def oldest(self, now: float) -> float:
+        """Seconds the oldest queued item has waited (0 when empty)"""
+        heads = [queue[0][0] for queue in self.lanes if queue]
+        return now - min(heads) if heads else 0.0
+
+    def clear(self):
+        for queue in self.lanes:
+            queue.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "promoted": self.promoted,
+            "lanes": {name: {
+                "weight": self.weights[lane],
+                "depth": len(self.lanes[lane]),
+                "max_depth": self.max_depth[lane],
+                "served": self.served[lane],
+            } for lane, name in enumerate(LANES)},
+        }
+
+
+class Inbound:
+    """A connection's frames waiting in the processing lanes: bounded, and closed once drained"""
+
+    __slots__ = ('limit', 'pending', 'hung_up', '_room')
+
+    def __init__(self, limit: int = 256):
+        self.limit = limit
+        self.pending = 0
+        self.hung_up = False
+        self._room = asyncio.Event()
+        self._room.set()
+
+    async def reserve(self):
+        """Wait while ``limit`` frames are queued (stops reading the socket: TCP backpressure)"""
+        while self.pending >= self.limit:
+            self._room.clear()
+            await self._room.wait()
+        self.pending += 1
+
+    def done(self) -> bool:
+        """One frame processed; True once the connection hung up and nothing is left"""
+        self.pending -= 1
+        self._room.set()
+        return self.hung_up and not self.pending
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+📈 Mesh latency metrics
+
+Senders stamp each message with ``sent_at`` (epoch milliseconds). The
+coordinator adds its own receive / fan-out / persist timestamps and
+records the stage durations into HDR-style log-linear histograms, one
+per agent plus one per stage. Each priority lane also gets its own
+queue-wait, handling and delivery histograms. The histograms feed the
+reward function and are exported in Prometheus text format
+(``message_latency_ms`` as declared in nano-coordinator.aix).
+"""
+
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .lanes import LANES
+
+logger = logging.getLogger('NanoCoordinator.metrics')
+
+# Prometheus bucket boundaries (milliseconds); +Inf is implicit
+PROMETHEUS_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Coordinator stages, in the order a message passes through them
+STAGES = ('ingress', 'process', 'fanout', 'persist', 'delivery', 'e2e')
+
+# Per-lane stages: waiting in the processing lanes, receipt → processed, outbox wait
+LANE_STAGES = ('queue', 'handle', 'delivery')
+
+
+class LatencyHistogram:
+    """Log-linear (HDR-style) latency histogram with ~3% relative precision
+
+    Values are recorded in integer ``unit_ms`` steps. Below 64 units every
+    step has its own bucket; above that each power of two is split into 32
+    linear sub-buckets. Buckets are stored sparsely so an idle agent costs
+    almost nothing.
+    """
+
+    _LINEAR = 64
+    _HALF = 32
+
+    __slots__ = ('unit_ms', 'highest_ms', 'counts', 'prom_counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, unit_ms: float = 0.001, highest_ms: float = 3_600_000):
+        self.unit_ms = unit_ms
+        self.highest_ms = highest_ms
+        self.counts: Dict[int, int] = {}
+        self.prom_counts: List[int] = [0] * (len(PROMETHEUS_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        """Record one latency sample"""
+        value_ms = min(max(value_ms, 0.0), self.highest_ms)
+        idx = self._index(int(value_ms / self.unit_ms))
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.prom_counts[bisect_left(PROMETHEUS_BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def record_many(self, values_ms: Iterable[float]):
+        """Record several samples (one attribute round-trip for the whole batch)"""
+        counts, prom_counts, unit_ms, highest_ms = self.counts, self.prom_counts, self.unit_ms, self.highest_ms
+        n, total, lo, hi = 0, 0.0, self.min, self.max
+        for value_ms in values_ms:
+            value_ms = min(max(value_ms, 0.0), highest_ms)
+            idx = self._index(int(value_ms / unit_ms))
+            counts[idx] = counts.get(idx, 0) + 1
+            prom_counts[bisect_left(PROMETHEUS_BUCKETS_MS, value_ms)] += 1
+            n += 1
+            total += value_ms
+            if value_ms < lo:
+                lo = value_ms
+            if value_ms > hi:
+                hi = value_ms
+        self.count += n
+        self.total += total
+        self.min, self.max = lo, hi
+
+    def percentile(self, p: float) -> float:
+        """Value at percentile ``p`` (0-100), accurate to the bucket width"""
+        if not self.count:
+            return 0.0
+        target = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= target:
+                return min(self._upper(idx) * self.unit_ms, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean, 2),
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max, 2),
+        }
+
+    def merge(self, other: 'LatencyHistogram'):
+        """Add another histogram's samples into this one (same unit)"""
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        for i, n in enumerate(other.prom_counts):
+            self.prom_counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _index(self, units: int) -> int:
+        if units < self._LINEAR:
+            return units
+        shift = units.bit_length() - 6
+        return self._LINEAR + (shift - 1) * self._HALF + ((units >> shift) - self._HALF)
+
+    def _upper(self, idx: int) -> int:
+        if idx < self._LINEAR:
+            return idx + 1
+        k = idx - self._LINEAR
+        shift = k // self._HALF + 1
+        return ((k % self._HALF) + self._HALF + 1) << shift
+
+
+class MeshMetrics:
+    """Per-agent and per-stage latency histograms for the coordinator"""
+
+    def __init__(self):
+        self.agent_latency: Dict[str, LatencyHistogram] = {}
+        self.stage_latency: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self.lane_latency: Dict[str, List[LatencyHistogram]] = {
+            stage: [LatencyHistogram() for _ in LANES] for stage in LANE_STAGES
+        }
+        self.unstamped_messages = 0
+
+    @staticmethod
+    def ingress_ms(sent_at: Optional[float], received_wall_ms: float) -> Optional[float]:
+        """Sender → coordinator latency from the sender's ``sent_at`` stamp
+
+        Clocks on different hosts can drift, so negative values are clamped
+        to zero. Returns None when the message carries no stamp.
+        """
+        if sent_at is None:
+            return None
+        try:
+            return max(received_wall_ms - float(sent_at), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def record_message(self, agent: str, stages: Dict[str, float]):
+        """Record the stage durations of one message"""
+        if 'ingress' not in stages:
+            self.unstamped_messages += 1
+        for stage, value in stages.items():
+            self.stage_latency[stage].record(value)
+        hist = self.agent_latency.get(agent)
+        if hist is None:
+            hist = self.agent_latency[agent] = LatencyHistogram()
+        hist.record(stages['e2e'])
+
+    def record_batch(self, agent: str, stages: Dict[str, float], e2e: List[float], ingress: List[float]):
+        """Record a batch frame: shared stage durations once, per-action e2e and ingress"""
+        self.unstamped_messages += len(e2e) - len(ingress)
+        for stage, value in stages.items():
+            self.stage_latency[stage].record(value)
+        self.stage_latency['ingress'].record_many(ingress)
+        self.stage_latency['e2e'].record_many(e2e)
+        hist = self.agent_latency.get(agent)
+        if hist is None:
+            hist = self.agent_latency[agent] = LatencyHistogram()
+        hist.record_many(e2e)
+
+    def record_lane(self, stage: str, lane: int, value_ms: float):
+        self.lane_latency[stage][lane].record(value_ms)
+
+    def record_delivery(self, value_ms: float, lane: int):
+        """Outbox wait of one frame (the 'delivery' stage), overall and for its lane"""
+        self.stage_latency['delivery'].record(value_ms)
+        self.lane_latency['delivery'][lane].record(value_ms)
+
+    def agent_percentile(self, agent: str, p: float) -> Optional[float]:
+        hist = self.agent_latency.get(agent)
+        return hist.percentile(p) if hist and hist.count else None
+
+    def summary(self, top_agents: int = 10) -> Dict[str, object]:
+        """Stage percentiles plus the slowest agents by p95"""
+        slowest = sorted(self.agent_latency.items(), key=lambda kv: kv[1].percentile(95), reverse=True)
+        return {
+            "stages": {stage: hist.summary() for stage, hist in self.stage_latency.items()},
+            "lanes": {name: {stage: hists[lane].summary() for stage, hists in self.lane_latency.items()}
+                      for lane, name in enumerate(LANES)},
+            "unstamped_messages": self.unstamped_messages,
+            "slowest_agents": {name: hist.summary() for name, hist in slowest[:top_agents]},
+        }
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Render all histograms (and extra gauges) in Prometheus text format"""
+        lines = [
+            "# HELP message_latency_ms End-to-end message latency per agent",
+            "# TYPE message_latency_ms histogram",
+        ]
+        for agent, hist in self.agent_latency.items():
+            lines.extend(_histogram_lines('message_latency_ms', {'agent': agent}, hist))
+        lines += [
+            "# HELP message_stage_latency_ms Coordinator latency per processing stage",
+            "# TYPE message_stage_latency_ms histogram",
+        ]
+        for stage, hist in self.stage_latency.items():
+            lines.extend(_histogram_lines('message_stage_latency_ms', {'stage': stage}, hist))
+        lines += [
+            "# HELP message_lane_latency_ms Coordinator latency per priority lane and stage",
+            "# TYPE message_lane_latency_ms histogram",
+        ]
+        for stage, hists in self.lane_latency.items():
+            for lane, hist in enumerate(hists):
+                lines.extend(_histogram_lines('message_lane_latency_ms', {'lane': LANES[lane], 'stage': stage}, hist))
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, labels: Dict[str, str], hist: LatencyHistogram) -> Iterable[str]:
+    label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    cumulative = 0
+    for bound, n in zip(PROMETHEUS_BUCKETS_MS, hist.prom_counts):
+        cumulative += n
+        yield f'{name}_bucket{{{label_str},le="{bound}"}} {cumulative}'
+    yield f'{name}_bucket{{{label_str},le="+Inf"}} {hist.count}'
+    yield f'{name}_sum{{{label_str}}} {hist.total:.3f}'
+    yield f'{name}_count{{{label_str}}} {hist.count}'
+
+
+async def serve_metrics(render: Callable[[], str], host: str = 'localhost', port: int = 9090):
+    """Serve ``render()`` as Prometheus text on ``GET /metrics``"""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Drain headers; the body of a GET is ignored
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', render().encode()
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"📈 Prometheus metrics on http://{host}:{port}/metrics")
+    return server
+
+
+def wall_clock_ms() -> float:
+    """Epoch milliseconds, the unit senders use for ``sent_at``"""
+    return time.time() * 1000
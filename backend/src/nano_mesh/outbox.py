@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+📮 Per-connection outbound queues
+
+Every connection gets a bounded ``AgentOutbox`` drained by its own
+writer task (shared by all logical agents a multiplexed connection
+hosts), so a broadcast only enqueues and one slow consumer can never
+delay delivery to the rest of the mesh. Frames wait in priority lanes
+(``nano_mesh.lanes``), so a control frame or an alert overtakes a backlog of
+bulk relays. What happens when a queue is full is decided by the agent's
+slow-consumer policy, which only ever sheds relays: frames the client
+needs (``task``, ``task_cancel``, ``replay_done``, ``agent_taken``...,
+queued with ``shed=False``) wait in a queue of their own that is sent
+ahead of every lane and never dropped.
+
+- ``drop-oldest``: discard the oldest frame of the lowest-priority lane
+  in use (default)
+- ``drop-newest``: discard the incoming frame
+- ``coalesce``: replace the queued frame from the same sender in the same
+  lane, falling back to ``drop-oldest`` when there is none
+- ``disconnect``: close the connection
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+import websockets
+
+from .lanes import CONTROL, NORMAL, LaneQueue
+
+logger = logging.getLogger('NanoCoordinator.outbox')
+
+POLICIES = ('drop-oldest', 'drop-newest', 'coalesce', 'disconnect')
+
+
+class AgentOutbox:
+    """Bounded outbound queue for one agent connection"""
+
+    def __init__(self, name: str, websocket, maxsize: int = 1024, policy: str = 'drop-oldest',
+                 on_delivered: Optional[Callable[[float, int], None]] = None, codec=None,
+                 lane_mode: str = 'weighted', lane_max_wait: Optional[float] = 0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{policy}' (expected one of {POLICIES})")
+        self.name = name
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self.disconnected_slow = False  # closed by the 'disconnect' policy, not by the peer
+        self.codec = codec
+        self.accepts_batches = False  # receives coalesced batch envelopes
+        self.agents: Set[str] = set()  # logical agents served by this connection
+        self.multiplexed = False       # relays carry a "to" list of recipients
+        self.on_delivered = on_delivered  # (queue wait ms, lane)
+        self._loop = asyncio.get_event_loop()
+        self._queue = LaneQueue(mode=lane_mode, max_wait=lane_max_wait)  # items: (key, payload)
+        self._control: Deque[Tuple[float, Any]] = deque()  # (enqueued at, payload), never shed
+        self._ready = asyncio.Event()
+
+        self.sent = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self._task = asyncio.ensure_future(self._drain())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue) + len(self._control)
+
+    def put(self, payload, key: Optional[str] = None, lane: int = NORMAL, shed: bool = True) -> bool:
+        """Enqueue a frame in its priority lane without blocking; returns False if it was not queued
+
+        ``shed=False`` marks a frame the client needs: it skips the lanes
+        and the slow-consumer policy and goes out ahead of every relay.
+        """
+        if self.closed:
+            return False
+        if not shed:
+            self._control.append((self._loop.time(), payload))
+            self._ready.set()
+            return True
+        if len(self._queue) >= self.maxsize:
+            if self.policy == 'drop-newest' and lane != CONTROL:
+                self.dropped += 1
+                return False
+            if self.policy == 'disconnect':
+                self.dropped += 1
+                self.disconnect('slow consumer')
+                return False
+            if self.policy == 'coalesce' and key is not None:
+                queue = self._queue.lanes[lane]
+                for i in range(len(queue) - 1, -1, -1):
+                    if queue[i][1][0] == key:
+                        queue[i] = (queue[i][0], (key, payload))
+                        self.coalesced += 1
+                        return True
+            self._queue.drop()
+            self.dropped += 1
+        self._queue.push(lane, (key, payload), self._loop.time())
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+        self._ready.set()
+        return True
+
+    def disconnect(self, reason: str):
+        """Stop delivering and close the underlying connection"""
+        if self.closed:
+            return
+        logger.warning(f"[{self.name}] disconnecting: {reason} (queue depth {self.depth})")
+        self.disconnected_slow = True
+        self.close()
+        asyncio.ensure_future(self.websocket.close(code=1008, reason=reason))
+
+    def close(self):
+        """Stop the writer task and discard anything still queued"""
+        self.closed = True
+        self._queue.clear()
+        self._control.clear()
+        self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "codec": self.codec.name if self.codec is not None else None,
+            "sent": self.sent,
+            "bytes_sent": self.bytes_sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "agents": len(self.agents),
+            "lanes": self._queue.stats(),
+            "control_queued": len(self._control),
+        }
+
+    async def _drain(self):
+        try:
+            while True:
+                while not self._queue and not self._control:
+                    self._ready.clear()
+                    await self._ready.wait()
+                if self._control:
+                    lane = CONTROL
+                    enqueued_at, payload = self._control.popleft()
+                else:
+                    lane, enqueued_at, (_, payload) = self._queue.pop(self._loop.time())
+                await self.websocket.send(payload)
+                self.sent += 1
+                self.bytes_sent += len(payload)
+                if self.on_delivered is not None:
+                    self.on_delivered((self._loop.time() - enqueued_at) * 1000, lane)
+        except websockets.exceptions.ConnectionClosed:
+            logger.warning(f"Failed to send to {self.name} - connection closed")
+            self.closed = True
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+💾 Write-behind persistence for nano_memory.db
+
+Rows are queued in memory by the event loop and flushed by a dedicated
+writer thread in batched transactions, so an fsync never stalls routing.
+A batch is flushed when it reaches ``batch_size`` rows or when
+``flush_interval`` seconds have passed since its first row, whichever
+comes first. ``submit_many`` queues a group of statements as one item, so
+they always land in the same transaction (each of its statements counts
+towards ``batch_size``).
+
+When a batch fails, it is replayed group by group in a single
+transaction, each group under its own SAVEPOINT: a group with a statement
+SQLite rejects is rolled back and dropped whole (its statements counted
+as ``rows_rejected``), the rest of the batch is kept. ``on_reject`` is
+told about every statement that was not written.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Statement = Tuple[str, Sequence[Any]]
+
+logger = logging.getLogger('NanoCoordinator.persistence')
+
+# SQLite ``PRAGMA synchronous`` levels exposed as durability modes
+DURABILITY_LEVELS = {
+    'off': 'OFF',        # fastest, may lose the last batches on power loss
+    'normal': 'NORMAL',  # WAL default: durable across process crashes
+    'full': 'FULL',      # fsync on every commit
+}
+
+_STOP = object()
+
+
+def connect(db_path: str, durability: str = 'normal', check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a SQLite connection in WAL mode with the requested durability"""
+    level = DURABILITY_LEVELS.get(durability.lower())
+    if level is None:
+        raise ValueError(f"Unknown durability '{durability}' (expected one of {sorted(DURABILITY_LEVELS)})")
+    db = sqlite3.connect(db_path, timeout=30, check_same_thread=check_same_thread)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(f'PRAGMA synchronous={level}')
+    return db
+
+
+class WriteBehindWriter:
+    """Queue of pending SQL writes drained by a single writer thread"""
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_interval: float = 0.05,
+                 durability: str = 'normal', max_pending: int = 100_000,
+                 on_reject: Optional[Callable[[str, Sequence[Any]], None]] = None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.on_reject = on_reject
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Flush metrics (written by the writer thread, read by get_stats)
+        self.rows_written = 0
+        self.batches_flushed = 0
+        self.rows_dropped = 0
+        self.rows_rejected = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        """Start the writer thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='nano-writer', daemon=True)
+        self._thread.start()
+        logger.info(f"💾 Write-behind writer started (batch={self.batch_size}, "
+                    f"interval={self.flush_interval * 1000:.0f}ms, durability={self.durability})")
+
+    def submit(self, sql: str, params: Sequence[Any]):
+        """Queue one statement for the next batch (never blocks the caller)"""
+        try:
+            self._queue.put_nowait((sql, params))
+        except queue.Full:
+            with self._lock:
+                self.rows_dropped += 1
+
+    def submit_many(self, statements: List[Statement]):
+        """Queue several statements as one item, committed in the same transaction"""
+        try:
+            self._queue.put_nowait((None, statements))
+        except queue.Full:
+            with self._lock:
+                self.rows_dropped += len(statements)
+
+    def stop(self, timeout: float = 5.0):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread is None:
+            if not self.pending:
+                return
+            self.start()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"💾 Write-behind writer stopped ({self.rows_written} rows in {self.batches_flushed} batches)")
+
+    @property
+    def pending(self) -> int:
+        """Queued items (a ``submit_many`` group counts once)"""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """Flush statistics, reported separately from routing latency"""
+        with self._lock:
+            batches = self.batches_flushed
+            return {
+                "pending_writes": self.pending,
+                "rows_written": self.rows_written,
+                "rows_dropped": self.rows_dropped,
+                "rows_rejected": self.rows_rejected,
+                "batches_flushed": batches,
+                "flush_errors": self.flush_errors,
+                "avg_batch_size": round(self.rows_written / batches, 1) if batches else 0,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / batches, 2) if batches else 0,
+                "max_flush_ms": round(self.max_flush_ms, 2),
+            }
+
+    def _run(self):
+        db = connect(self.db_path, self.durability)
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._flush(db, batch)
+        finally:
+            db.close()
+
+    def _collect(self) -> Tuple[List[List[Statement]], bool]:
+        """Block for the first item, then gather groups until the size or time threshold"""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [self._group(item)]
+        rows = len(batch[0])
+        deadline = time.monotonic() + self.flush_interval
+        while rows < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(self._group(item))
+            rows += len(batch[-1])
+        return batch, False
+
+    @staticmethod
+    def _group(item) -> List[Statement]:
+        return list(item[1]) if item[0] is None else [item]  # submit_many group or one statement
+
+    def _flush(self, db: sqlite3.Connection, batch: List[List[Statement]]):
+        start = time.perf_counter()
+        rows = sum(len(group) for group in batch)
+        rejected = 0
+        try:
+            with db:
+                # Group consecutive identical statements into executemany calls
+                run_sql, run_params = None, []
+                for group in batch:
+                    for sql, params in group:
+                        if sql != run_sql:
+                            if run_params:
+                                db.executemany(run_sql, run_params)
+                            run_sql, run_params = sql, []
+                        run_params.append(params)
+                if run_params:
+                    db.executemany(run_sql, run_params)
+        except sqlite3.Error as e:
+            logger.warning(f"Write-behind batch failed ({rows} rows), retrying group by group: {e}")
+            try:
+                rejected = self._flush_each(db, batch)
+            except sqlite3.Error as e:
+                logger.error(f"Write-behind flush failed ({rows} rows): {e}")
+                with self._lock:
+                    self.flush_errors += 1
+                for group in batch:
+                    for sql, params in group:
+                        self._rejected(sql, params)
+                return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.rows_rejected += rejected
+            self.rows_written += rows - rejected
+            self.batches_flushed += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    def _flush_each(self, db: sqlite3.Connection, batch: List[List[Statement]]) -> int:
+        """Apply a failed batch group by group, dropping whole any group SQLite rejects"""
+        rejected = 0
+        with db:
+            db.execute('BEGIN')
+            for group in batch:
+                db.execute('SAVEPOINT nano_group')
+                try:
+                    for sql, params in group:
+                        db.execute(sql, params)
+                except sqlite3.Error as e:
+                    db.execute('ROLLBACK TO nano_group')
+                    rejected += len(group)
+                    logger.error(f"Write-behind group rejected ({len(group)} statements): {e}")
+                    for sql, params in group:
+                        self._rejected(sql, params)
+                db.execute('RELEASE nano_group')
+        return rejected
+
+    def _rejected(self, sql: str, params: Sequence[Any]):
+        if self.on_reject is not None:
+            try:
+                self.on_reject(sql, params)
+            except Exception as e:
+                logger.error(f"Write-behind on_reject hook failed: {e}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+🗂️ In-memory agent registry
+
+Keeps ``message_count``, ``last_seen`` and an exponentially weighted
+``avg_reward`` per agent in memory, so the hot path never does a
+read-modify-write against SQLite. The ``agent_registry`` table is loaded
+at startup and snapshotted on an interval and at shutdown; only agents
+that changed since the last snapshot are written, and message counts are
+written as deltas so several coordinator processes can share the table.
+"""
+
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+UPSERT_SQL = '''
+    INSERT INTO agent_registry (agent, first_seen, last_seen, message_count, avg_reward)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (agent) DO UPDATE SET
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen),
+        message_count = message_count + excluded.message_count,
+        avg_reward = excluded.avg_reward
+'''
+
+
+class AgentRecord:
+    """Live counters for one agent"""
+
+    __slots__ = ('first_seen', 'last_seen', 'message_count', 'avg_reward', 'unsaved')
+
+    def __init__(self, first_seen: float, last_seen: float, message_count: int = 0,
+                 avg_reward: Optional[float] = None):
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.message_count = message_count
+        self.avg_reward = avg_reward
+        self.unsaved = 0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "first_seen": datetime.fromtimestamp(self.first_seen).isoformat(),
+            "last_seen": datetime.fromtimestamp(self.last_seen).isoformat(),
+            "message_count": self.message_count,
+            "avg_reward": round(self.avg_reward, 4) if self.avg_reward is not None else None,
+        }
+
+
+class AgentRegistry:
+    """Agent registry held in memory and snapshotted to ``agent_registry``"""
+
+    def __init__(self, reward_alpha: float = 0.1):
+        self.reward_alpha = reward_alpha
+        self.agents: Dict[str, AgentRecord] = {}
+        self._dirty: set = set()
+        self.snapshots = 0
+
+    def __len__(self) -> int:
+        return len(self.agents)
+
+    def __contains__(self, agent: str) -> bool:
+        return agent in self.agents
+
+    def get(self, agent: str) -> Optional[AgentRecord]:
+        return self.agents.get(agent)
+
+    def load(self, db: sqlite3.Connection):
+        """Reload the registry persisted by a previous run"""
+        rows = db.execute(
+            'SELECT agent, first_seen, last_seen, message_count, avg_reward FROM agent_registry'
+        ).fetchall()
+        for agent, first_seen, last_seen, count, avg_reward in rows:
+            self.agents[agent] = AgentRecord(
+                _parse_ts(first_seen), _parse_ts(last_seen), count or 0, avg_reward
+            )
+        return len(rows)
+
+    def record(self, agent: str, reward: float, now: Optional[float] = None):
+        """Count one message and fold its reward into the EWMA"""
+        now = time.time() if now is None else now
+        rec = self.agents.get(agent)
+        if rec is None:
+            rec = self.agents[agent] = AgentRecord(now, now)
+        rec.last_seen = now
+        rec.message_count += 1
+        rec.unsaved += 1
+        if rec.avg_reward is None:
+            rec.avg_reward = reward
+        else:
+            rec.avg_reward += self.reward_alpha * (reward - rec.avg_reward)
+        self._dirty.add(agent)
+
+    def record_many(self, agent: str, rewards: List[float], now: Optional[float] = None):
+        """Count a batch of messages with one lookup, folding each reward into the EWMA"""
+        if not rewards:
+            return
+        now = time.time() if now is None else now
+        rec = self.agents.get(agent)
+        if rec is None:
+            rec = self.agents[agent] = AgentRecord(now, now)
+        rec.last_seen = now
+        rec.message_count += len(rewards)
+        rec.unsaved += len(rewards)
+        avg = rec.avg_reward if rec.avg_reward is not None else rewards[0]
+        for reward in rewards:
+            avg += self.reward_alpha * (reward - avg)
+        rec.avg_reward = avg
+        self._dirty.add(agent)
+
+    def snapshot(self) -> List[Tuple[str, str, str, int, float]]:
+        """Rows for every agent changed since the last snapshot (counts as deltas)"""
+        dirty, self._dirty = self._dirty, set()
+        self.snapshots += 1
+        return list(self._rows(dirty))
+
+    def _rows(self, agents) -> Iterator[Tuple[str, str, str, int, float]]:
+        for agent in agents:
+            rec = self.agents.get(agent)
+            if rec is None:
+                continue
+            unsaved, rec.unsaved = rec.unsaved, 0
+            yield (
+                agent,
+                datetime.fromtimestamp(rec.first_seen).isoformat(),
+                datetime.fromtimestamp(rec.last_seen).isoformat(),
+                unsaved,
+                rec.avg_reward if rec.avg_reward is not None else 1.0,
+            )
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "agents": len(self.agents),
+            "unsaved_agents": len(self._dirty),
+            "snapshots": self.snapshots,
+        }
+
+
+def _parse_ts(value) -> float:
+    if value is None:
+        return time.time()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
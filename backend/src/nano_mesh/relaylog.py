@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+📼 Append-only relay log with offset-based catch-up
+
+Every relay the coordinator delivers is appended to a segmented log on
+local disk and stamped with its ``offset`` (a per-coordinator sequence
+number). An agent that reconnects sends
+``{"type": "resume", "agent": ..., "offset": <last offset seen + 1>}`` and
+gets what it missed streamed back in bulk, straight from the log:
+
+- segments are plain files (``<base offset>.log``) of length-prefixed,
+  CRC-checked records; the active one is appended through a buffered
+  file that is flushed ``flush_interval`` after the first unflushed
+  write, so the hot path never waits on the disk;
+- reads go through ``mmap``: a catch-up is one sequential scan that only
+  copies out the records the agent would have received (sender, action
+  and broadcast flag sit in front of the relay so filtering never parses
+  JSON);
+- each segment has a sparse index (``<base offset>.index``, one entry per
+  ``index_interval`` bytes) so a resume seeks close to its offset and
+  scans at most one interval;
+- whole segments are deleted, oldest first, once the log is larger than
+  ``max_bytes`` or a segment is older than ``max_age`` seconds;
+- on start-up only the tail of the last segment (past its last index
+  entry) is scanned to find the next offset and cut off a torn write, so
+  recovery takes milliseconds whatever the log size.
+
+Offsets belong to one coordinator process: in sharded mode each shard
+keeps its own log, stamping the relays it delivers.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('NanoCoordinator.relaylog')
+
+# Record: payload length, CRC-32 of the payload, offset; payload: broadcast flag,
+# sender length, action length, sender, action, relay JSON
+_HEADER = struct.Struct('<IIQ')
+_PAYLOAD = struct.Struct('<BHH')
+_INDEX_ENTRY = struct.Struct('<II')  # offset - segment base, byte position
+
+# (offset, broadcast, sender, action, relay JSON)
+Record = Tuple[int, bool, str, str, bytes]
+
+
+class Segment:
+    """One log file and its sparse offset index"""
+
+    __slots__ = ('base', 'path', 'index_path', 'size', 'modified', 'index_offsets', 'index_positions', '_map')
+
+    def __init__(self, directory: str, base: int):
+        self.base = base
+        self.path = os.path.join(directory, f"{base:020d}.log")
+        self.index_path = os.path.join(directory, f"{base:020d}.index")
+        self.size = 0
+        self.modified = time.time()
+        self.index_offsets = array('I')
+        self.index_positions = array('I')
+        self._map: Optional[mmap.mmap] = None
+
+    def load_index(self):
+        """Read the index, keeping only entries that point inside the file"""
+        self.index_offsets = array('I')
+        self.index_positions = array('I')
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        for relative, position in _INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % _INDEX_ENTRY.size]):
+            if position >= self.size or (self.index_positions and position <= self.index_positions[-1]):
+                break
+            self.index_offsets.append(relative)
+            self.index_positions.append(position)
+
+    def seek(self, offset: int) -> Tuple[int, int]:
+        """(offset, position) of the last indexed record at or before ``offset``"""
+        i = bisect_right(self.index_offsets, offset - self.base) - 1
+        if i < 0:
+            return self.base, 0
+        return self.base + self.index_offsets[i], self.index_positions[i]
+
+    def view(self) -> Optional[mmap.mmap]:
+        """Read-only map of the segment (remapped when the active segment has grown)"""
+        if self._map is not None and len(self._map) >= self.size:
+            return self._map
+        self.unmap()
+        if not self.size:
+            return None
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class RelayLog:
+    """Segmented, memory-mapped relay log: append on delivery, scan from an offset to catch up"""
+
+    def __init__(self, directory: str, segment_bytes: int = 16 * 1024 * 1024,
+                 max_bytes: int = 256 * 1024 * 1024, max_age: Optional[float] = 86400.0,
+                 index_interval: int = 4096, flush_interval: float = 0.05):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_interval = index_interval
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self.segments: List[Segment] = []
+        self.next_offset = 0
+        self.appended = 0
+        self.replayed = 0
+        self.deleted_segments = 0
+        self.truncated_bytes = 0
+        self._indexed_at = 0  # position of the active segment's last index entry
+        self._unflushed = False
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+
+        started = time.perf_counter()
+        self._recover()
+        self.recovery_ms = (time.perf_counter() - started) * 1000
+        active = self.segments[-1]
+        self._file = open(active.path, 'ab')
+        self._index_file = open(active.index_path, 'ab')
+        logger.info(f"📼 Relay log {directory}: offsets {self.first_offset}..{self.next_offset} "
+                    f"in {len(self.segments)} segments (recovered in {self.recovery_ms:.1f}ms)")
+
+    @property
+    def first_offset(self) -> int:
+        """Oldest offset still retained"""
+        return self.segments[0].base
+
+    @property
+    def size(self) -> int:
+        return sum(segment.size for segment in self.segments)
+
+    # Writing
+
+    def append(self, relay: dict, action: str, broadcast: bool = False) -> int:
+        """Stamp ``relay`` with the next offset and log it"""
+        offset = relay["offset"] = self.next_offset
+        sender = str(relay.get("from", "")).encode()[:0xFFFF]
+        action_bytes = action.encode()[:0xFFFF]
+        payload = b''.join((_PAYLOAD.pack(bool(broadcast), len(sender), len(action_bytes)), sender, action_bytes,
+                            json.dumps(relay, separators=(',', ':')).encode()))
+        segment = self.segments[-1]
+        position = segment.size
+        if position - self._indexed_at >= self.index_interval:
+            self._index(segment, offset, position)
+        self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload), offset))
+        self._file.write(payload)
+        segment.size += _HEADER.size + len(payload)
+        self.next_offset += 1
+        self.appended += 1
+        if segment.size >= self.segment_bytes:
+            self._roll()
+        elif not self._unflushed:
+            self._unflushed = True
+            self._schedule_flush()
+        return offset
+
+    def _index(self, segment: Segment, offset: int, position: int):
+        segment.index_offsets.append(offset - segment.base)
+        segment.index_positions.append(position)
+        self._index_file.write(_INDEX_ENTRY.pack(offset - segment.base, position))
+        self._indexed_at = position
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # no event loop (tools, tests): write through
+            return
+        if self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Hand buffered records to the OS (they survive a coordinator crash from here on)"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._unflushed:
+            self._file.flush()
+            self._index_file.flush()
+            self.segments[-1].modified = time.time()
+            self._unflushed = False
+
+    def _roll(self):
+        """Seal the active segment and start a new one at the next offset"""
+        self._unflushed = True
+        self.flush()
+        self._file.close()
+        self._index_file.close()
+        segment = Segment(self.directory, self.next_offset)
+        self.segments.append(segment)
+        self._file = open(segment.path, 'ab')
+        self._index_file = open(segment.index_path, 'ab')
+        self._indexed_at = 0
+
+    # Reading
+
+    def read(self, offset: int, limit: int = 500, end: Optional[int] = None,
+             accept: Optional[Callable[[int, bool, str, str], bool]] = None,
+             max_scan: int = 1024 * 1024) -> Tuple[List[Record], int]:
+        """Records from ``offset`` up to ``end`` that ``accept`` keeps, and the offset to continue from
+
+        One call copies out at most ``limit`` records and scans at most
+        ``max_scan`` bytes, so callers can stream a long catch-up in chunks.
+        """
+        end = self.next_offset if end is None else min(end, self.next_offset)
+        resume = max(offset, self.first_offset)
+        records: List[Record] = []
+        if resume >= end:
+            return records, resume
+        self.flush()
+        scanned = 0
+        i = bisect_right([segment.base for segment in self.segments], resume) - 1
+        for segment in self.segments[max(i, 0):]:
+            view = segment.view()
+            if view is None:
+                continue
+            current, position = segment.seek(resume)
+            while position < segment.size and current < end:
+                length = _HEADER.unpack_from(view, position)[0]
+                start = position + _HEADER.size
+                position = start + length
+                if current >= resume:
+                    broadcast, sender_len, action_len = _PAYLOAD.unpack_from(view, start)
+                    start += _PAYLOAD.size
+                    sender = view[start:start + sender_len].decode()
+                    start += sender_len
+                    action = view[start:start + action_len].decode()
+                    if accept is None or accept(current, bool(broadcast), sender, action):
+                        records.append((current, bool(broadcast), sender, action, view[start + action_len:position]))
+                    resume = current + 1
+                    scanned += position - start
+                    if len(records) >= limit or scanned >= max_scan:
+                        self.replayed += len(records)
+                        return records, resume
+                current += 1
+            if resume >= end:
+                break
+        self.replayed += len(records)
+        return records, resume
+
+    # Retention and recovery
+
+    def enforce(self, now: Optional[float] = None) -> int:
+        """Delete the oldest sealed segments past ``max_bytes`` / ``max_age``; returns how many"""
+        now = time.time() if now is None else now
+        total = self.size
+        deleted = 0
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            if total <= self.max_bytes and not (self.max_age and now - oldest.modified > self.max_age):
+                break
+            oldest.unmap()
+            for path in (oldest.path, oldest.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= oldest.size
+            self.segments.pop(0)
+            deleted += 1
+        if deleted:
+            self.deleted_segments += deleted
+            logger.info(f"📼 Relay log retention: {deleted} segments deleted, offsets now start at {self.first_offset}")
+        return deleted
+
+    def _recover(self):
+        """Open the existing segments; only the tail of the last one is scanned"""
+        bases = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                       if name.endswith('.log') and name[:-4].isdigit())
+        for base in bases:
+            segment = Segment(self.directory, base)
+            segment.size = os.path.getsize(segment.path)
+            segment.modified = os.path.getmtime(segment.path)
+            self.segments.append(segment)
+        if not self.segments:
+            segment = Segment(self.directory, 0)
+            open(segment.path, 'ab').close()
+            self.segments.append(segment)
+        for segment in self.segments[:-1]:
+            segment.load_index()
+        active = self.segments[-1]
+        active.load_index()
+        self.next_offset, valid = self._scan_tail(active)
+        if valid < active.size:
+            # Torn or corrupt tail (crash mid-write): cut it off
+            self.truncated_bytes = active.size - valid
+            logger.warning(f"📼 Relay log: truncating {self.truncated_bytes} bytes after offset {self.next_offset}")
+            with open(active.path, 'r+b') as f:
+                f.truncate(valid)
+            active.size = valid
+        # Rewrite the index when it held entries for the dropped tail or missed some of the scanned ones
+        with open(active.index_path, 'wb') as f:
+            f.write(b''.join(_INDEX_ENTRY.pack(relative, position)
+                             for relative, position in zip(active.index_offsets, active.index_positions)))
+        self._indexed_at = active.index_positions[-1] if active.index_positions else 0
+
+    def _scan_tail(self, segment: Segment) -> Tuple[int, int]:
+        """(next offset, end of the last intact record) of the active segment"""
+        with open(segment.path, 'rb') as f:
+            while True:
+                expected, position = segment.seek(segment.base + segment.index_offsets[-1]
+                                                  if segment.index_offsets else segment.base)
+                f.seek(position)
+                data = f.read()
+                cursor = 0
+                indexed = position
+                while cursor + _HEADER.size <= len(data):
+                    length, crc, offset = _HEADER.unpack_from(data, cursor)
+                    payload = data[cursor + _HEADER.size:cursor + _HEADER.size + length]
+                    if offset != expected or len(payload) != length or zlib.crc32(payload) != crc:
+                        break
+                    if position + cursor - indexed >= self.index_interval:
+                        indexed = position + cursor
+                        segment.index_offsets.append(offset - segment.base)
+                        segment.index_positions.append(indexed)
+                    cursor += _HEADER.size + length
+                    expected += 1
+                if cursor or not data or not segment.index_offsets:
+                    return expected, position + cursor
+                # The last index entry points at a record that never made it to disk: drop it
+                segment.index_offsets.pop()
+                segment.index_positions.pop()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._index_file.close()
+        for segment in self.segments:
+            segment.unmap()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "directory": self.directory,
+            "segments": len(self.segments),
+            "bytes": self.size,
+            "first_offset": self.first_offset,
+            "next_offset": self.next_offset,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "deleted_segments": self.deleted_segments,
+            "recovery_ms": round(self.recovery_ms, 2),
+            "truncated_bytes": self.truncated_bytes,
+        }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+🧹 Retention for nano_memory.db
+
+Enforces the episodic-memory limits declared in nano-coordinator.aix
+(``max_memories`` and ``ttl``) without ever scanning the table:
+
+- ``max_memories`` is a ring buffer. Each row is written into slot
+  ``seq % max_memories + 1`` (``memory_log.id``, the rowid) with INSERT
+  OR REPLACE, so the newest row overwrites the oldest and the table
+  never grows.
+- ``ttl`` is enforced by a periodic ``DELETE ... WHERE ts_us < cutoff``.
+  The ring bounds it to at most ``max_memories`` rows.
+- Expired raw rows are already summarized in the rollup tables. Those
+  are trimmed on their own, longer TTLs. ``memory_rollup_total`` (the
+  all-time totals) is never swept.
+
+In sharded mode every shard owns a disjoint range of
+``max_memories // shards`` ring slots, so the processes never overwrite
+each other's rows; ``max_memories`` must therefore be at least the shard
+count.
+"""
+
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .schema import MEMORY_COLUMNS, MEMORY_TABLE
+
+logger = logging.getLogger('NanoCoordinator.retention')
+
+
+class RetentionPolicy:
+    """Ring-buffer cap plus TTL sweeps for raw memory and rollups"""
+
+    def __init__(self, max_memories: Optional[int] = 10000, ttl: Optional[float] = 86400,
+                 minute_rollup_ttl: Optional[float] = 2 * 86400, hour_rollup_ttl: Optional[float] = 30 * 86400,
+                 shard: int = 0, shards: int = 1):
+        if max_memories and max_memories < shards:
+            raise ValueError(f"max_memories ({max_memories}) must be at least the shard count ({shards})")
+        self.max_memories = max_memories
+        self.shards = shards
+        self.slots = max_memories // shards if max_memories else None
+        self.slot_base = shard * self.slots if max_memories else 0
+        self.ttl = ttl
+        self.minute_rollup_ttl = minute_rollup_ttl
+        self.hour_rollup_ttl = hour_rollup_ttl
+        self._seq = 0
+        columns = ', '.join(MEMORY_COLUMNS)
+        placeholders = ', '.join('?' for _ in MEMORY_COLUMNS)
+        self._append_sql = f'INSERT INTO {MEMORY_TABLE} ({columns}) VALUES ({placeholders})'
+        self._slot_sql = f'INSERT OR REPLACE INTO {MEMORY_TABLE} (id, {columns}) VALUES (?, {placeholders})'
+        self.rows_written = 0
+        self.sweeps = 0
+        self.last_sweep: Optional[float] = None
+
+    def prepare(self, db: sqlite3.Connection):
+        """Add indexes, compact an over-sized legacy table and find the ring position"""
+        db.execute(f'CREATE INDEX IF NOT EXISTS idx_memory_log_agent_ts ON {MEMORY_TABLE} (agent_id, ts_us)')
+        # Serves the TTL sweep and the API's newest-first history pages
+        db.execute(f'CREATE INDEX IF NOT EXISTS idx_memory_log_ts ON {MEMORY_TABLE} (ts_us)')
+        if not self.max_memories:
+            db.commit()
+            return
+        max_rowid = db.execute(f'SELECT MAX(id) FROM {MEMORY_TABLE}').fetchone()[0] or 0
+        if max_rowid > self.slots * self.shards:
+            self._compact(db)
+        # The newest row in our slot range marks the last slot written before the restart
+        newest = db.execute(f'''
+            SELECT id FROM {MEMORY_TABLE} WHERE id > ? AND id <= ? ORDER BY ts_us DESC LIMIT 1
+        ''', (self.slot_base, self.slot_base + self.slots)).fetchone()
+        self._seq = newest[0] - self.slot_base if newest else 0
+        db.commit()
+
+    def insert(self, row: Sequence[Any]) -> Tuple[str, Sequence[Any]]:
+        """Statement writing one memory row into the next ring slot"""
+        self.rows_written += 1
+        if not self.max_memories:
+            return self._append_sql, row
+        slot = self.slot_base + self._seq % self.slots + 1
+        self._seq += 1
+        return self._slot_sql, (slot, *row)
+
+    def sweep(self, now: Optional[float] = None) -> List[Tuple[str, Sequence[Any]]]:
+        """TTL deletes for raw memory and both rollup tables"""
+        now = time.time() if now is None else now
+        statements = []
+        if self.ttl:
+            statements.append((f'DELETE FROM {MEMORY_TABLE} WHERE ts_us < ?', (int((now - self.ttl) * 1_000_000),)))
+        if self.minute_rollup_ttl:
+            statements.append(('DELETE FROM memory_rollup_minute WHERE bucket < ?',
+                               (int(now - self.minute_rollup_ttl),)))
+        if self.hour_rollup_ttl:
+            statements.append(('DELETE FROM memory_rollup_hour WHERE bucket < ?',
+                               (int(now - self.hour_rollup_ttl),)))
+        self.sweeps += 1
+        self.last_sweep = now
+        return statements
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_memories": self.max_memories,
+            "ttl_seconds": self.ttl,
+            "ring_position": self._seq % self.slots if self.max_memories else None,
+            "rows_written": self.rows_written,
+            "sweeps": self.sweeps,
+            "last_sweep": datetime.fromtimestamp(self.last_sweep).isoformat() if self.last_sweep else None,
+        }
+
+    def _compact(self, db: sqlite3.Connection):
+        """Keep the newest rows that fit the ring and deal them into the shards' slot ranges
+
+        Kept rows are numbered oldest first and row ``r`` goes to shard
+        ``r % shards``, slot ``r // shards``, so every shard's range holds
+        its rows in time order and each ring resumes after its newest row.
+        Runs once before the shard processes start (``run_sharded``).
+        """
+        columns = ', '.join(MEMORY_COLUMNS)
+        capacity = self.slots * self.shards
+        before = db.execute(f'SELECT COUNT(*) FROM {MEMORY_TABLE}').fetchone()[0]
+        db.execute(f'''
+            CREATE TEMP TABLE memory_keep AS
+            SELECT {columns} FROM {MEMORY_TABLE} ORDER BY ts_us DESC, id DESC LIMIT ?
+        ''', (capacity,))
+        db.execute(f'DELETE FROM {MEMORY_TABLE}')
+        db.execute(f'''
+            INSERT INTO {MEMORY_TABLE} (id, {columns})
+            SELECT (r % ?) * ? + r / ? + 1, {columns} FROM (
+                SELECT ROW_NUMBER() OVER (ORDER BY ts_us, rowid DESC) - 1 AS r, {columns} FROM memory_keep
+            )
+        ''', (self.shards, self.slots, self.shards))
+        db.execute('DROP TABLE memory_keep')
+        db.commit()
+        db.execute('VACUUM')
+        logger.info(f"🧹 Compacted memory table: {before} → {min(before, capacity)} rows")
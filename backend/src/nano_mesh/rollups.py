@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+📊 Running aggregates and time-bucketed rollups
+
+``get_stats()`` used to scan the whole ``memory`` table on every call.
+Instead every message is folded into:
+
+- all-time running totals held in memory (O(1) to read),
+- a ring of per-minute buckets for the last hour, global and per agent,
+  which answers windowed stats such as "last 5 minutes" from memory,
+- ``memory_rollup_minute`` / ``memory_rollup_hour`` tables, updated
+  incrementally by upserting the per-minute deltas through the
+  write-behind writer, for windows longer than the in-memory ring.
+- ``memory_rollup_total``, one row per agent (``bucket`` 0) updated from
+  the same deltas, which retention never sweeps: the all-time totals are
+  restored from it at startup, so they do not shrink as old hour
+  buckets expire.
+"""
+
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from .schema import LATENCY_SCALE, MEMORY_TABLE, REWARD_SCALE
+
+ROLLUP_TABLES = {
+    'memory_rollup_minute': 60,
+    'memory_rollup_hour': 3600,
+}
+TOTALS_TABLE = 'memory_rollup_total'
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket INTEGER,
+        agent TEXT,
+        messages INTEGER,
+        latency_sum REAL,
+        latency_max REAL,
+        reward_sum REAL,
+        PRIMARY KEY (bucket, agent)
+    )
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO {table} (bucket, agent, messages, latency_sum, latency_max, reward_sum)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, agent) DO UPDATE SET
+        messages = messages + excluded.messages,
+        latency_sum = latency_sum + excluded.latency_sum,
+        latency_max = MAX(latency_max, excluded.latency_max),
+        reward_sum = reward_sum + excluded.reward_sum
+'''
+
+
+class Bucket:
+    """Message count and latency / reward sums for one time bucket"""
+
+    __slots__ = ('messages', 'latency_sum', 'latency_max', 'reward_sum')
+
+    def __init__(self, messages=0, latency_sum=0.0, latency_max=0.0, reward_sum=0.0):
+        self.messages = messages
+        self.latency_sum = latency_sum
+        self.latency_max = latency_max
+        self.reward_sum = reward_sum
+
+    def add(self, latency_ms: float, reward: float):
+        self.messages += 1
+        self.latency_sum += latency_ms
+        self.reward_sum += reward
+        if latency_ms > self.latency_max:
+            self.latency_max = latency_ms
+
+    def merge(self, other: 'Bucket'):
+        self.messages += other.messages
+        self.latency_sum += other.latency_sum
+        self.reward_sum += other.reward_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+
+    def summary(self) -> Dict[str, float]:
+        n = self.messages
+        return {
+            "messages": n,
+            "avg_latency_ms": round(self.latency_sum / n, 2) if n else 0,
+            "max_latency_ms": round(self.latency_max, 2),
+            "avg_reward": round(self.reward_sum / n, 3) if n else 0,
+        }
+
+
+class Rollups:
+    """All-time totals, an in-memory minute ring and on-disk rollup tables"""
+
+    def __init__(self, keep_minutes: int = 60):
+        self.keep_minutes = keep_minutes
+        self.totals = Bucket()
+        self.session = Bucket()
+        self._minutes: Dict[int, Bucket] = {}
+        self._agent_minutes: Dict[int, Dict[str, Bucket]] = {}
+        self._pending: Dict[Tuple[int, str], Bucket] = {}
+
+    @staticmethod
+    def create_tables(db: sqlite3.Connection):
+        for table in (*ROLLUP_TABLES, TOTALS_TABLE):
+            db.execute(SCHEMA.format(table=table))
+
+    def load(self, db: sqlite3.Connection) -> int:
+        """Restore all-time totals, backfilling rollups from raw rows if needed
+
+        The backfill is a one-off GROUP BY over the integer columns of
+        ``memory_log`` for databases written before the rollup tables
+        existed. The totals table is seeded once from the hour table (for
+        databases written before it existed); afterwards totals come from it.
+        """
+        has_rollups = db.execute('SELECT 1 FROM memory_rollup_hour LIMIT 1').fetchone()
+        if not has_rollups:
+            for table, width in ROLLUP_TABLES.items():
+                db.execute(f'''
+                    INSERT INTO {table} (bucket, agent, messages, latency_sum, latency_max, reward_sum)
+                    SELECT m.ts_us / {width * 1_000_000} * {width}, a.name, COUNT(*),
+                           SUM(m.latency_us) / {LATENCY_SCALE}.0, MAX(m.latency_us) / {LATENCY_SCALE}.0,
+                           SUM(m.reward_q) / {REWARD_SCALE}.0
+                    FROM {MEMORY_TABLE} m
+                    LEFT JOIN memory_agents a ON a.id = m.agent_id
+                    WHERE m.ts_us IS NOT NULL
+                    GROUP BY 1, 2
+                ''')
+            db.commit()
+        if not db.execute(f'SELECT 1 FROM {TOTALS_TABLE} LIMIT 1').fetchone():
+            db.execute(f'''
+                INSERT INTO {TOTALS_TABLE} (bucket, agent, messages, latency_sum, latency_max, reward_sum)
+                SELECT 0, agent, SUM(messages), SUM(latency_sum), MAX(latency_max), SUM(reward_sum)
+                FROM memory_rollup_hour
+                GROUP BY agent
+            ''')
+            db.commit()
+        row = db.execute(f'''
+            SELECT SUM(messages), SUM(latency_sum), MAX(latency_max), SUM(reward_sum)
+            FROM {TOTALS_TABLE}
+        ''').fetchone()
+        self.totals = Bucket(row[0] or 0, row[1] or 0.0, row[2] or 0.0, row[3] or 0.0)
+
+        # Seed the minute ring so windowed stats survive a restart
+        since = int(time.time()) // 60 * 60 - (self.keep_minutes - 1) * 60
+        for minute, agent, messages, latency_sum, latency_max, reward_sum in db.execute('''
+            SELECT bucket, agent, messages, latency_sum, latency_max, reward_sum
+            FROM memory_rollup_minute WHERE bucket >= ?
+        ''', (since,)):
+            restored = Bucket(messages, latency_sum, latency_max, reward_sum)
+            self._minutes.setdefault(minute, Bucket()).merge(restored)
+            self._agent_minutes.setdefault(minute, {})[agent] = restored
+        return self.totals.messages
+
+    def record(self, agent: str, latency_ms: float, reward: float, now: Optional[float] = None):
+        """Fold one message into every aggregate"""
+        for bucket in self._buckets(agent, now):
+            bucket.add(latency_ms, reward)
+
+    def record_many(self, agent: str, samples: Iterable[Tuple[float, float]], now: Optional[float] = None):
+        """Fold a batch of (latency_ms, reward) samples from one agent, looking buckets up once"""
+        buckets = self._buckets(agent, now)
+        for latency_ms, reward in samples:
+            for bucket in buckets:
+                bucket.add(latency_ms, reward)
+
+    def _buckets(self, agent: str, now: Optional[float]) -> Tuple[Bucket, ...]:
+        """Every aggregate a message from ``agent`` at ``now`` counts towards"""
+        now = time.time() if now is None else now
+        minute = int(now) // 60 * 60
+
+        bucket = self._minutes.get(minute)
+        if bucket is None:
+            bucket = self._minutes[minute] = Bucket()
+            self._agent_minutes[minute] = {}
+            self._expire(minute)
+
+        agents = self._agent_minutes[minute]
+        agent_bucket = agents.get(agent)
+        if agent_bucket is None:
+            agent_bucket = agents[agent] = Bucket()
+
+        pending = self._pending.get((minute, agent))
+        if pending is None:
+            pending = self._pending[(minute, agent)] = Bucket()
+        return self.totals, self.session, bucket, agent_bucket, pending
+
+    def window(self, seconds: int, agent: Optional[str] = None, now: Optional[float] = None) -> Bucket:
+        """Aggregate over the last ``seconds`` from the in-memory minute ring
+
+        Resolution is one minute: the current, partial minute is included.
+        """
+        now = time.time() if now is None else now
+        since = (int(now) - seconds) // 60 * 60 + 60
+        result = Bucket()
+        for minute, bucket in self._minutes.items():
+            if minute < since:
+                continue
+            if agent is None:
+                result.merge(bucket)
+            elif agent in self._agent_minutes[minute]:
+                result.merge(self._agent_minutes[minute][agent])
+        return result
+
+    def query_window(self, db: sqlite3.Connection, seconds: int, agent: Optional[str] = None,
+                     now: Optional[float] = None) -> Bucket:
+        """Aggregate an arbitrary window from the rollup tables (no raw scan)
+
+        Only flushed rollups are visible here; use ``window`` for the last hour.
+        """
+        now = time.time() if now is None else now
+        table, width = ('memory_rollup_minute', 60) if seconds <= 6 * 3600 else ('memory_rollup_hour', 3600)
+        since = (int(now) - seconds) // width * width + width
+        sql = f'''
+            SELECT SUM(messages), SUM(latency_sum), MAX(latency_max), SUM(reward_sum)
+            FROM {table} WHERE bucket >= ?
+        '''
+        params = [since]
+        if agent is not None:
+            sql += ' AND agent = ?'
+            params.append(agent)
+        row = db.execute(sql, params).fetchone()
+        return Bucket(row[0] or 0, row[1] or 0.0, row[2] or 0.0, row[3] or 0.0)
+
+    def drain(self):
+        """Pending per-minute deltas as (sql, params) upserts for both rollup tables and the totals"""
+        pending, self._pending = self._pending, {}
+        statements = []
+        for table, width in ROLLUP_TABLES.items():
+            sql = UPSERT_SQL.format(table=table)
+            for (minute, agent), b in pending.items():
+                bucket = minute // width * width
+                statements.append((sql, (bucket, agent, b.messages, b.latency_sum, b.latency_max, b.reward_sum)))
+        totals: Dict[str, Bucket] = {}
+        for (_, agent), b in pending.items():
+            totals.setdefault(agent, Bucket()).merge(b)
+        sql = UPSERT_SQL.format(table=TOTALS_TABLE)
+        for agent, b in totals.items():
+            statements.append((sql, (0, agent, b.messages, b.latency_sum, b.latency_max, b.reward_sum)))
+        return statements
+
+    def _expire(self, current_minute: int):
+        oldest = current_minute - (self.keep_minutes - 1) * 60
+        for minute in [m for m in self._minutes if m < oldest]:
+            del self._minutes[minute]
+            del self._agent_minutes[minute]
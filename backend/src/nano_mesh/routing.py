@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+🧭 Topic routing for the mesh
+
+Agents subscribe to action prefixes such as ``search:`` or ``analyze:``.
+Subscriptions live in a character trie, so matching an action costs one
+walk along its characters regardless of how many agents are connected,
+and a relay only goes to agents whose prefix matches. The empty prefix
+subscribes to everything; agents that never subscribe keep receiving all
+relays through an implicit empty-prefix subscription.
+"""
+
+from typing import Dict, Iterable, Optional, Set
+
+
+class _Node:
+    __slots__ = ('children', 'subscribers')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.subscribers: Set[str] = set()
+
+
+class TopicRouter:
+    """Prefix trie from action prefixes to subscribed agents"""
+
+    def __init__(self):
+        self._root = _Node()
+        self._topics: Dict[str, Set[str]] = {}
+        self._implicit: Set[str] = set()
+        self.routed = 0
+        self.deliveries = 0
+
+    @staticmethod
+    def normalize(topic: str) -> str:
+        return topic.strip().lower()
+
+    def attach(self, agent: str):
+        """Give a newly connected agent the implicit subscribe-to-everything"""
+        if agent not in self._topics:
+            self._add(agent, '')
+            self._implicit.add(agent)
+
+    def detach(self, agent: str):
+        """Drop every subscription of a disconnected agent"""
+        for topic in list(self._topics.get(agent, ())):
+            self._remove(agent, topic)
+        self._implicit.discard(agent)
+
+    def subscribe(self, agent: str, topics: Iterable[str]):
+        """Subscribe to action prefixes, replacing the implicit wildcard"""
+        if agent in self._implicit:
+            self._implicit.discard(agent)
+            self._remove(agent, '')
+        for topic in topics:
+            self._add(agent, self.normalize(topic))
+
+    def unsubscribe(self, agent: str, topics: Optional[Iterable[str]] = None):
+        """Remove some (or, with ``topics=None``, all) explicit subscriptions"""
+        if topics is None:
+            topics = list(self._topics.get(agent, ()))
+        for topic in topics:
+            self._remove(agent, self.normalize(topic))
+
+    def topics(self, agent: str) -> Set[str]:
+        return set(self._topics.get(agent, ()))
+
+    def subscribed(self, agent: str, action: str) -> bool:
+        """Whether ``agent`` receives relays of ``action``"""
+        action = action.lower()
+        return any(action.startswith(topic) for topic in self._topics.get(agent, ()))
+
+    def distinct_topics(self) -> Set[str]:
+        """Every prefix at least one agent is subscribed to ('' for wildcards)"""
+        distinct = set()
+        for topics in self._topics.values():
+            distinct |= topics
+        return distinct
+
+    def match(self, action: str) -> Set[str]:
+        """All agents subscribed to a prefix of ``action``"""
+        node = self._root
+        matched = set(node.subscribers)
+        for ch in action.lower():
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.subscribers:
+                matched |= node.subscribers
+        return matched
+
+    def record(self, deliveries: int):
+        self.routed += 1
+        self.deliveries += deliveries
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "subscribed_agents": len(self._topics) - len(self._implicit),
+            "wildcard_agents": len(self._implicit),
+            "topics": len(self.distinct_topics()),
+            "routed_messages": self.routed,
+            "deliveries": self.deliveries,
+            "avg_fanout": round(self.deliveries / self.routed, 2) if self.routed else 0,
+        }
+
+    def _add(self, agent: str, topic: str):
+        node = self._root
+        for ch in topic:
+            node = node.children.setdefault(ch, _Node())
+        node.subscribers.add(agent)
+        self._topics.setdefault(agent, set()).add(topic)
+
+    def _remove(self, agent: str, topic: str):
+        agent_topics = self._topics.get(agent)
+        if not agent_topics or topic not in agent_topics:
+            return
+        agent_topics.discard(topic)
+        if not agent_topics:
+            del self._topics[agent]
+        # Walk down, then prune nodes that no longer lead anywhere
+        path = [self._root]
+        for ch in topic:
+            path.append(path[-1].children[ch])
+        path[-1].subscribers.discard(agent)
+        for depth in range(len(topic), 0, -1):
+            node = path[depth]
+            if node.subscribers or node.children:
+                break
+            del path[depth - 1].children[topic[depth - 1]]
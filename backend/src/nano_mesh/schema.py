@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+🗜️ Compact, dictionary-encoded storage for nano_memory.db
+
+Agents repeat the same names and the same few action verbs on every row,
+so the raw log stores them once:
+
+    memory_agents (id, name)     agent names, interned
+    memory_verbs  (id, verb)     the part of an action before ``:``
+    memory_log    (id, ts_us, agent_id, verb_id, detail, reward_q, latency_us)
+
+``ts_us`` is integer epoch microseconds, ``reward_q`` the reward in
+hundredths and ``latency_us`` the latency in microseconds, so a row is a
+handful of small integers plus the action's tail (``detail``, NULL when
+the action has no ``:``). ``id`` is the rowid, i.e. the retention ring
+slot. Actions whose verb is too long, or that arrive once the verb
+dictionary holds ``max_verbs`` entries, keep ``verb_id`` NULL and their
+whole text in ``detail``, so free-text actions cannot grow the dictionary.
+Non-string actions (``{"op": "search"}``) are stored as their JSON text.
+
+The ``memory`` view decodes rows back to the original five columns
+(``ts`` as local ISO-8601 text, ``agent``, ``action``, ``reward``,
+``latency_ms``), so ad-hoc readers and ``SELECT *`` keep working. A view
+has no rowid: readers that need the row id (the ring slot), and hot
+readers, query ``memory_log`` directly and filter on its integer columns.
+
+``MemoryCodec`` interns new names on the event loop: it hands out IDs
+from its own residue class (``shard + 1``, ``+ shards``, ...) so shards
+sharing the database never collide, and returns the dictionary INSERTs
+to queue on the writer ahead of the row that first uses them. If the
+writer rejects one of those INSERTs, ``discard`` (the writer's
+``on_reject`` hook) evicts the cached ID, so the name is interned again
+instead of pointing later rows at a missing entry.
+
+``create`` converts a legacy ``memory`` table (text ``ts``, ``agent``,
+``action``) in one transaction, keeping each row's rowid so the ring
+position survives, then VACUUMs to hand the space back.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('NanoCoordinator.schema')
+
+MEMORY_TABLE = 'memory_log'
+MEMORY_COLUMNS = ('ts_us', 'agent_id', 'verb_id', 'detail', 'reward_q', 'latency_us')
+REWARD_SCALE = 100       # reward_q = round(reward * 100)
+LATENCY_SCALE = 1000     # latency_us = round(latency_ms * 1000)
+MAX_VERB_LENGTH = 64
+
+INTERN_SQL = {
+    'memory_agents': 'INSERT OR IGNORE INTO memory_agents (id, name) VALUES (?, ?)',
+    'memory_verbs': 'INSERT OR IGNORE INTO memory_verbs (id, verb) VALUES (?, ?)',
+}
+
+TABLES = (
+    'CREATE TABLE IF NOT EXISTS memory_agents (id INTEGER PRIMARY KEY, name TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_memory_agents_name ON memory_agents (name)',
+    'CREATE TABLE IF NOT EXISTS memory_verbs (id INTEGER PRIMARY KEY, verb TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_memory_verbs_verb ON memory_verbs (verb)',
+    f'''CREATE TABLE IF NOT EXISTS {MEMORY_TABLE} (
+        id INTEGER PRIMARY KEY,
+        ts_us INTEGER,
+        agent_id INTEGER,
+        verb_id INTEGER,
+        detail TEXT,
+        reward_q INTEGER,
+        latency_us INTEGER
+    )''',
+)
+
+VIEW = f'''
+    CREATE VIEW IF NOT EXISTS memory AS
+    SELECT strftime('%Y-%m-%dT%H:%M:%S', m.ts_us / 1000000, 'unixepoch', 'localtime')
+               || printf('.%06d', m.ts_us % 1000000) AS ts,
+           a.name AS agent,
+           CASE WHEN m.verb_id IS NULL THEN m.detail
+                WHEN m.detail IS NULL THEN v.verb
+                ELSE v.verb || ':' || m.detail END AS action,
+           m.reward_q / {REWARD_SCALE}.0 AS reward,
+           m.latency_us / {LATENCY_SCALE}.0 AS latency_ms
+    FROM {MEMORY_TABLE} m
+    LEFT JOIN memory_agents a ON a.id = m.agent_id
+    LEFT JOIN memory_verbs v ON v.id = m.verb_id
+'''
+
+
+def action_text(action: Any) -> Optional[str]:
+    """An action as text: strings as-is, anything else as JSON (None stays None)"""
+    if action is None or isinstance(action, str):
+        return action
+    return json.dumps(action, default=str)
+
+
+def split_action(action: Any) -> Tuple[Optional[str], Optional[str]]:
+    """(verb, detail) of an action: ``"research:ai"`` → ``("research", "ai")``"""
+    action = action_text(action)
+    if action is None:
+        return None, None
+    verb, sep, detail = action.partition(':')
+    if len(verb) > MAX_VERB_LENGTH:
+        return None, action
+    return verb, detail if sep else None
+
+
+def to_micros(ts: Optional[str]) -> Optional[int]:
+    """Epoch microseconds of a legacy local ISO-8601 ``ts``"""
+    if ts is None:
+        return None
+    try:
+        moment = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+    return int(moment.replace(microsecond=0).timestamp()) * 1_000_000 + moment.microsecond
+
+
+def from_micros(ts_us: Optional[int]) -> Optional[str]:
+    """Local ISO-8601 text of epoch microseconds (the legacy ``ts`` format)"""
+    if ts_us is None:
+        return None
+    return datetime.fromtimestamp(ts_us // 1_000_000).replace(microsecond=ts_us % 1_000_000).isoformat()
+
+
+class MemoryCodec:
+    """Interns agent names and verbs and encodes memory rows as integers"""
+
+    def __init__(self, shard: int = 0, shards: int = 1, max_verbs: int = 4096):
+        self.shard = shard
+        self.shards = shards
+        self.max_verbs = max_verbs
+        self.agents: Dict[str, int] = {}
+        self.verbs: Dict[str, int] = {}
+        self._next = {'memory_agents': shard + 1, 'memory_verbs': shard + 1}
+        self._rejected: Deque[Tuple[str, int, str]] = deque()  # appended by the writer thread
+        self.interned = 0
+        self.evicted = 0
+
+    def load(self, db: sqlite3.Connection) -> int:
+        """Read both dictionaries and place our next IDs past everything already used"""
+        for table, column, names in (('memory_agents', 'name', self.agents),
+                                     ('memory_verbs', 'verb', self.verbs)):
+            highest = 0
+            for entry_id, name in db.execute(f'SELECT id, {column} FROM {table}'):
+                names.setdefault(name, entry_id)
+                highest = max(highest, entry_id)
+            # Smallest ID above ``highest`` in this shard's residue class
+            self._next[table] = highest + 1 + (self.shard - highest) % self.shards
+        return len(self.agents) + len(self.verbs)
+
+    def encode(self, ts_us: int, agent: Optional[str], action: Any, reward: Optional[float],
+               latency_ms: Optional[float], statements: List[Tuple[str, Sequence[Any]]]) -> Tuple[Any, ...]:
+        """A ``MEMORY_COLUMNS`` row; dictionary INSERTs for new names are appended to ``statements``"""
+        if self._rejected:
+            self._evict()
+        action = action_text(action)
+        verb, detail = split_action(action)
+        verb_id = None
+        if verb is not None:
+            verb_id = self.verbs.get(verb)
+            if verb_id is None:
+                if len(self.verbs) < self.max_verbs:
+                    verb_id = self._intern('memory_verbs', 'verb', self.verbs, verb, statements)
+                else:
+                    detail = action
+        agent_id = None
+        if agent is not None:
+            agent_id = self.agents.get(agent)
+            if agent_id is None:
+                agent_id = self._intern('memory_agents', 'name', self.agents, agent, statements)
+        return (
+            ts_us,
+            agent_id,
+            verb_id,
+            detail,
+            round(reward * REWARD_SCALE) if reward is not None else None,
+            round(latency_ms * LATENCY_SCALE) if latency_ms is not None else None,
+        )
+
+    def _intern(self, table: str, column: str, names: Dict[str, int], name: str,
+                statements: List[Tuple[str, Sequence[Any]]]) -> int:
+        entry_id = names[name] = self._next[table]
+        self._next[table] += self.shards
+        self.interned += 1
+        statements.append((INTERN_SQL[table], (entry_id, name)))
+        return entry_id
+
+    def discard(self, sql: str, params: Sequence[Any]):
+        """Writer hook for a statement that was not written (called on the writer thread)"""
+        for table, intern_sql in INTERN_SQL.items():
+            if sql == intern_sql:
+                self._rejected.append((table, *params))
+
+    def _evict(self):
+        """Forget IDs whose dictionary INSERT never reached the database"""
+        while self._rejected:
+            table, entry_id, name = self._rejected.popleft()
+            names = self.agents if table == 'memory_agents' else self.verbs
+            if names.get(name) == entry_id:
+                del names[name]
+                self.evicted += 1
+                logger.warning(f"🗜️ Re-interning {name!r}: its {table} entry was not written")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agents": len(self.agents),
+            "verbs": len(self.verbs),
+            "max_verbs": self.max_verbs,
+            "interned": self.interned,
+            "evicted": self.evicted,
+        }
+
+
+def create(db: sqlite3.Connection, max_verbs: int = 4096):
+    """Create the compact tables and the ``memory`` view, migrating a legacy table first"""
+    legacy = db.execute("SELECT type FROM sqlite_master WHERE name = 'memory'").fetchone()
+    if legacy is not None and legacy[0] == 'table':
+        _migrate(db, max_verbs)
+    else:
+        for sql in TABLES:
+            db.execute(sql)
+        db.execute(VIEW)
+        db.commit()
+
+
+def _migrate(db: sqlite3.Connection, max_verbs: int):
+    """Rewrite the legacy ``memory`` table into ``memory_log`` and swap in the view"""
+    db.commit()
+    db.create_function('memory_us', 1, to_micros, deterministic=True)
+    db.create_function('memory_verb', 1, lambda action: split_action(action)[0], deterministic=True)
+    db.create_function('memory_detail', 1, lambda action: split_action(action)[1], deterministic=True)
+    rows = db.execute('SELECT COUNT(*) FROM memory').fetchone()[0]
+    before = _file_size(db)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for sql in TABLES:
+            db.execute(sql)
+        db.execute('''
+            INSERT INTO memory_agents (name)
+            SELECT DISTINCT agent FROM memory
+            WHERE agent IS NOT NULL AND agent NOT IN (SELECT name FROM memory_agents)
+        ''')
+        # The most frequent verbs get dictionary entries; the rest stay in ``detail``
+        db.execute('''
+            INSERT INTO memory_verbs (verb)
+            SELECT verb FROM (
+                SELECT memory_verb(action) AS verb, COUNT(*) AS uses FROM memory GROUP BY 1
+            )
+            WHERE verb IS NOT NULL AND verb NOT IN (SELECT verb FROM memory_verbs)
+            ORDER BY uses DESC LIMIT ?
+        ''', (max_verbs,))
+        db.execute(f'''
+            INSERT INTO {MEMORY_TABLE} (id, {', '.join(MEMORY_COLUMNS)})
+            SELECT m.rowid, memory_us(m.ts), a.id, v.id,
+                   CASE WHEN v.id IS NULL THEN m.action ELSE memory_detail(m.action) END,
+                   CAST(round(m.reward * {REWARD_SCALE}) AS INTEGER),
+                   CAST(round(m.latency_ms * {LATENCY_SCALE}) AS INTEGER)
+            FROM memory m
+            LEFT JOIN memory_agents a ON a.id = (SELECT MIN(id) FROM memory_agents WHERE name = m.agent)
+            LEFT JOIN memory_verbs v ON v.id = (
+                SELECT MIN(id) FROM memory_verbs WHERE verb = memory_verb(m.action)
+            )
+        ''')
+        db.execute('DROP TABLE memory')
+        db.execute(VIEW)
+        db.commit()
+    except sqlite3.Error:
+        db.rollback()
+        raise
+    db.execute('VACUUM')
+    logger.info(f"🗜️ Migrated {rows} memory rows to the compact schema "
+                f"({before / 1e6:.1f}MB → {_file_size(db) / 1e6:.1f}MB)")
+
+
+def _file_size(db: sqlite3.Connection) -> int:
+    path = db.execute('PRAGMA database_list').fetchone()[2]
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
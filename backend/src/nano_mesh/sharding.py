@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+🧬 Multi-process sharding for the coordinator
+
+``run_sharded()`` starts N worker processes that all bind the websocket
+port with SO_REUSEPORT, so the kernel spreads agent connections across
+them and each worker owns the agents that connected to it. Workers are
+joined by a ``ShardBus``: a full mesh of Unix domain sockets carrying
+length-prefixed pickled frames. The bus carries:
+
+- ``join`` / ``leave`` / ``snapshot``: the shared agent directory
+  (agent name → owning shard). Each shard is authoritative for its own
+  agents and replays a full snapshot whenever a peer link comes up.
+- ``topics``: the distinct topic prefixes subscribed on a shard, so a
+  relay is only forwarded to shards with at least one matching agent.
+- ``relay``: a relay envelope that the receiving shard delivers to its
+  local subscribers.
+- ``task`` / ``task_leave`` / ``control``: task frames of every shard's
+  agents go to the single dispatcher on shard 0, which sends tasks,
+  cancels and answers back to the shard owning the recipient.
+- ``stats``: a periodic per-shard summary, which ``get_stats()`` merges
+  into cluster-wide figures.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+import tempfile
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger('NanoCoordinator.sharding')
+
+_HEADER = struct.Struct('!I')
+
+
+def socket_path(bus_dir: str, shard: int) -> str:
+    return os.path.join(bus_dir, f'shard-{shard}.sock')
+
+
+class _PeerLink:
+    """Outbound connection to one peer shard, drained by its own task"""
+
+    def __init__(self, bus: 'ShardBus', peer: int):
+        self.bus = bus
+        self.peer = peer
+        self.connected = False
+        self.frames_sent = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._run())
+
+    def send(self, frame: bytes):
+        self._queue.put_nowait(frame)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _run(self):
+        path = socket_path(self.bus.bus_dir, self.peer)
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                await asyncio.sleep(0.1)  # peer still starting
+                continue
+            writer.write(self.bus.encode(('hello', self.bus.shard_id)))
+            self.connected = True
+            self.bus.on_peer_up(self.peer)
+            try:
+                while True:
+                    # Batch everything queued into one write
+                    frames = [await self._queue.get()]
+                    while not self._queue.empty():
+                        frames.append(self._queue.get_nowait())
+                    writer.writelines(frames)
+                    self.frames_sent += len(frames)
+                    await writer.drain()
+            except ConnectionError:
+                logger.warning(f"Shard bus link {self.bus.shard_id} → {self.peer} lost, reconnecting")
+            finally:
+                self.connected = False
+                writer.close()
+
+    def close(self):
+        self._task.cancel()
+
+
+class ShardBus:
+    """Full mesh of Unix domain sockets between coordinator shards"""
+
+    def __init__(self, shard_id: int, shards: int, bus_dir: str,
+                 on_message: Callable[[int, tuple], None],
+                 on_peer_up: Callable[[int], None] = lambda peer: None,
+                 on_peer_down: Callable[[int], None] = lambda peer: None):
+        self.shard_id = shard_id
+        self.shards = shards
+        self.bus_dir = bus_dir
+        self.on_message = on_message
+        self.on_peer_up = on_peer_up
+        self.on_peer_down = on_peer_down
+        self.links: Dict[int, _PeerLink] = {}
+        self.frames_received = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def peers(self):
+        return [s for s in range(self.shards) if s != self.shard_id]
+
+    @staticmethod
+    def encode(msg: Any) -> bytes:
+        body = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+        return _HEADER.pack(len(body)) + body
+
+    async def start(self):
+        path = socket_path(self.bus_dir, self.shard_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._accept, path)
+        for peer in self.peers:
+            self.links[peer] = _PeerLink(self, peer)
+        logger.info(f"🧬 Shard {self.shard_id}/{self.shards} bus listening on {path}")
+
+    def send(self, peer: int, msg: Any):
+        self.links[peer].send(self.encode(msg))
+
+    def publish(self, msg: Any):
+        """Send one message to every peer (encoded once)"""
+        frame = self.encode(msg)
+        for link in self.links.values():
+            link.send(frame)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shard": self.shard_id,
+            "shards": self.shards,
+            "connected_peers": sum(1 for link in self.links.values() if link.connected),
+            "frames_sent": sum(link.frames_sent for link in self.links.values()),
+            "frames_received": self.frames_received,
+            "queued_frames": sum(link.depth for link in self.links.values()),
+        }
+
+    async def close(self):
+        for link in self.links.values():
+            link.close()
+        if self._server is not None:
+            self._server.close()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = None
+        try:
+            while True:
+                header = await reader.readexactly(_HEADER.size)
+                msg = pickle.loads(await reader.readexactly(_HEADER.unpack(header)[0]))
+                if peer is None:
+                    peer = msg[1]  # first frame is ('hello', shard_id)
+                    continue
+                self.frames_received += 1
+                self.on_message(peer, msg)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            return  # loop shutdown; re-raising here only produces an asyncio error log
+        finally:
+            writer.close()
+            if peer is not None:
+                self.on_peer_down(peer)
+
+
+def serve(config: Dict[str, Any], log_level: Optional[str] = None):
+    """Run one coordinator in this process until SIGTERM (shard workers, benchmarks)"""
+    from nano_coordinator import NanoCoordinator
+
+    if log_level:
+        logging.getLogger().setLevel(log_level)
+    coordinator = NanoCoordinator(**config)
+
+    # The parent decides when to stop: SIGTERM cancels run(), which flushes and closes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def main():
+        task = asyncio.ensure_future(coordinator.run())
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+
+
+def _worker(shard_id: int, shards: int, bus_dir: str, config: Dict[str, Any],
+            log_level: Optional[str] = None):
+    """Entry point of one shard process"""
+    config = dict(config, shard_id=shard_id, shards=shards, bus_dir=bus_dir)
+    # Each shard serves metrics and the API on its own port (base port + shard id)
+    for key, default in (('metrics_port', 9090), ('api_port', 8766)):
+        port = config.get(key, default)
+        config[key] = port + shard_id if port else port
+    serve(config, log_level)
+
+
+def run_sharded(shards: int, log_level: Optional[str] = None, **config):
+    """Prepare the database once, then run ``shards`` worker processes until interrupted"""
+    from nano_coordinator import NanoCoordinator
+
+    # Schema creation, legacy compaction (into the shards' slot ranges) and rollup
+    # backfill happen once, up front (each shard opens its own relay log)
+    NanoCoordinator(**dict(config, shards=shards, relay_log_dir=None)).close()
+
+    bus_dir = tempfile.mkdtemp(prefix='nano-shards-')
+    ctx = multiprocessing.get_context('spawn')
+    workers = [
+        ctx.Process(target=_worker, args=(i, shards, bus_dir, config, log_level), name=f'nano-shard-{i}')
+        for i in range(shards)
+    ]
+    for worker in workers:
+        worker.start()
+    logger.info(f"🧬 Started {shards} coordinator shards (bus: {bus_dir})")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        logger.info("🧬 Stopping shards...")
+    finally:
+        # SIGTERM lets each worker flush its writer before exiting
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join(10)
+            if worker.is_alive():
+                worker.kill()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+🎯 Load-balanced task distribution
+
+Implements the ``distribute_task`` workflow action of nano-coordinator.aix
+as request/reply on top of the mesh. Worker agents advertise what they
+can do:
+
+    {"agent": "NanoResearcher", "type": "capabilities",
+     "capabilities": ["research"], "max_inflight": 4}
+
+and any agent can submit work for a capability:
+
+    {"agent": "Client", "type": "task", "id": "42", "capability": "research",
+     "payload": {...}, "priority": 0, "timeout_ms": 5000, "retries": 2, "hedge_ms": 250}
+
+``priority`` is an integer (higher first) or a lane name (``"control"``,
+``"high"``, ``"normal"`` = 0, ``"bulk"``). A malformed request is answered
+with a ``task_error`` of ``invalid_request``. Submissions are charged
+against the coordinator's rate limits like actions (answers are not); a
+throttled or shed one gets a ``task_error`` with ``retry_after_ms``.
+
+The worker receives ``{"type": "task", "task_id": ..., "payload": ...}``
+and answers ``{"type": "task_result", "task_id": ..., "result": ...}`` (or
+``"error"``); the coordinator routes the answer back to the submitter
+under the submitter's own ``id``.
+
+- Each task goes to the capable agent with the lowest expected
+  completion time, ``(in_flight + 1) × task latency EWMA / reward``.
+  Agents at ``max_inflight`` are skipped; when every capable agent is
+  busy, tasks wait in a per-capability priority queue.
+- An attempt that times out, or whose worker disconnects, is retried on
+  another agent up to ``retries`` times.
+- With ``hedge_ms``, a task still unanswered after that long is also sent
+  to a second agent. The first answer wins and the other attempt gets a
+  ``task_cancel``.
+
+In sharded mode a single dispatcher, on ``DISPATCH_SHARD``, serves the
+whole mesh: the other shards forward their agents' task frames to it over
+the shard bus and it sends tasks and answers back the same way, so a
+submission sees every capable worker whichever shard it connected to.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .lanes import LANES, NORMAL, lane_of
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger('NanoCoordinator.tasks')
+
+FRAME_TYPES = ('capabilities', 'task', 'task_result')
+
+# Shard whose dispatcher owns every task in sharded mode
+DISPATCH_SHARD = 0
+
+
+def task_priority(value: Any) -> int:
+    """Task priority from an integer or a lane name (high → 1, normal → 0, bulk → -1)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        lane = lane_of(value, default=None)
+        if lane is None:
+            raise ValueError(f"priority must be an integer or one of {LANES}")
+        return NORMAL - lane
+    if (isinstance(value, bool) or not isinstance(value, (int, float))
+            or not math.isfinite(value) or value != int(value)):
+        raise ValueError("priority must be an integer or a lane name")
+    return int(value)
+
+
+def _seconds(msg: dict, field: str) -> Optional[float]:
+    """A positive ``*_ms`` field in seconds (None when absent or 0)"""
+    value = msg.get(field)
+    if value is None or value == 0:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{field} must be a positive number of milliseconds")
+    return value / 1000
+
+
+class Worker:
+    """Capabilities and live load of one agent that accepts tasks"""
+
+    __slots__ = ('name', 'capabilities', 'max_inflight', 'inflight', 'latency_ms', 'completed', 'failed')
+
+    def __init__(self, name: str, capabilities: Set[str], max_inflight: int, latency_ms: float):
+        self.name = name
+        self.capabilities = capabilities
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.latency_ms = latency_ms
+        self.completed = 0
+        self.failed = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capabilities": sorted(self.capabilities),
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "latency_ms": round(self.latency_ms, 2),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+class Task:
+    """One submitted task and its in-flight attempts"""
+
+    __slots__ = ('task_id', 'client', 'client_id', 'capability', 'payload', 'priority', 'timeout',
+                 'retries', 'hedge', 'attempts', 'tried', 'active', 'hedge_handle', 'queued',
+                 'submitted_at')
+
+    def __init__(self, task_id: str, client: str, client_id: Any, capability: str, payload: Any,
+                 priority: int, timeout: float, retries: int, hedge: Optional[float], submitted_at: float):
+        self.task_id = task_id
+        self.client = client
+        self.client_id = client_id
+        self.capability = capability
+        self.payload = payload
+        self.priority = priority
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.attempts = 0
+        self.tried: Set[str] = set()
+        # worker → (timeout handle, attempt start)
+        self.active: Dict[str, Tuple[asyncio.TimerHandle, float]] = {}
+        self.hedge_handle: Optional[asyncio.TimerHandle] = None
+        self.queued = False
+        self.submitted_at = submitted_at
+
+
+class TaskDispatcher:
+    """Capability-based task routing with retries, timeouts and hedging"""
+
+    def __init__(self, send: Callable[[str, dict], bool],
+                 score: Callable[[str], float] = lambda agent: 1.0,
+                 default_timeout: float = 30.0, default_retries: int = 2,
+                 default_max_inflight: int = 4, max_queued: int = 10000,
+                 initial_latency_ms: float = 50.0, latency_alpha: float = 0.2):
+        self.send = send
+        self.score = score
+        self.default_timeout = default_timeout
+        self.default_retries = default_retries
+        self.default_max_inflight = default_max_inflight
+        self.max_queued = max_queued
+        self.initial_latency_ms = initial_latency_ms
+        self.latency_alpha = latency_alpha
+
+        self.workers: Dict[str, Worker] = {}
+        self.by_capability: Dict[str, Set[str]] = {}
+        self.tasks: Dict[str, Task] = {}
+        self.by_client: Dict[str, Set[str]] = {}
+        self.queues: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.queued = 0
+        self.latency = LatencyHistogram()
+        self._ids = itertools.count(1)
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.hedged = 0
+        self.timed_out = 0
+        self.late_replies = 0
+        self.invalid = 0
+
+    def handle(self, agent: str, msg: dict):
+        """Apply one ``capabilities`` / ``task`` / ``task_result`` frame"""
+        kind = msg.get('type')
+        if kind == 'capabilities':
+            capabilities = msg.get('capabilities') or []
+            if isinstance(capabilities, str):
+                capabilities = [capabilities]
+            self.advertise(agent, capabilities, msg.get('max_inflight'))
+        elif kind == 'task':
+            self.submit(agent, msg)
+        elif kind == 'task_result':
+            self.complete(agent, msg)
+
+    def advertise(self, agent: str, capabilities, max_inflight: Optional[int] = None):
+        """Set (replace) the capabilities an agent accepts tasks for"""
+        worker = self.workers.get(agent)
+        if worker is None:
+            worker = self.workers[agent] = Worker(agent, set(), self.default_max_inflight,
+                                                  self.initial_latency_ms)
+        for capability in worker.capabilities:
+            self.by_capability[capability].discard(agent)
+        worker.capabilities = {str(c).lower() for c in capabilities}
+        if max_inflight:
+            worker.max_inflight = max(1, int(max_inflight))
+        for capability in worker.capabilities:
+            self.by_capability.setdefault(capability, set()).add(agent)
+            self._pump(capability)
+        logger.info(f"[{agent}] capabilities: {sorted(worker.capabilities) or 'none'} "
+                    f"(max in-flight {worker.max_inflight})")
+
+    def remove_agent(self, agent: str):
+        """Retry everything a departed worker held and drop tasks it submitted"""
+        worker = self.workers.pop(agent, None)
+        if worker is not None:
+            for capability in worker.capabilities:
+                self.by_capability[capability].discard(agent)
+            for task in [t for t in self.tasks.values() if agent in t.active]:
+                self._release(task, agent)
+                worker.failed += 1
+                self._retry(task, 'worker_disconnected')
+        for task_id in list(self.by_client.get(agent, ())):
+            task = self.tasks.get(task_id)
+            if task is not None:
+                self._finish(task)
+
+    def submit(self, client: str, msg: dict):
+        """Accept a task from ``client`` and dispatch or queue it"""
+        capability = str(msg.get('capability') or '').lower()
+        client_id = msg.get('id')
+        try:
+            priority = task_priority(msg.get('priority'))
+            timeout = _seconds(msg, 'timeout_ms') or self.default_timeout
+            hedge = _seconds(msg, 'hedge_ms')
+            retries = msg.get('retries')
+            if retries is None:
+                retries = self.default_retries
+            elif isinstance(retries, bool) or not isinstance(retries, int) or retries < 0:
+                raise ValueError("retries must be a non-negative integer")
+        except ValueError as e:
+            self.invalid += 1
+            self._reply(client, client_id, None, error='invalid_request', detail=str(e))
+            return
+        self.submitted += 1
+        if not self.by_capability.get(capability):
+            self.failed += 1
+            self._reply(client, client_id, None, error='no_capable_agent', capability=capability)
+            return
+        task = Task(
+            task_id=f"t{next(self._ids)}",
+            client=client,
+            client_id=client_id,
+            capability=capability,
+            payload=msg.get('payload'),
+            priority=priority,
+            timeout=timeout,
+            retries=retries,
+            hedge=hedge,
+            submitted_at=asyncio.get_running_loop().time(),
+        )
+        self.tasks[task.task_id] = task
+        self.by_client.setdefault(client, set()).add(task.task_id)
+        if not self._dispatch(task):
+            self._enqueue(task)
+
+    def complete(self, worker_name: str, msg: dict):
+        """Route a worker's answer back to the submitter; the first answer wins"""
+        task = self.tasks.get(msg.get('task_id'))
+        if task is None or worker_name not in task.active:
+            self.late_replies += 1
+            return
+        started = task.active[worker_name][1]
+        now = asyncio.get_running_loop().time()
+        self._release(task, worker_name)
+        worker = self.workers.get(worker_name)
+        error = msg.get('error')
+        if error is not None:
+            if worker is not None:
+                worker.failed += 1
+            if task.active:
+                return  # a hedged attempt is still running
+            self.failed += 1
+            self._reply(task.client, task.client_id, task, error=error, worker=worker_name)
+            self._finish(task)
+            return
+
+        if worker is not None:
+            worker.completed += 1
+            worker.latency_ms += self.latency_alpha * ((now - started) * 1000 - worker.latency_ms)
+        for other in list(task.active):
+            self._release(task, other)
+            self.send(other, {"type": "task_cancel", "task_id": task.task_id})
+        self.completed += 1
+        self.latency.record((now - task.submitted_at) * 1000)
+        self._reply(task.client, task.client_id, task, result=msg.get('result'), worker=worker_name)
+        self._finish(task)
+
+    def stats(self) -> Dict[str, Any]:
+        busiest = sorted(self.workers.values(), key=lambda w: w.inflight, reverse=True)
+        return {
+            "workers": len(self.workers),
+            "inflight": sum(len(t.active) for t in self.tasks.values()),
+            "queued": self.queued,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "timed_out": self.timed_out,
+            "late_replies": self.late_replies,
+            "invalid": self.invalid,
+            "latency": self.latency.summary(),
+            "capabilities": {
+                capability: {
+                    "workers": len(names),
+                    "inflight": sum(self.workers[n].inflight for n in names),
+                    "queued": len(self.queues.get(capability, ())),
+                }
+                for capability, names in sorted(self.by_capability.items()) if names
+            },
+            "agents": {w.name: w.stats() for w in busiest[:10]},
+        }
+
+    def _pick(self, capability: str, exclude=()) -> Optional[Worker]:
+        """Capable agent with a free slot and the lowest expected completion time"""
+        best, best_cost = None, None
+        for name in self.by_capability.get(capability, ()):
+            worker = self.workers[name]
+            if worker.inflight >= worker.max_inflight or name in exclude:
+                continue
+            cost = (worker.inflight + 1) * worker.latency_ms / max(self.score(name), 0.1)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = worker, cost
+        return best
+
+    def _dispatch(self, task: Task) -> bool:
+        """Start an attempt, preferring agents that have not tried this task yet"""
+        worker = self._pick(task.capability, task.tried | task.active.keys())
+        if worker is None:
+            worker = self._pick(task.capability, task.active.keys())
+        if worker is None:
+            return False
+        self._start(task, worker)
+        return True
+
+    def _start(self, task: Task, worker: Worker):
+        loop = asyncio.get_running_loop()
+        worker.inflight += 1
+        task.attempts += 1
+        task.tried.add(worker.name)
+        handle = loop.call_later(task.timeout, self._on_timeout, task.task_id, worker.name)
+        task.active[worker.name] = (handle, loop.time())
+        if task.hedge is not None and task.hedge_handle is None:
+            task.hedge_handle = loop.call_later(task.hedge, self._on_hedge, task.task_id)
+        self.send(worker.name, {
+            "type": "task",
+            "task_id": task.task_id,
+            "capability": task.capability,
+            "payload": task.payload,
+            "from": task.client,
+            "attempt": task.attempts,
+            "timeout_ms": round(task.timeout * 1000),
+        })
+
+    def _release(self, task: Task, worker_name: str):
+        """End one attempt and free its worker slot"""
+        handle, _ = task.active.pop(worker_name)
+        handle.cancel()
+        worker = self.workers.get(worker_name)
+        if worker is not None:
+            worker.inflight -= 1
+            for capability in worker.capabilities:
+                self._pump(capability)
+
+    def _on_timeout(self, task_id: str, worker_name: str):
+        task = self.tasks.get(task_id)
+        if task is None or worker_name not in task.active:
+            return
+        self.timed_out += 1
+        worker = self.workers.get(worker_name)
+        if worker is not None:
+            # A timeout is a lower bound on this agent's latency; steer work away from it
+            worker.failed += 1
+            worker.latency_ms += self.latency_alpha * (task.timeout * 1000 - worker.latency_ms)
+        self._release(task, worker_name)
+        self.send(worker_name, {"type": "task_cancel", "task_id": task_id})
+        self._retry(task, 'timeout')
+
+    def _on_hedge(self, task_id: str):
+        task = self.tasks.get(task_id)
+        if task is None or len(task.active) != 1:
+            return
+        worker = self._pick(task.capability, task.tried | task.active.keys())
+        if worker is not None:
+            self.hedged += 1
+            self._start(task, worker)
+
+    def _retry(self, task: Task, reason: str):
+        if task.active:
+            return  # a hedged attempt is still running
+        if task.attempts > task.retries or not self.by_capability.get(task.capability):
+            self.failed += 1
+            self._reply(task.client, task.client_id, task, error=reason)
+            self._finish(task)
+            return
+        self.retried += 1
+        if not self._dispatch(task):
+            self._enqueue(task)
+
+    def _enqueue(self, task: Task):
+        if self.queued >= self.max_queued:
+            self.failed += 1
+            self._reply(task.client, task.client_id, task, error='queue_full')
+            self._finish(task)
+            return
+        heapq.heappush(self.queues.setdefault(task.capability, []),
+                       (-task.priority, next(self._ids), task.task_id))
+        task.queued = True
+        self.queued += 1
+
+    def _pump(self, capability: str):
+        """Dispatch queued tasks while a capable agent has a free slot"""
+        queue = self.queues.get(capability)
+        while queue:
+            task = self.tasks.get(queue[0][2])
+            if task is None:
+                heapq.heappop(queue)  # finished while queued
+                continue
+            if not self._dispatch(task):
+                return
+            heapq.heappop(queue)
+            task.queued = False
+            self.queued -= 1
+
+    def _finish(self, task: Task):
+        # Only a task whose submitter left still has attempts running here
+        for worker_name in list(task.active):
+            self._release(task, worker_name)
+            self.send(worker_name, {"type": "task_cancel", "task_id": task.task_id})
+        if task.hedge_handle is not None:
+            task.hedge_handle.cancel()
+        del self.tasks[task.task_id]
+        client_tasks = self.by_client.get(task.client)
+        if client_tasks is not None:
+            client_tasks.discard(task.task_id)
+            if not client_tasks:
+                del self.by_client[task.client]
+        if task.queued:
+            self.queued -= 1  # its heap entry is skipped when it reaches the top
+
+    def _reply(self, client: str, client_id: Any, task: Optional[Task], result: Any = None,
+               error: Optional[str] = None, **extra):
+        reply = {"type": "task_error" if error is not None else "task_result", "id": client_id}
+        if task is not None:
+            reply.update(
+                task_id=task.task_id,
+                attempts=task.attempts,
+                latency_ms=round((asyncio.get_running_loop().time() - task.submitted_at) * 1000, 2),
+            )
+        if error is not None:
+            reply["error"] = error
+        else:
+            reply["result"] = result
+        reply.update(extra)
+        self.send(client, reply)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+🔬 Hot-path tracing, slow-callback counters and on-demand profiling
+
+The first three are cheap enough to leave on in production:
+
+- sampled stage timers: roughly one message in ``1 / sample_rate`` gets a
+  ``Trace`` that records a ``perf_counter_ns`` checkpoint after each stage
+  of ``handle_message`` (decode, attach, admit, relay, account, log,
+  persist, metrics). Unsampled messages pay one counter decrement.
+  Stage durations go into per-stage histograms; every sampled trace is
+  kept in a small ring (the slowest are reported) and, with
+  ``trace_path``, appended to a JSON-lines trace file in batches.
+- event-loop lag: the admission controller's probe reports every
+  measurement here, into a histogram.
+- profiling: ``start_profile()`` / ``stop_profile()`` (or
+  ``toggle_profile()``, also bound to SIGUSR1 and ``POST /api/profile``)
+  run cProfile on the event-loop thread and dump a ``.prof`` file that
+  ``python -m pstats`` or snakeviz can open, plus a top-functions summary.
+
+Slow-callback counting is opt-in (``slow_callback_ms``, off by default).
+It wraps asyncio's private ``Handle._run``, which puts a Python-level
+timer around every callback of every loop in the process, so it is a
+diagnostic to switch on while hunting a stall. Callbacks over the
+threshold are counted per coroutine / callback name (the same check
+asyncio's debug mode does, without the rest of debug mode's cost). It is
+not available on loops that do not run ``asyncio.Handle`` (uvloop); the
+loop-lag histogram still shows stalls there.
+
+The SQLite INSERT and commit run on the writer thread; their timings are
+in the ``persistence`` section of ``get_stats()`` (``persist`` here is the
+cost of queueing the row).
+"""
+
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import tempfile
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger('NanoCoordinator.tracing')
+
+
+class Trace:
+    """Checkpoints of one sampled message"""
+
+    __slots__ = ('start', 'last', 'stages')
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter_ns()
+        self.stages: List[Tuple[str, int]] = []
+
+    def mark(self, stage: str):
+        """Close ``stage``: the time since the previous checkpoint"""
+        now = time.perf_counter_ns()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+
+class HotPathTracer:
+    """Sampled per-stage timers, loop lag and slow-callback counts, plus a cProfile toggle"""
+
+    def __init__(self, sample_rate: float = 0.01, slow_callback_ms: Optional[float] = None,
+                 trace_path: Optional[str] = None, profile_dir: Optional[str] = None,
+                 keep_traces: int = 256):
+        self.sample_every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 0
+        self.slow_callback_ms = slow_callback_ms
+        self.trace_path = trace_path
+        self.profile_dir = profile_dir or tempfile.gettempdir()
+        self._countdown = self.sample_every or -1
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.total = LatencyHistogram()
+        self.loop_lag = LatencyHistogram()
+        self.traces: Deque[Dict[str, Any]] = deque(maxlen=keep_traces)
+        self._pending: List[str] = []
+        self.sampled = 0
+        self.traces_written = 0
+
+        self.slow_callbacks = 0
+        self.slow_callback_total_ms = 0.0
+        self.slow_by_callback: Dict[str, List[float]] = {}  # name → [count, max ms]
+        self._installed = None
+
+        self._profiler: Optional[cProfile.Profile] = None
+        self._profile_started: Optional[float] = None
+        self._profile_timer: Optional[asyncio.TimerHandle] = None
+        self.last_profile: Optional[Dict[str, Any]] = None
+
+    # Sampled stage timers
+
+    def begin(self) -> Optional[Trace]:
+        """A Trace for a sampled message, None for the rest"""
+        self._countdown -= 1
+        if self._countdown:
+            return None
+        # Jittered interval (mean sample_every) so periodic traffic cannot alias with the sampler
+        self._countdown = random.randint(1, 2 * self.sample_every - 1)
+        return Trace()
+
+    def finish(self, trace: Trace, agent: str, kind: str = 'action', actions: int = 1):
+        """Record a sampled message's stages"""
+        total_ns = trace.last - trace.start
+        self.sampled += 1
+        stages = {}
+        for stage, ns in trace.stages:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = LatencyHistogram()
+            hist.record(ns / 1e6)
+            stages[stage] = round(ns / 1e6, 4)
+        self.total.record(total_ns / 1e6)
+        record = {
+            "ts": time.time(),
+            "agent": agent,
+            "kind": kind,
+            "actions": actions,
+            "total_ms": round(total_ns / 1e6, 4),
+            "stages": stages,
+        }
+        self.traces.append(record)
+        if self.trace_path:
+            self._pending.append(json.dumps(record))
+
+    def flush(self):
+        """Append buffered traces to the trace file (called periodically, off the message path)"""
+        if not self._pending:
+            return
+        lines, self._pending = self._pending, []
+        try:
+            with open(self.trace_path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.traces_written += len(lines)
+        except OSError as e:
+            logger.error(f"❌ Could not write trace file {self.trace_path}: {e}")
+
+    # Event-loop lag (fed by the admission controller's probe)
+
+    def record_lag(self, lag_ms: float):
+        self.loop_lag.record(lag_ms)
+
+    # Slow callbacks
+
+    def install(self):
+        """Time every event-loop callback (wraps asyncio.Handle._run; undone by ``uninstall``)"""
+        if self._installed is not None or not self.slow_callback_ms:
+            return
+        if not isinstance(asyncio.get_running_loop(), asyncio.BaseEventLoop):
+            logger.warning("🐢 Slow-callback counting needs the stdlib event loop; not enabled")
+            return
+        original = asyncio.events.Handle._run
+        threshold = self.slow_callback_ms / 1000
+        perf_counter = time.perf_counter
+        tracer = self
+
+        def _run(handle):
+            start = perf_counter()
+            original(handle)
+            elapsed = perf_counter() - start
+            if elapsed >= threshold:
+                tracer._slow_callback(handle, elapsed * 1000)
+
+        asyncio.events.Handle._run = _run
+        self._installed = original
+
+    def uninstall(self):
+        if self._installed is not None:
+            asyncio.events.Handle._run = self._installed
+            self._installed = None
+
+    def _slow_callback(self, handle: asyncio.Handle, elapsed_ms: float):
+        self.slow_callbacks += 1
+        self.slow_callback_total_ms += elapsed_ms
+        name = _describe(handle)
+        entry = self.slow_by_callback.get(name)
+        if entry is None:
+            entry = self.slow_by_callback[name] = [0, 0.0]
+        entry[0] += 1
+        entry[1] = max(entry[1], elapsed_ms)
+        logger.debug(f"🐢 Slow callback {name}: {elapsed_ms:.1f}ms")
+
+    # Profiling
+
+    def start_profile(self, seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Profile the event-loop thread until ``stop_profile`` (or for ``seconds``)"""
+        if self._profiler is None:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:  # another profiler is active on this thread
+                return dict(self.profile_status(), error=str(e))
+            self._profiler = profiler
+            self._profile_started = time.time()
+            logger.info(f"🔬 Profiling started{f' for {seconds}s' if seconds else ''}")
+            if seconds:
+                self._profile_timer = asyncio.get_running_loop().call_later(seconds, self.stop_profile)
+        return self.profile_status()
+
+    def stop_profile(self, top: int = 20) -> Dict[str, Any]:
+        """Stop profiling, dump the .prof file and summarize the hottest functions"""
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return self.profile_status()
+        profiler.disable()
+        if self._profile_timer is not None:
+            self._profile_timer.cancel()
+            self._profile_timer = None
+        path = os.path.join(self.profile_dir, f"nano-coordinator-{os.getpid()}-{int(self._profile_started)}.prof")
+        try:
+            profiler.dump_stats(path)
+        except OSError as e:
+            logger.error(f"❌ Could not write profile {path}: {e}")
+            path = None
+        stats = pstats.Stats(profiler)
+        hottest = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:top]  # by own time
+        self.last_profile = {
+            "path": path,
+            "started": self._profile_started,
+            "seconds": round(time.time() - self._profile_started, 2),
+            "total_calls": stats.total_calls,
+            "top": [{
+                "function": f"{os.path.basename(file)}:{line}({name})",
+                "calls": calls,
+                "own_ms": round(own * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3),
+            } for (file, line, name), (_, calls, own, cumulative, _) in hottest],
+        }
+        logger.info(f"🔬 Profile written to {path}")
+        return self.profile_status()
+
+    def toggle_profile(self, seconds: Optional[float] = None) -> Dict[str, Any]:
+        return self.stop_profile() if self._profiler is not None else self.start_profile(seconds)
+
+    def profile_status(self) -> Dict[str, Any]:
+        return {
+            "profiling": self._profiler is not None,
+            "started": self._profile_started if self._profiler is not None else None,
+            "last_profile": self.last_profile,
+        }
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        slowest = sorted(self.traces, key=lambda t: t["total_ms"], reverse=True)[:top]
+        offenders = sorted(self.slow_by_callback.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+        return {
+            "sample_rate": round(1 / self.sample_every, 6) if self.sample_every else 0,
+            "sampled": self.sampled,
+            "stages": {stage: hist.summary() for stage, hist in self.stages.items()},
+            "sampled_total": self.total.summary(),
+            "slowest_traces": slowest,
+            "trace_file": self.trace_path,
+            "traces_written": self.traces_written,
+            "loop_lag": self.loop_lag.summary(),
+            "slow_callbacks": {
+                "threshold_ms": self.slow_callback_ms if self._installed is not None else None,
+                "count": self.slow_callbacks,
+                "total_ms": round(self.slow_callback_total_ms, 2),
+                "by_callback": {name: {"count": count, "max_ms": round(worst, 2)}
+                                for name, (count, worst) in offenders},
+            },
+            "profile": self.profile_status(),
+        }
+
+
+def _describe(handle: asyncio.Handle) -> str:
+    """Readable name of a callback: the coroutine for task steps, the function otherwise"""
+    callback = getattr(handle, '_callback', None)
+    owner = getattr(callback, '__self__', None)
+    if isinstance(owner, asyncio.Task):
+        coro = owner.get_coro()
+        return getattr(coro, '__qualname__', None) or repr(coro)
+    return getattr(callback, '__qualname__', None) or repr(callback)